@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""On disk candle history, so backtests don't refetch (or need) the API.
+
+    python -m backtest.candle_store fill ETH-USD 2017-11-01 2017-11-10
+    python -m backtest.candle_store import ETH-USD dump.csv
+    python -m backtest.candle_store coverage ETH-USD
+
+Each product/granularity is kept as one float64 .npy of shape (6, n), a row per column (time, low, high,
+open, close, volume) so each column is contiguous, alongside an index.json of the time ranges fetched.
+Reads memory map the file and return its transpose, an (n, 6) view without copying anything.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import dateutil.parser
+import numpy as np
+
+from backtest.engine import TIME
+from backtest.engine import fetch_candles
+from gdax.public_client import PublicClient
+
+module_logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = 'candles'
+
+
+def to_timestamp(value):
+    """Epoch seconds from epoch seconds, a datetime (naive is UTC) or a date string
+    """
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            value = dateutil.parser.parse(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return (value - datetime(1970, 1, 1)).total_seconds()
+        return value.timestamp()
+    return float(value)
+
+
+def merge_ranges(ranges):
+    """Sorted, non overlapping [start, end) ranges covering the same times
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class CandleStore(object):
+    def __init__(self, root=DEFAULT_ROOT, client=None, pause=1):
+        """
+        :param root: Directory holding a sub directory per product/granularity.
+        :param client: Public client for filling missing ranges, offline if None.
+        :param pause: Seconds between API calls when filling.
+        """
+        self.root = root
+        self.client = client
+        self.pause = pause
+
+    def path(self, product_id, granularity, name):
+        return os.path.join(self.root, product_id, str(granularity), name)
+
+    def coverage(self, product_id, granularity=60):
+        """[start, end) epoch second ranges already fetched/imported
+        """
+        try:
+            with open(self.path(product_id, granularity, 'index.json')) as f:
+                return json.load(f)['coverage']
+        except FileNotFoundError:
+            return []
+
+    def missing(self, product_id, start, end, granularity=60):
+        """[start, end) ranges in the period not yet in the store
+        """
+        start = to_timestamp(start)
+        end = to_timestamp(end)
+        gaps = []
+        for covered_start, covered_end in self.coverage(product_id, granularity):
+            if covered_end <= start or covered_start >= end:
+                continue
+            if covered_start > start:
+                gaps.append([start, covered_start])
+            start = max(start, covered_end)
+        if start < end:
+            gaps.append([start, end])
+        return gaps
+
+    def load(self, product_id, start=None, end=None, granularity=60):
+        """(n, 6) candles in time order with start <= time < end, a read only view onto the memory mapped file
+        """
+        try:
+            columns = np.load(self.path(product_id, granularity, 'candles.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return np.empty((0, 6))
+        times = columns[TIME]
+        first = 0 if start is None else np.searchsorted(times, to_timestamp(start), side='left')
+        last = len(times) if end is None else np.searchsorted(times, to_timestamp(end), side='left')
+        return columns[:, first:last].T
+
+    def get(self, product_id, start, end, granularity=60):
+        """Candles for the period, fetching whatever's missing first (if there's a client)
+        """
+        if self.client is not None:
+            self.fill(product_id, start, end, granularity=granularity)
+        return self.load(product_id, start, end, granularity=granularity)
+
+    def fill(self, product_id, start, end, granularity=60):
+        """Fetch and store just the ranges in the period not already in the store
+        """
+        for gap_start, gap_end in self.missing(product_id, start, end, granularity=granularity):
+            module_logger.info('{}|Filling candles {} to {}'.format(
+                product_id, datetime.utcfromtimestamp(gap_start), datetime.utcfromtimestamp(gap_end)))
+            candles = fetch_candles(self.client, product_id, datetime.utcfromtimestamp(gap_start),
+                                    datetime.utcfromtimestamp(gap_end), granularity=granularity,
+                                    window=timedelta(seconds=300 * granularity), pause=self.pause)
+            self.add(product_id, candles, gap_start, gap_end, granularity=granularity)
+
+    def add(self, product_id, candles, start, end, granularity=60):
+        """Merge candles for the [start, end) range into the store, newer data replacing stored candles
+        """
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, 6)
+        candles = candles[(candles[:, TIME] >= start) & (candles[:, TIME] < end)]
+        # Existing candles first so the new ones win when de-duplicating (keeping the last of each time)
+        merged = np.concatenate([np.array(self.load(product_id, granularity=granularity)), candles])
+        order = np.argsort(merged[:, TIME], kind='stable')
+        merged = merged[order]
+        keep = np.append(merged[1:, TIME] != merged[:-1, TIME], True) if len(merged) else np.empty(0, dtype=bool)
+        merged = merged[keep]
+
+        directory = os.path.dirname(self.path(product_id, granularity, 'candles.npy'))
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so readers (and a crash) only ever see a complete file
+        temp = self.path(product_id, granularity, 'candles.tmp.npy')
+        np.save(temp, np.ascontiguousarray(merged.T))
+        os.replace(temp, self.path(product_id, granularity, 'candles.npy'))
+        coverage = merge_ranges(self.coverage(product_id, granularity) + [[float(start), float(end)]])
+        temp = self.path(product_id, granularity, 'index.tmp.json')
+        with open(temp, 'w') as f:
+            json.dump({'coverage': coverage}, f)
+        os.replace(temp, self.path(product_id, granularity, 'index.json'))
+
+    def import_csv(self, product_id, path, granularity=60):
+        """Import a CSV dump of time, low, high, open, close, volume rows (header optional, time as epoch
+        seconds or a date string). Coverage is taken as the first to the last candle.
+        """
+        rows = []
+        with open(path) as f:
+            for row in csv.reader(f):
+                if not row:
+                    continue
+                try:
+                    rows.append([to_timestamp(row[0])] + [float(x) for x in row[1:6]])
+                except ValueError:
+                    # Header
+                    continue
+        if not rows:
+            return 0
+        candles = np.array(rows, dtype=np.float64)
+        self.add(product_id, candles, candles[:, TIME].min(), candles[:, TIME].max() + granularity,
+                 granularity=granularity)
+        return len(rows)
+
+
+def get_candles(product_id, start, end, store=None, offline=False, granularity=60):
+    """Candles for a backtest, from the store (filling gaps from the API unless offline) or straight from the API
+    """
+    if store is None:
+        return fetch_candles(PublicClient(), product_id, start, end, granularity=granularity,
+                             window=timedelta(seconds=300 * granularity))
+    return CandleStore(store, None if offline else PublicClient()).get(product_id, start, end,
+                                                                       granularity=granularity)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Manage the local candle store')
+    parser.add_argument('--store', default=DEFAULT_ROOT, help='Store directory')
+    parser.add_argument('--granularity', type=int, default=60)
+    commands = parser.add_subparsers(dest='command', required=True)
+    fill = commands.add_parser('fill', help='Fetch missing candles for a period from the API')
+    fill.add_argument('product_id')
+    fill.add_argument('start_time', type=dateutil.parser.parse)
+    fill.add_argument('end_time', type=dateutil.parser.parse)
+    importer = commands.add_parser('import', help='Import a CSV dump')
+    importer.add_argument('product_id')
+    importer.add_argument('csv_file')
+    show = commands.add_parser('coverage', help='Show stored time ranges')
+    show.add_argument('product_id')
+    args = parser.parse_args()
+
+    if args.command == 'fill':
+        store = CandleStore(args.store, PublicClient())
+        store.fill(args.product_id, args.start_time, args.end_time, granularity=args.granularity)
+    elif args.command == 'import':
+        store = CandleStore(args.store)
+        print('Imported {} candles'.format(store.import_csv(args.product_id, args.csv_file,
+                                                            granularity=args.granularity)))
+    else:
+        store = CandleStore(args.store)
+    for start, end in store.coverage(args.product_id, args.granularity):
+        print('{} to {}'.format(datetime.utcfromtimestamp(start), datetime.utcfromtimestamp(end)))
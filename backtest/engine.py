@@ -0,0 +1,160 @@
+import logging
+from datetime import datetime, timedelta
+from time import sleep
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+# Candle columns, as returned by get_product_historic_rates
+TIME, LOW, HIGH, OPEN, CLOSE, VOLUME = range(6)
+# Fee on orders that take liquidity
+TAKER_FEE = 0.003
+# Candles searched per step for the next fill
+CHUNK_SIZE = 4096
+
+
+def to_candles(rates):
+    """Array of candles in time order from one get_product_historic_rates call (which is newest first)
+    """
+    return np.array(rates, dtype=np.float64).reshape(-1, 6)[::-1]
+
+
+def fetch_candles(client, product_id, start, end, granularity=60, window=timedelta(minutes=300), pause=1):
+    """Candles between the datetimes from the API, a window (at most 300 candles) per call, in time order
+    """
+    windows = []
+    current_time = start
+    while current_time < end:
+        next_time = current_time + window
+        module_logger.info('Fetching {} to {}'.format(current_time, next_time))
+        windows.append(to_candles(client.get_product_historic_rates(
+            product_id, start=current_time.isoformat() + 'Z', end=next_time.isoformat() + 'Z',
+            granularity=granularity)))
+        current_time = next_time
+        sleep(pause)
+    return np.concatenate(windows) if windows else np.empty((0, 6))
+
+
+def random_candles(count, seed=42, start=100.0, volatility=0.002):
+    """Synthetic minute candles (log normal random walk, 2dp prices) in time order, for tests and benchmarks
+    """
+    rand = np.random.default_rng(seed)
+    closes = start * np.exp(np.cumsum(rand.normal(0, volatility, count)))
+    opens = np.concatenate([[start], closes[:-1]])
+    wicks = np.abs(rand.normal(0, volatility / 2, (count, 2))) * closes[:, None]
+    lows = np.round(np.minimum(opens, closes) - wicks[:, 0], 2)
+    highs = np.round(np.maximum(opens, closes) + wicks[:, 1], 2)
+    times = 1500000000 + 60 * np.arange(count)
+    return np.column_stack([times, lows, highs, np.round(opens, 2), np.round(closes, 2), np.ones(count)])
+
+
+class Backtest(object):
+    def __init__(self, trader, client):
+        """Replays candles against a trader running on an AuthenticatedClientRegression.
+        :param trader: Trader (e.g. CostBasisTrader) with `client` as its auth_client, already started.
+        :param client: Regression client holding the trader's open orders.
+        """
+        self.trader = trader
+        self.client = client
+        self.fills = []
+        self.total_trades = 0
+        self.fee_trades = 0
+        self.fees = 0.0
+        self.last_high = 0.0
+        self.max_depth = 0
+        # (candle index, quote balance, base balance, fees) at the start and after each fill, for drawdown
+        accounts = trader.accounts
+        self.balances = [(0, accounts[trader.quote_currency]['available'],
+                          accounts[trader.base_currency]['available'], 0.0)]
+
+    def run(self, candles, chunk_size=CHUNK_SIZE):
+        """Jump from fill to fill: for the current open orders, find the first candle that triggers any of them
+        with a vectorized search then hand it to on_tick, so fills are the same as stepping every candle.
+        """
+        candles = np.asarray(candles, dtype=np.float64)
+        lows = candles[:, LOW]
+        highs = candles[:, HIGH]
+        index = 0
+        while index < len(candles):
+            # A buy fills once the low reaches it (stops also once the high does), a sell once the high does
+            buy_below, sell_above = self.client.trigger_prices()
+            found = None
+            while index < len(candles):
+                end = min(index + chunk_size, len(candles))
+                hits = np.flatnonzero((lows[index:end] <= buy_below) | (highs[index:end] >= sell_above))
+                if len(hits):
+                    found = index + hits[0]
+                    break
+                index = end
+            if found is None:
+                break
+            candle = candles[found]
+            self.fill(self.client.on_tick(candle[LOW], candle[HIGH]), candle, found)
+            index = found + 1
+        if len(candles):
+            self.last_high = float(candles[-1, HIGH])
+
+    def run_loop(self, candles):
+        """Step every candle through on_tick, the original regression loop
+        """
+        for index, candle in enumerate(candles):
+            self.last_high = float(candle[HIGH])
+            order = self.client.on_tick(candle[LOW], candle[HIGH])
+            if order:
+                self.fill(order, candle, index)
+
+    def fill(self, order, candle, index=0):
+        """Fill the order as of the candle and let the trader place its next orders
+        """
+        module_logger.info('{}: Low:{} High:{} Open:{} Close:{}'.format(
+            datetime.fromtimestamp(candle[TIME]), candle[LOW], candle[HIGH], candle[OPEN], candle[CLOSE]))
+        self.total_trades += 1
+        size = float(order['size'])
+        price = float(order['price'])
+        if order['type'] == 'stop':
+            self.fee_trades += 1
+            self.fees += TAKER_FEE * size * price
+        self.fills.append((float(candle[TIME]), order['side'], order['type'], price, size))
+        self.trader.place_next_orders({
+            'id': order['id'],
+            'price': order['price'],
+            'side': order['side'],
+            'filled_size': order['size'],
+        })
+        accounts = self.trader.accounts
+        if order['side'] == 'buy':
+            accounts[self.trader.base_currency]['available'] += size
+            accounts[self.trader.quote_currency]['available'] -= price * size
+        else:
+            accounts[self.trader.base_currency]['available'] -= size
+            accounts[self.trader.quote_currency]['available'] += price * size
+        self.client.last_rates = list(map(float, candle))
+        self.max_depth = max(self.max_depth, getattr(self.trader, 'current_order_depth', 0))
+        self.balances.append((index, accounts[self.trader.quote_currency]['available'],
+                              accounts[self.trader.base_currency]['available'], self.fees))
+
+    def drawdown(self, candles):
+        """Largest peak to trough fall in account value (less fees), marked at each candle's close, as a fraction
+        """
+        candles = np.asarray(candles, dtype=np.float64)
+        if not len(candles):
+            return 0.0
+        # Balances only change on fills, spread each fill's balances over the candles up to the next one
+        starts = [x[0] for x in self.balances]
+        counts = np.diff(starts + [len(candles)])
+        quote, base, fees = (np.repeat([x[i] for x in self.balances], counts) for i in (1, 2, 3))
+        value = quote + base * candles[:, CLOSE] - fees
+        peaks = np.maximum.accumulate(value)
+        return float(np.max((peaks - value) / peaks))
+
+    def total(self):
+        """Value of the trader's accounts at the last high, less fees
+        """
+        total = 0
+        for currency, balance in self.trader.accounts.items():
+            if currency == self.trader.quote_currency:
+                total += float(balance['available'])
+            else:
+                total += float(balance['available']) * self.last_high
+        return total - self.fees
@@ -0,0 +1,480 @@
+import bisect
+import itertools
+import json
+import logging
+import math
+import threading
+import uuid
+from datetime import datetime
+
+from backtest.engine import CLOSE
+from backtest.engine import HIGH
+from backtest.engine import LOW
+from backtest.engine import OPEN
+from backtest.engine import TIME
+from backtest.engine import VOLUME
+
+module_logger = logging.getLogger(__name__)
+
+# Left over sizes below this are treated as filled
+EPSILON = 1e-12
+# Sizes are whole multiples of this, as on the exchange
+BASE_INCREMENT = 1e-8
+
+
+def make_product(product_id, quote_increment='0.01', base_min_size='0.001', base_max_size='10000'):
+    """Product definition as returned by get_products
+    """
+    base_currency, quote_currency = product_id.split('-')
+    return {
+        'id': product_id,
+        'base_currency': base_currency,
+        'quote_currency': quote_currency,
+        'base_min_size': base_min_size,
+        'base_max_size': base_max_size,
+        'quote_increment': quote_increment,
+        'display_name': '{}/{}'.format(base_currency, quote_currency),
+        'status': 'online',
+    }
+
+
+def round_size(size):
+    """Size rounded down to the base increment, tolerating float error just under a multiple
+    """
+    return math.floor(size / BASE_INCREMENT + 1e-6) * BASE_INCREMENT
+
+
+def to_iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.utcfromtimestamp(timestamp).isoformat() + 'Z'
+
+
+class SimulatedExchange(object):
+    def __init__(self, products, balances, maker_fee=0.0, taker_fee=0.003, queue_ahead=0.0, settle_delay=0.0):
+        """Stands in for AuthenticatedClient: takes orders, keeps balances and holds, and matches resting orders
+        against replayed trades or candles, sending done/match messages to subscribers like the user channel.
+
+        Orders priced through by a trade fill in full. Orders at the traded price fill from the trade's size,
+        after `queue_ahead` base currency queued in front of them at that price, so they can fill partially.
+        Stops trigger when traded through and fill as taker at the trade price.
+        :param products: Product definitions, see make_product.
+        :param balances: Starting balance per currency, e.g. {'USD': 1000}.
+        :param settle_delay: Seconds after a fill until the order shows settled, on a timer thread.
+        """
+        self.products = {x['id']: x for x in products}
+        self.accounts = {}
+        for product in products:
+            for currency in (product['base_currency'], product['quote_currency']):
+                self.accounts[currency] = {'id': currency, 'currency': currency, 'balance': 0.0, 'hold': 0.0}
+        for currency, balance in balances.items():
+            self.accounts.setdefault(currency, {'id': currency, 'currency': currency, 'balance': 0.0, 'hold': 0.0})
+            self.accounts[currency]['balance'] = float(balance)
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.queue_ahead = queue_ahead
+        self.settle_delay = settle_delay
+        self.orders = {}
+        # Per product and side, (sort key, order id) in price then time priority
+        self.books = {x: {'buy': [], 'sell': []} for x in self.products}
+        self.stops = {x: [] for x in self.products}
+        self.prices = {}
+        self.time = None
+        self.sequence = itertools.count(1)
+        self.order_sequence = itertools.count()
+        self.trade_ids = itertools.count(1)
+        self.listeners = []
+        self.timers = set()
+        self.fills = 0
+        self.partial_fills = 0
+        self.rejects = 0
+        self.lock = threading.RLock()
+
+    def subscribe(self, callback, idle=None):
+        """Send websocket style messages (JSON text) to `callback`. After a replayed trade or candle produces
+        messages, `idle` is called to block until the subscriber has finished handling them.
+        """
+        self.listeners.append((callback, idle))
+
+    def deliver(self, messages):
+        for callback, _ in self.listeners:
+            for message in messages:
+                callback(json.dumps(message))
+
+    def wait_idle(self):
+        for _, idle in self.listeners:
+            if idle is not None:
+                idle()
+
+    def close(self):
+        with self.lock:
+            for timer in list(self.timers):
+                timer.cancel()
+            self.timers.clear()
+
+    # Market data
+
+    def set_price(self, product_id, price, timestamp=None):
+        with self.lock:
+            self.prices[product_id] = float(price)
+            if timestamp is not None:
+                self.time = timestamp
+
+    def replay_trades(self, product_id, trades):
+        """Feed (time, price, size) trades in time order
+        """
+        for timestamp, price, size in trades:
+            if self.on_trade(product_id, price, size, timestamp):
+                self.wait_idle()
+
+    def replay_candles(self, product_id, candles):
+        """Feed candles in time order, see replay_candle
+        """
+        for candle in candles:
+            self.replay_candle(product_id, candle)
+
+    def replay_candle(self, product_id, candle):
+        """Feed a candle as four trades of a quarter of its volume walking open, low, high, close
+        (or open, high, low, close on a down candle)
+        """
+        low = float(candle[LOW])
+        high = float(candle[HIGH])
+        if not self.touches(product_id, low, high):
+            self.set_price(product_id, candle[CLOSE], float(candle[TIME]))
+            return
+        if candle[CLOSE] >= candle[OPEN]:
+            path = (candle[OPEN], low, high, candle[CLOSE])
+        else:
+            path = (candle[OPEN], high, low, candle[CLOSE])
+        size = float(candle[VOLUME]) / 4
+        for price in path:
+            if self.on_trade(product_id, float(price), size, float(candle[TIME])):
+                self.wait_idle()
+
+    def touches(self, product_id, low, high):
+        """Whether trading between low and high could fill or trigger anything
+        """
+        with self.lock:
+            buys = self.books[product_id]['buy']
+            sells = self.books[product_id]['sell']
+            if buys and self.orders[buys[0][1]]['price'] >= low:
+                return True
+            if sells and self.orders[sells[0][1]]['price'] <= high:
+                return True
+            for order_id in self.stops[product_id]:
+                order = self.orders[order_id]
+                if (order['side'] == 'buy' and high >= order['price']) or (
+                        order['side'] == 'sell' and low <= order['price']):
+                    return True
+            return False
+
+    def on_trade(self, product_id, price, size, timestamp=None):
+        """A trade printed on the market, fill whatever it reaches. Returns whether any messages were sent.
+        """
+        messages = []
+        with self.lock:
+            self.prices[product_id] = price
+            if timestamp is not None:
+                self.time = timestamp
+            if not self.touches(product_id, price, price):
+                return False
+            for order_id in list(self.stops[product_id]):
+                order = self.orders[order_id]
+                if (order['side'] == 'buy' and price >= order['price']) or (
+                        order['side'] == 'sell' and price <= order['price']):
+                    self.stops[product_id].remove(order_id)
+                    messages.append(self.received(order))
+                    quantity = order['size'] - order['filled']
+                    if order['funds'] is not None:
+                        quantity = min(quantity, round_size(order['funds'] / price))
+                    self.fill(order, quantity, price, 'T', messages)
+            available = size
+            for side in ('buy', 'sell'):
+                for _, order_id in list(self.books[product_id][side]):
+                    order = self.orders[order_id]
+                    through = order['price'] > price if side == 'buy' else order['price'] < price
+                    if not through and order['price'] != price:
+                        break
+                    remaining = order['size'] - order['filled']
+                    if through:
+                        quantity = remaining
+                    else:
+                        # At the traded price, the queue in front of us goes first
+                        ahead = min(order['queue_ahead'], available)
+                        order['queue_ahead'] -= ahead
+                        available -= ahead
+                        quantity = min(remaining, round_size(available))
+                        available -= quantity
+                    if quantity > EPSILON:
+                        self.fill(order, quantity, order['price'], 'M', messages)
+        if messages:
+            self.deliver(messages)
+        return bool(messages)
+
+    def fill(self, order, quantity, price, liquidity, messages):
+        base = self.accounts[self.products[order['product_id']]['base_currency']]
+        quote = self.accounts[self.products[order['product_id']]['quote_currency']]
+        value = quantity * price
+        fee = value * (self.taker_fee if liquidity == 'T' else self.maker_fee)
+        if order['side'] == 'buy':
+            quote['balance'] -= value + fee
+            base['balance'] += quantity
+            if order['type'] == 'limit':
+                self.release(order, quote, quantity * order['price'])
+        else:
+            base['balance'] -= quantity
+            quote['balance'] += value - fee
+            self.release(order, base, quantity)
+        order['filled'] += quantity
+        order['executed_value'] += value
+        order['fill_fees'] += fee
+        self.fills += 1
+        match = {
+            'type': 'match',
+            'trade_id': next(self.trade_ids),
+            'sequence': next(self.sequence),
+            'maker_order_id': order['id'] if liquidity == 'M' else str(uuid.uuid4()),
+            'taker_order_id': order['id'] if liquidity == 'T' else str(uuid.uuid4()),
+            'time': to_iso(self.time),
+            'product_id': order['product_id'],
+            'size': '{:.8f}'.format(quantity),
+            'price': '{:.8f}'.format(price),
+            # Side of the maker order
+            'side': order['side'] if liquidity == 'M' else ('sell' if order['side'] == 'buy' else 'buy'),
+        }
+        # The user channel adds our fee rate
+        if liquidity == 'M':
+            match['maker_fee_rate'] = '{:.4f}'.format(self.maker_fee)
+        else:
+            match['taker_fee_rate'] = '{:.4f}'.format(self.taker_fee)
+        messages.append(match)
+        # Stops are market orders once triggered, done whether or not the funds covered all of the size
+        if order['size'] - order['filled'] > EPSILON and order['type'] != 'stop':
+            self.partial_fills += 1
+            return
+        self.finish(order, 'filled', messages)
+
+    def received(self, order):
+        message = {
+            'type': 'received',
+            'sequence': next(self.sequence),
+            'time': to_iso(self.time),
+            'product_id': order['product_id'],
+            'order_id': order['id'],
+            'side': order['side'],
+        }
+        if order['type'] == 'stop':
+            message['order_type'] = 'market'
+            if order['funds'] is not None:
+                message['funds'] = '{:.16f}'.format(order['funds'])
+            else:
+                message['size'] = '{:.8f}'.format(order['size'])
+        else:
+            message['order_type'] = 'limit'
+            message['size'] = '{:.8f}'.format(order['size'])
+            message['price'] = '{:.8f}'.format(order['price'])
+        return message
+
+    def release(self, order, account, amount):
+        amount = min(amount, order['hold'])
+        order['hold'] -= amount
+        account['hold'] = max(0.0, account['hold'] - amount)
+
+    def finish(self, order, reason, messages):
+        """Take a filled/canceled order off the book, releasing what's left of its hold
+        """
+        product = self.products[order['product_id']]
+        held = product['quote_currency'] if order['side'] == 'buy' else product['base_currency']
+        self.release(order, self.accounts[held], order['hold'])
+        book = self.books[order['product_id']][order['side']]
+        if (order['key'], order['id']) in book:
+            book.remove((order['key'], order['id']))
+        if order['id'] in self.stops[order['product_id']]:
+            self.stops[order['product_id']].remove(order['id'])
+        order['status'] = 'done'
+        order['done_reason'] = reason
+        order['done_at'] = self.time
+        messages.append({
+            'type': 'done',
+            'sequence': next(self.sequence),
+            'time': to_iso(self.time),
+            'product_id': order['product_id'],
+            'order_id': order['id'],
+            'price': '{:.8f}'.format(order['price']),
+            'remaining_size': '{:.8f}'.format(max(0.0, order['size'] - order['filled'])),
+            'side': order['side'],
+            'reason': reason,
+        })
+        if reason != 'filled' or self.settle_delay <= 0:
+            order['settled'] = True
+            return
+        timer = threading.Timer(self.settle_delay, self.settle, args=(order['id'],))
+        timer.daemon = True
+        self.timers.add(timer)
+        timer.start()
+
+    def settle(self, order_id):
+        with self.lock:
+            self.orders[order_id]['settled'] = True
+            self.timers = {x for x in self.timers if x.is_alive() and x is not threading.current_thread()}
+
+    def value(self, quote_currency='USD'):
+        """Total balance in the quote currency at the last traded prices
+        """
+        with self.lock:
+            total = 0.0
+            for currency, account in self.accounts.items():
+                if currency == quote_currency:
+                    total += account['balance']
+                elif '{}-{}'.format(currency, quote_currency) in self.prices:
+                    total += account['balance'] * self.prices['{}-{}'.format(currency, quote_currency)]
+            return total
+
+    # Rest API
+
+    def get_products(self):
+        return [dict(x) for x in self.products.values()]
+
+    def get_product_ticker(self, product_id):
+        with self.lock:
+            if product_id not in self.prices:
+                return {'message': 'NotFound'}
+            price = '{:.8f}'.format(self.prices[product_id])
+            return {'price': price, 'bid': price, 'ask': price, 'time': to_iso(self.time)}
+
+    def get_accounts(self):
+        with self.lock:
+            return [{
+                'id': x['id'],
+                'currency': x['currency'],
+                'balance': '{:.16f}'.format(x['balance']),
+                'hold': '{:.16f}'.format(x['hold']),
+                'available': '{:.16f}'.format(x['balance'] - x['hold']),
+            } for x in self.accounts.values()]
+
+    def get_account_history_page(self, account_id, before='', after='', limit=''):
+        # No ledger kept, fills only arrive over the message feed
+        return [], None, None
+
+    def get_orders(self):
+        with self.lock:
+            return [[self.render(x) for x in self.orders.values() if x['status'] == 'open']]
+
+    def get_order(self, order_id):
+        with self.lock:
+            if order_id not in self.orders:
+                return {'message': 'NotFound'}
+            return self.render(self.orders[order_id])
+
+    def buy(self, **kwargs):
+        return self.place('buy', kwargs)
+
+    def sell(self, **kwargs):
+        return self.place('sell', kwargs)
+
+    def place(self, side, params):
+        product_id = params.get('product_id', '')
+        if product_id not in self.products:
+            return {'message': 'Invalid product_id'}
+        product = self.products[product_id]
+        order_type = params.get('type', 'limit')
+        price = float(params['price'])
+        size = float(params['size'])
+        funds = float(params['funds']) if 'funds' in params else None
+        messages = []
+        with self.lock:
+            last = self.prices.get(product_id, None)
+            crosses = last is not None and (price > last if side == 'buy' else price < last)
+            if order_type == 'limit' and crosses and params.get('post_only', False):
+                self.rejects += 1
+                return {'message': 'Post only mode'}
+            if side == 'buy':
+                account = self.accounts[product['quote_currency']]
+                hold = funds if order_type == 'stop' and funds is not None else price * size
+            else:
+                account = self.accounts[product['base_currency']]
+                hold = size
+            if hold > account['balance'] - account['hold'] + EPSILON:
+                self.rejects += 1
+                return {'message': 'Insufficient funds'}
+            account['hold'] += hold
+            order = {
+                'id': str(uuid.uuid4()),
+                'product_id': product_id,
+                'side': side,
+                'type': order_type,
+                'price': price,
+                'size': size,
+                'funds': funds,
+                'post_only': bool(params.get('post_only', False)),
+                'hold': hold,
+                'filled': 0.0,
+                'executed_value': 0.0,
+                'fill_fees': 0.0,
+                'queue_ahead': self.queue_ahead,
+                'status': 'open',
+                'settled': False,
+                'created_at': self.time,
+                'done_at': None,
+                'done_reason': None,
+                'key': ((-price if side == 'buy' else price), next(self.order_sequence)),
+            }
+            self.orders[order['id']] = order
+            # Stops are only received by the matching engine once they trigger
+            if order_type != 'stop':
+                messages.append(self.received(order))
+            if order_type == 'stop':
+                self.stops[product_id].append(order['id'])
+            elif crosses:
+                # Takes liquidity straight away at the last price
+                self.fill(order, size, last, 'T', messages)
+            else:
+                bisect.insort(self.books[product_id][side], (order['key'], order['id']))
+            result = self.render(order)
+        if messages:
+            self.deliver(messages)
+        return result
+
+    def cancel_order(self, order_id):
+        messages = []
+        with self.lock:
+            order = self.orders.get(order_id, None)
+            if order is None or order['status'] != 'open':
+                return {'message': 'order not found'}
+            self.finish(order, 'canceled', messages)
+        self.deliver(messages)
+        return [order_id]
+
+    def cancel_all(self, data=None, product=''):
+        with self.lock:
+            order_ids = [x['id'] for x in self.orders.values() if x['status'] == 'open' and (
+                product == '' or x['product_id'] == product)]
+        return [x for x in order_ids if self.cancel_order(x) == [x]]
+
+    def render(self, order):
+        """Order as the REST API returns it
+        """
+        result = {
+            'id': order['id'],
+            'product_id': order['product_id'],
+            'side': order['side'],
+            'type': order['type'],
+            'price': '{:.8f}'.format(order['price']),
+            'size': '{:.8f}'.format(order['size']),
+            'post_only': order['post_only'],
+            'created_at': to_iso(order['created_at']),
+            'filled_size': '{:.8f}'.format(order['filled']),
+            'executed_value': '{:.16f}'.format(order['executed_value']),
+            'fill_fees': '{:.16f}'.format(order['fill_fees']),
+            'status': order['status'],
+            'settled': order['settled'],
+        }
+        if order['type'] == 'stop':
+            result['stop'] = 'entry' if order['side'] == 'buy' else 'loss'
+            result['stop_price'] = result['price']
+        if order['funds'] is not None:
+            result['funds'] = '{:.16f}'.format(order['funds'])
+        if order['status'] == 'done':
+            result['done_at'] = to_iso(order['done_at'])
+            result['done_reason'] = order['done_reason']
+        return result
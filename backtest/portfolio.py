@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Backtest several traders against one shared simulated account, as a Supervisor runs them live.
+
+    python -m backtest.portfolio 2017-11-01 2017-11-10 ETH-USD LTC-USD:4:0.2:0.02 --starting-balance 1000
+
+Each trader is product_id[:order_depth[:wallet_fraction[:delta]]], missing values come from the config file.
+The products' candle streams are heap merged by time and replayed one candle at a time through the simulated
+exchange, so every trader sizes its orders (wallet_fraction of the shared quote balance) against what the
+others currently hold.
+"""
+import argparse
+import heapq
+import json
+import logging
+
+import dateutil.parser
+
+from backtest.candle_store import get_candles
+from backtest.engine import CLOSE
+from backtest.engine import TIME
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from trader.cost_basis import CostBasisTrader
+from trader.supervisor import Supervisor
+
+module_logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    ('product_id', '{:<10}', '{:<10}'),
+    ('fills', '{:>8}', '{:>8}'),
+    ('rejects', '{:>8}', '{:>8}'),
+    ('bought', '{:>14}', '{:>14,.2f}'),
+    ('sold', '{:>14}', '{:>14,.2f}'),
+    ('fees', '{:>10}', '{:>10,.2f}'),
+    ('position', '{:>14}', '{:>14,.8f}'),
+    ('price', '{:>12}', '{:>12,.2f}'),
+    ('pnl', '{:>12}', '{:>12,.2f}'),
+]
+
+
+def parse_spec(spec, order_depth, wallet_fraction, delta):
+    """(product_id, order_depth, wallet_fraction, delta) from product_id[:order_depth[:wallet_fraction[:delta]]]
+    """
+    parts = spec.split(':')
+    defaults = [order_depth, wallet_fraction, delta]
+    for index, value in enumerate(parts[1:4]):
+        defaults[index] = int(value) if index == 0 else float(value)
+    return tuple([parts[0]] + defaults)
+
+
+def candle_stream(product_id, candles):
+    for candle in candles:
+        yield float(candle[TIME]), product_id, candle
+
+
+def merge_candles(candles):
+    """(time, product_id, candle) across every product in time order, from a dict of product_id -> candles
+    each already in time order
+    """
+    return heapq.merge(*[candle_stream(product_id, x) for product_id, x in candles.items()], key=lambda x: x[0])
+
+
+class Portfolio(object):
+    def __init__(self, specs, starting_balance=1000, quote_currency='USD', queue_ahead=0.0, settle_delay=0.0):
+        """
+        :param specs: (product_id, order_depth, wallet_fraction, delta) per cost basis trader.
+        :param starting_balance: Quote currency the traders share.
+        :param queue_ahead: See SimulatedExchange.
+        :param settle_delay: See SimulatedExchange.
+        """
+        self.quote_currency = quote_currency
+        self.starting_balance = starting_balance
+        self.exchange = SimulatedExchange([make_product(x[0]) for x in specs], {quote_currency: starting_balance},
+                                          queue_ahead=queue_ahead, settle_delay=settle_delay)
+        self.specs = specs
+        self.supervisor = None
+        self.candles = 0
+
+    def wait_idle(self):
+        """Block until every trader has handled the messages sent so far
+        """
+        for trader in self.supervisor.traders.values():
+            trader.fill_executor.submit(lambda: None).result()
+
+    def run(self, candles):
+        """Start the traders at the first candle's prices and replay every product's candles interleaved by time
+        :param candles: Dict of product_id -> candles in time order, every trader's product needs some.
+        """
+        for product_id, _, _, _ in self.specs:
+            if len(candles.get(product_id, [])) == 0:
+                raise ValueError('No candles for {}'.format(product_id))
+        for product_id, product_candles in candles.items():
+            self.exchange.set_price(product_id, product_candles[0][CLOSE], product_candles[0][TIME])
+        # Traders read products and balances once through the supervisor, like live
+        self.supervisor = Supervisor(auth_client=self.exchange)
+        for product_id, order_depth, wallet_fraction, delta in self.specs:
+            trader = self.supervisor.add_trader(CostBasisTrader, product_id, order_depth, wallet_fraction,
+                                                delta=delta)
+            # Simulated time, rejects (e.g. another trader took the funds) are retried straight away
+            trader.retry_pause = 0
+        self.exchange.subscribe(self.supervisor.received_message, idle=self.wait_idle)
+        self.supervisor.on_start()
+        for _, product_id, candle in merge_candles(candles):
+            self.exchange.replay_candle(product_id, candle)
+            self.candles += 1
+
+    def stop(self):
+        """Cancel what's left open, releasing holds, and shut the traders down
+        """
+        if self.supervisor is not None:
+            for trader in self.supervisor.traders.values():
+                trader.cancel_all()
+                trader.stop()
+        self.exchange.close()
+
+    def results(self):
+        """A row per product and a total row. P&L is what was received for sales less what buys cost and fees,
+        plus the base currency still held marked at the last price.
+        """
+        rows = []
+        for product_id, _, _, _ in self.specs:
+            orders = [x for x in self.exchange.orders.values() if x['product_id'] == product_id]
+            bought = sum(x['executed_value'] for x in orders if x['side'] == 'buy')
+            sold = sum(x['executed_value'] for x in orders if x['side'] == 'sell')
+            fees = sum(x['fill_fees'] for x in orders)
+            position = sum(x['filled'] if x['side'] == 'buy' else -x['filled'] for x in orders)
+            price = self.exchange.prices[product_id]
+            rows.append({
+                'product_id': product_id,
+                'fills': sum(1 for x in orders if x['filled'] > 0),
+                'rejects': self.supervisor.traders[product_id].metrics.get('order_rejects'),
+                'bought': bought,
+                'sold': sold,
+                'fees': fees,
+                'position': position,
+                'price': price,
+                'pnl': sold - bought - fees + position * price,
+            })
+        rows.append({
+            'product_id': 'Total',
+            'fills': sum(x['fills'] for x in rows),
+            'rejects': sum(x['rejects'] for x in rows),
+            'bought': sum(x['bought'] for x in rows),
+            'sold': sum(x['sold'] for x in rows),
+            'fees': sum(x['fees'] for x in rows),
+            'position': None,
+            'price': None,
+            'pnl': self.exchange.value(self.quote_currency) - self.starting_balance,
+        })
+        return rows
+
+
+def format_results(results):
+    lines = [''.join(header.format(name) for name, header, _ in COLUMNS)]
+    for row in results:
+        # Blank where a value doesn't apply, e.g. position on the total row
+        lines.append(''.join(header.format('') if row[name] is None else value.format(row[name])
+                             for name, header, value in COLUMNS))
+    return lines
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Backtest several cost basis traders sharing one account')
+    parser.add_argument('start_time', type=dateutil.parser.parse)
+    parser.add_argument('end_time', type=dateutil.parser.parse)
+    parser.add_argument('traders', nargs='+', metavar='PRODUCT_ID[:ORDER_DEPTH[:WALLET_FRACTION[:DELTA]]]')
+    parser.add_argument('--starting-balance', type=float, default=1000)
+    parser.add_argument('--config-file', default='config/sandbox.json', help='Default cost basis parameters')
+    parser.add_argument('--store', default=None, help='Candle store directory, missing candles are added to it')
+    parser.add_argument('--offline', action='store_true', help='Only use candles already in the store')
+    parser.add_argument('--queue-ahead', type=float, default=0.0,
+                        help='Base currency queued ahead of each order at its price')
+    parser.add_argument('--settle-delay', type=float, default=0.0, help='Seconds from fill to settled')
+    args = parser.parse_args()
+
+    with open(args.config_file) as config:
+        data = json.load(config)['cost_basis']
+    specs = [parse_spec(x, data['order_depth'], data['wallet_fraction'], data.get('delta', 0.01))
+             for x in args.traders]
+    candles = {x[0]: get_candles(x[0], args.start_time, args.end_time, store=args.store, offline=args.offline)
+               for x in specs}
+
+    portfolio = Portfolio(specs, starting_balance=args.starting_balance, queue_ahead=args.queue_ahead,
+                          settle_delay=args.settle_delay)
+    try:
+        portfolio.run(candles)
+    except ValueError as e:
+        parser.error('{} from {} to {}'.format(e, args.start_time, args.end_time))
+    finally:
+        portfolio.stop()
+    module_logger.info('Ending balances:{}'.format(json.dumps(portfolio.exchange.get_accounts(), indent=4,
+                                                              sort_keys=True)))
+    for line in format_results(portfolio.results()):
+        print(line)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""Backtest every combination of cost basis parameters over one candle history, in parallel.
+
+    python -m backtest.sweep ETH-USD 2017-11-01 2017-11-10 --order-depth 4 6 8 --wallet-fraction 0.1 0.13 \
+        --delta 0.01 0.02
+
+The candles are loaded once into shared memory and every worker process reads that same copy.
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import dateutil.parser
+import numpy as np
+
+from backtest.candle_store import get_candles
+from backtest.engine import Backtest
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.cost_basis import CostBasisTrader
+
+module_logger = logging.getLogger(__name__)
+
+# Set in each worker by attach_candles
+_shared = None
+_candles = None
+
+COLUMNS = [
+    ('order_depth', '{:>12}', '{:>12}'),
+    ('wallet_fraction', '{:>16}', '{:>16}'),
+    ('delta', '{:>8}', '{:>8}'),
+    ('final_balance', '{:>14}', '{:>14,.2f}'),
+    ('trades', '{:>8}', '{:>8}'),
+    ('fees', '{:>10}', '{:>10,.2f}'),
+    ('max_depth', '{:>10}', '{:>10}'),
+    ('drawdown', '{:>10}', '{:>10.2%}'),
+]
+
+
+def attach_candles(name, shape):
+    """Worker initializer, view the parent's shared candle array without copying it
+    """
+    global _shared, _candles
+    # Every fill and max depth hit is logged, far too chatty across a sweep
+    logging.disable(logging.WARNING)
+    _shared = shared_memory.SharedMemory(name=name)
+    _candles = np.ndarray(shape, dtype=np.float64, buffer=_shared.buf)
+
+
+def run_backtest(product_id, order_depth, wallet_fraction, delta, starting_balance, candles=None):
+    """One backtest on the given (or the worker's shared) candles, returns a results row
+    """
+    if candles is None:
+        candles = _candles
+    client = AuthenticatedClientRegression(product_id, candles[0].tolist(), starting_balance=starting_balance)
+    trader = CostBasisTrader(product_id, order_depth, wallet_fraction, delta=delta, auth_client=client)
+    try:
+        trader.on_start()
+        backtest = Backtest(trader, client)
+        backtest.run(candles)
+    finally:
+        trader.stop()
+    return {
+        'order_depth': order_depth,
+        'wallet_fraction': wallet_fraction,
+        'delta': delta,
+        'final_balance': backtest.total(),
+        'trades': backtest.total_trades,
+        'fees': backtest.fees,
+        'max_depth': backtest.max_depth,
+        'drawdown': backtest.drawdown(candles),
+    }
+
+
+def sweep(product_id, candles, order_depths, wallet_fractions, deltas, starting_balance=1000, workers=None):
+    """Backtest every parameter combination across a process pool, rows sorted best final balance first
+    """
+    candles = np.ascontiguousarray(candles, dtype=np.float64)
+    shared = shared_memory.SharedMemory(create=True, size=max(candles.nbytes, 1))
+    try:
+        np.ndarray(candles.shape, dtype=np.float64, buffer=shared.buf)[:] = candles
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=attach_candles,
+                                 initargs=(shared.name, candles.shape)) as executor:
+            futures = [executor.submit(run_backtest, product_id, order_depth, wallet_fraction, delta,
+                                       starting_balance)
+                       for order_depth, wallet_fraction, delta in itertools.product(order_depths, wallet_fractions,
+                                                                                    deltas)]
+            results = [x.result() for x in futures]
+    finally:
+        shared.close()
+        shared.unlink()
+    return sorted(results, key=lambda x: x['final_balance'], reverse=True)
+
+
+def format_results(results):
+    lines = [''.join(header.format(name) for name, header, _ in COLUMNS)]
+    for row in results:
+        lines.append(''.join(value.format(row[name]) for name, _, value in COLUMNS))
+    return lines
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Backtest a grid of cost basis parameters in parallel')
+    parser.add_argument('product_id', nargs='?', default='ETH-USD')
+    parser.add_argument('start_time', nargs='?', type=dateutil.parser.parse,
+                        default=datetime.utcnow() - timedelta(days=10))
+    parser.add_argument('end_time', nargs='?', type=dateutil.parser.parse, default=datetime.utcnow())
+    parser.add_argument('--order-depth', type=int, nargs='+', default=[6])
+    parser.add_argument('--wallet-fraction', type=float, nargs='+', default=[0.13])
+    parser.add_argument('--delta', type=float, nargs='+', default=[0.01])
+    parser.add_argument('--starting-balance', type=float, default=1000)
+    parser.add_argument('--workers', type=int, default=None, help='Processes, defaults to the number of cores')
+    parser.add_argument('--store', default=None, help='Candle store directory, missing candles are added to it')
+    parser.add_argument('--offline', action='store_true', help='Only use candles already in the store')
+    args = parser.parse_args()
+
+    candles = get_candles(args.product_id, args.start_time, args.end_time, store=args.store, offline=args.offline)
+    results = sweep(args.product_id, candles, args.order_depth, args.wallet_fraction, args.delta,
+                    starting_balance=args.starting_balance, workers=args.workers)
+    for line in format_results(results):
+        print(line)
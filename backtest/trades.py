@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Trade by trade history for replaying through the simulated exchange, so fills land in the order the market
+actually traded instead of being guessed from minute candles.
+
+    python -m backtest.trades record ETH-USD 2017-11-01 2017-11-02 trades.csv
+
+Everything is a generator, API pages or file lines -> (time, price, size) -> time window -> exchange, so only a
+page of trades is in memory at a time however many are replayed. The API serves at most 100 trades a request,
+record once then replay from the file.
+"""
+import argparse
+import csv
+import logging
+import time
+
+import dateutil.parser
+
+from backtest.candle_store import to_timestamp
+from gdax.public_client import ApiError
+from gdax.public_client import PublicClient
+
+module_logger = logging.getLogger(__name__)
+
+# Most the trades endpoint returns a request
+PAGE_SIZE = 100
+# Trades between throughput log lines
+REPORT_EVERY = 1000000
+
+
+def parse_time(value):
+    """Epoch seconds from epoch seconds or an ISO 8601 time as the API returns them
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return dateutil.parser.isoparse(value).timestamp()
+
+
+def parse_trade(trade):
+    """(time, price, size) from a trade as returned by get_product_trades
+    """
+    return parse_time(trade['time']), float(trade['price']), float(trade['size'])
+
+
+def get_page(client, product_id, **kwargs):
+    page, _, _ = client.get_product_trades_page(product_id, **kwargs)
+    if isinstance(page, dict):
+        raise ApiError(page.get('message', page))
+    return page
+
+
+def find_trade_id(client, product_id, timestamp):
+    """Id of the first trade at or after the time (one past the latest if there isn't one), by bisecting
+    trade ids with single trade pages
+    """
+    latest = get_page(client, product_id, limit=1)
+    if not latest:
+        return 1
+    low, high = 1, latest[0]['trade_id'] + 1
+    while low < high:
+        middle = (low + high) // 2
+        # The newest trade with id <= middle, ids can have gaps
+        page = get_page(client, product_id, after=middle + 1, limit=1)
+        if page and parse_time(page[0]['time']) >= timestamp:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def iter_api_trades(client, product_id, start, page_size=PAGE_SIZE):
+    """API trades from the start time onwards, oldest first, walking forward a page at a time with `before`
+    cursors until caught up with the latest trade
+    """
+    before = find_trade_id(client, product_id, to_timestamp(start)) - 1
+    while True:
+        page = get_page(client, product_id, before=before, limit=page_size)
+        if not page:
+            return
+        # Pages are newest first
+        for trade in reversed(page):
+            yield trade
+        before = max(x['trade_id'] for x in page)
+
+
+def read_trades(path):
+    """(time, price, size) from a CSV file of time, price, size rows (header optional, time as epoch
+    seconds or ISO 8601), one line at a time
+    """
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            try:
+                yield parse_time(row[0]), float(row[1]), float(row[2])
+            except ValueError:
+                # Header
+                continue
+
+
+def write_trades(path, trades):
+    """Write (time, price, size) trades as CSV, returns how many
+    """
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time', 'price', 'size'])
+        for trade in trades:
+            writer.writerow([repr(x) for x in trade])
+            count += 1
+    return count
+
+
+def window(trades, start=None, end=None):
+    """Trades (in time order) with start <= time < end, stopping at the first one past the end
+    """
+    start = None if start is None else to_timestamp(start)
+    end = None if end is None else to_timestamp(end)
+    for trade in trades:
+        if end is not None and trade[0] >= end:
+            return
+        if start is None or trade[0] >= start:
+            yield trade
+
+
+def get_trades(product_id, start, end, path=None, client=None):
+    """(time, price, size) trades in the period from a recorded file, or the API if no path
+    """
+    if path is not None:
+        return window(read_trades(path), start, end)
+    client = client if client is not None else PublicClient()
+    return window(map(parse_trade, iter_api_trades(client, product_id, start)), start, end)
+
+
+class Meter(object):
+    def __init__(self, trades, report_every=REPORT_EVERY):
+        """Pass trades through, counting them and logging throughput as they go.
+        :param trades: Iterable of trades.
+        :param report_every: Trades between log lines, None for none.
+        """
+        self.trades = trades
+        self.report_every = report_every
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        start = time.perf_counter()
+        try:
+            for trade in self.trades:
+                yield trade
+                self.count += 1
+                if self.report_every and self.count % self.report_every == 0:
+                    module_logger.info('Replayed {:,} trades, {:,.0f} trades/sec'.format(
+                        self.count, self.count / (time.perf_counter() - start)))
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def rate(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Record trade history for replay')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help='Fetch trades for a period from the API into a CSV file')
+    record.add_argument('product_id')
+    record.add_argument('start_time', type=dateutil.parser.parse)
+    record.add_argument('end_time', type=dateutil.parser.parse)
+    record.add_argument('csv_file')
+    args = parser.parse_args()
+
+    meter = Meter(get_trades(args.product_id, args.start_time, args.end_time), report_every=100000)
+    print('Recorded {:,} trades'.format(write_trades(args.csv_file, meter)))
@@ -3,9 +3,13 @@
 import json
 import logging.config
 import sys
+from time import monotonic
 from time import sleep
 
 from gdax.authenticated_client import AuthenticatedClient
+from trader.ticker_cache import TickerCache
+from trader.ticker_cache import TickerFeed
+from trader.ticker_cache import value_accounts
 
 logging.config.dictConfig({
     'version': 1,
@@ -42,6 +46,11 @@ if __name__ == '__main__':
         file = 'config/prod.json'
     else:
         file = sys.argv[1]
+    # Seconds between balance lines, prices come off the websocket so this can be short
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 300
+    # Seconds between account refreshes over REST, balances only move on fills so they're valued from the last
+    # refresh in between
+    accounts_interval = float(sys.argv[3]) if len(sys.argv) > 3 else max(interval, 900)
 
     with open(file) as config:
         data = json.load(config)
@@ -52,24 +61,26 @@ if __name__ == '__main__':
         data['auth']['phrase'],
         api_url=data['endpoints']['rest']
     )
+    tickers = TickerCache(auth_client)
+    feed = TickerFeed(tickers, [x['id'] for x in auth_client.get_products() if x['quote_currency'] == 'USD'],
+                      data['endpoints']['socket'])
+    try:
+        feed.connect()
+    except Exception:
+        module_logger.exception('Unable to connect ticker feed, pricing over REST')
+    accounts = None
+    refreshed = 0.0
     running = True
     while running:
         try:
-            total = 0.0
-            accounts = auth_client.get_accounts()
-            message_parts = []
-            for account in accounts:
-                balance = float(account['balance'])
-                if balance > 0:
-                    currency = account['currency']
-                    if currency != 'USD':
-                        product = '{}-USD'.format(currency)
-                        ask = float(auth_client.get_product_ticker(product)['ask'])
-                        balance = balance * ask
-                        if balance > 1:
-                            message_parts.append('{:,.2f} {} @ {}'.format(balance, currency, ask))
-                    total += balance
+            if accounts is None or monotonic() - refreshed >= accounts_interval:
+                accounts = auth_client.get_accounts()
+                refreshed = monotonic()
+            total, rows = value_accounts(accounts, tickers)
+            message_parts = ['{:,.2f} {} @ {}'.format(value, currency, ask) for currency, balance, ask, value in rows
+                             if ask is not None and value > 1]
             module_logger.info('{:,.2f}|{}'.format(total, '|'.join(message_parts)))
-            sleep(300)
+            sleep(interval)
         except KeyboardInterrupt:
             running = False
+    feed.close()
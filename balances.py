@@ -4,6 +4,8 @@ import json
 import sys
 
 from gdax.authenticated_client import AuthenticatedClient
+from trader.ticker_cache import TickerCache
+from trader.ticker_cache import value_accounts
 
 if __name__ == '__main__':
 
@@ -21,18 +23,10 @@ if __name__ == '__main__':
         data['auth']['phrase'],
         api_url=data['endpoints']['rest']
     )
-    accounts = auth_client.get_accounts()
-    total = 0.0
-    for account in accounts:
-        balance = float(account['balance'])
-        if balance > 0:
-            currency = account['currency']
-            if currency != 'USD':
-                product = '{}-USD'.format(currency)
-                ask = float(auth_client.get_product_ticker(product)['ask'])
-                print('{} balance: {:,} @ {}'.format(currency, balance, ask))
-                balance = balance * ask
-            else:
-                print('USD balance: {:,}'.format(balance))
-            total += balance
+    total, rows = value_accounts(auth_client.get_accounts(), TickerCache(auth_client))
+    for currency, balance, ask, value in rows:
+        if ask is not None:
+            print('{} balance: {:,} @ {}'.format(currency, balance, ask))
+        else:
+            print('USD balance: {:,}'.format(balance))
     print('Total sell balance: {:,.2f}'.format(total))
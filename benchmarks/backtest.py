@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Candles/sec through the regression loop (on_tick every candle) vs the vectorized jump-to-fill engine.
+
+    python -m benchmarks.backtest [candles]
+"""
+import logging
+import sys
+import time
+
+from backtest.engine import Backtest
+from backtest.engine import random_candles
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.cost_basis import CostBasisTrader
+
+
+def candles_per_sec(candles, vectorized):
+    client = AuthenticatedClientRegression('ETH-USD', candles[0].tolist(), starting_balance=1000)
+    trader = CostBasisTrader('ETH-USD', 6, 0.13, delta=0.01, auth_client=client)
+    trader.on_start()
+    backtest = Backtest(trader, client)
+    start = time.perf_counter()
+    if vectorized:
+        backtest.run(candles)
+    else:
+        backtest.run_loop(candles)
+    elapsed = time.perf_counter() - start
+    trader.stop()
+    return len(candles) / elapsed, backtest.total_trades
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    candles = random_candles(count)
+    print('{} candles'.format(count))
+    print('{:<12}{:>14}{:>10}'.format('engine', 'candles/sec', 'fills'))
+    for name, vectorized in (('loop', False), ('vectorized', True)):
+        rate, fills = candles_per_sec(candles, vectorized)
+        print('{:<12}{:>14,.0f}{:>10}'.format(name, rate, fills))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""Brackets/sec for the cost basis bracket computation, from a fill's API strings to the sell and next buy
+payload strings, with floats (as the trader used to), Decimal quantized to the product's steps (as it does now)
+and exact integer ticks (prices in cents, sizes in satoshis) in pure Python.
+
+    python -m benchmarks.brackets [fills]
+
+Each path runs several times interleaved with the others and the best rate is kept, so a busy machine
+affects them alike.
+
+Also counts how many running cost basis totals drift from the exact Decimal result with floats.
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+
+from trader.base_trader import CENT
+from trader.base_trader import SATOSHI
+from trader.base_trader import decimal_string
+from trader.base_trader import round_step
+
+DELTA = 0.01
+ORDER_SIZE = 1000.0
+REPEATS = 5
+POWERS = [10 ** x for x in range(20)]
+
+
+def random_fills(count, seed=42):
+    """(filled_size, price) strings as the API sends them
+    """
+    rand = random.Random(seed)
+    return [('{:.8f}'.format(rand.uniform(0.01, 20)), '{:.2f}'.format(rand.uniform(50, 150)))
+            for _ in range(count)]
+
+
+def float_brackets(fills):
+    """The old path, round() to increments and str() of floats"""
+    paid = bought = 0.0
+    for filled_size, price in fills:
+        paid += float(price) * float(filled_size)
+        bought += float(filled_size)
+        cost_basis = paid / bought
+        sell_price = cost_basis * (1 + DELTA)
+        next_size = (paid + ORDER_SIZE) / (cost_basis * (1 - DELTA)) - bought
+        buy_price = ORDER_SIZE / next_size
+        payload = (str(round(bought, 8)), str(round(sell_price - round(sell_price), 2) + round(sell_price)),
+                   str(round(next_size, 8)), str(round(buy_price - round(buy_price), 2) + round(buy_price)))
+    return paid, payload
+
+
+def decimal_brackets(fills):
+    """As CostBasisTrader and Ladder do it"""
+    paid = bought = Decimal(0)
+    delta = Decimal(repr(DELTA))
+    order_size = Decimal(repr(ORDER_SIZE))
+    for filled_size, price in fills:
+        filled = Decimal(filled_size)
+        paid += filled * Decimal(price)
+        bought += filled
+        sell_price = round_step(paid * (1 + delta) / bought, CENT)
+        next_size = round_step((paid + order_size) * bought / (paid * (1 - delta)), SATOSHI) - bought
+        buy_price = round_step(order_size / next_size, CENT)
+        payload = (decimal_string(bought), decimal_string(sell_price), decimal_string(next_size),
+                   decimal_string(buy_price))
+    return paid, payload
+
+
+def to_ticks(value, decimals):
+    """Integer ticks of 10**-decimals in an API decimal string, straight from its digits
+    """
+    point = value.find('.')
+    if point < 0:
+        return int(value) * POWERS[decimals]
+    places = len(value) - point - 1
+    ticks = int(value.replace('.', ''))
+    if places <= decimals:
+        return ticks * POWERS[decimals - places]
+    return round_div(ticks, POWERS[places - decimals])
+
+
+def round_div(numerator, denominator):
+    """Positive numerator / denominator to the nearest int, halves to even"""
+    quotient, remainder = divmod(numerator, denominator)
+    remainder += remainder
+    if remainder > denominator or remainder == denominator and quotient & 1:
+        quotient += 1
+    return quotient
+
+
+def format_ticks(ticks, decimals):
+    whole, fraction = divmod(ticks, POWERS[decimals])
+    return '%d.%0*d' % (whole, decimals, fraction)
+
+
+def tick_brackets(fills):
+    """Integer ticks: paid at 10 places (a size times a price), bought at 8, prices at 2, delta at its 2"""
+    paid = bought = 0
+    scale = 100
+    delta = round(DELTA * scale)
+    order_size = round(ORDER_SIZE * POWERS[10])
+    for filled_size, price in fills:
+        filled = to_ticks(filled_size, 8)
+        paid += filled * to_ticks(price, 2)
+        bought += filled
+        sell_price = round_div(paid * (scale + delta), bought * scale)
+        next_size = round_div((paid + order_size) * bought * scale, paid * (scale - delta)) - bought
+        buy_price = round_div(order_size, next_size)
+        payload = (format_ticks(bought, 8), format_ticks(sell_price, 2), format_ticks(next_size, 8),
+                   format_ticks(buy_price, 2))
+    return paid, payload
+
+
+def drifted(fills):
+    """Running totals where float paid differs from the exact value"""
+    paid_float = 0.0
+    paid_exact = Decimal(0)
+    count = 0
+    for filled_size, price in fills:
+        paid_float += float(price) * float(filled_size)
+        paid_exact += Decimal(price) * Decimal(filled_size)
+        count += Decimal(repr(paid_float)) != paid_exact
+    return count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    fills = random_fills(count)
+    paths = [('float', float_brackets), ('decimal', decimal_brackets), ('ticks', tick_brackets)]
+    best = {}
+    for _ in range(REPEATS):
+        for name, brackets in paths:
+            start = time.perf_counter()
+            brackets(fills)
+            best[name] = max(best.get(name, 0), count / (time.perf_counter() - start))
+    print('{:<10}{:>14}{:>10}'.format('path', 'brackets/sec', 'vs float'))
+    for name, _ in paths:
+        print('{:<10}{:>14,.0f}{:>10.2f}'.format(name, best[name], best[name] / best['float']))
+    print('Float cost basis off the exact total after {:,} of {:,} fills'.format(drifted(fills), count))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Websocket messages/sec through the old decode-everything path vs the peek and dispatch table path.
+
+    python -m benchmarks.dispatch [recorded.ndjson]
+
+Replays a recorded stream (one raw message per line) if given, else a synthetic one shaped like a
+supervisor feed: heartbeats for several products, level2 updates and user channel fills.
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+from trader.dispatch import JSON_BACKEND
+from trader.dispatch import LazyJson
+from trader.dispatch import MessageDispatcher
+
+module_logger = logging.getLogger(__name__)
+PRODUCT_ID = 'ETH-USD'
+
+
+def synthetic_stream(count, seed=1):
+    rand = random.Random(seed)
+    products = ['ETH-USD', 'LTC-USD', 'BTC-USD']
+    messages = []
+    for sequence in range(count):
+        product_id = rand.choice(products)
+        roll = rand.random()
+        if roll < 0.80:
+            message = {
+                'type': 'l2update',
+                'product_id': product_id,
+                'time': '2017-12-01T00:00:00.000000Z',
+                'changes': [[rand.choice(['buy', 'sell']), '{:.2f}'.format(rand.uniform(90, 110)),
+                             '{:.8f}'.format(rand.uniform(0, 5))]],
+            }
+        elif roll < 0.95:
+            message = {
+                'type': 'heartbeat',
+                'product_id': product_id,
+                'sequence': sequence,
+                'last_trade_id': sequence,
+                'time': '2017-12-01T00:00:00.000000Z',
+            }
+        else:
+            message = {
+                'type': rand.choice(['received', 'open', 'match', 'done']),
+                'product_id': product_id,
+                'sequence': sequence,
+                'order_id': '{:032x}'.format(rand.getrandbits(128)),
+                'maker_order_id': '{:032x}'.format(rand.getrandbits(128)),
+                'taker_order_id': '{:032x}'.format(rand.getrandbits(128)),
+                'side': 'buy',
+                'price': '100.00',
+                'remaining_size': '0.00000000',
+                'reason': 'filled',
+                'time': '2017-12-01T00:00:00.000000Z',
+            }
+        messages.append(json.dumps(message))
+    return messages
+
+
+def handle(message):
+    pass
+
+
+def old_path(raw):
+    """The previous Trader.received_message/on_message, minus the handling itself
+    """
+    message = json.loads(raw)
+    if message.get('product_id', '') != PRODUCT_ID:
+        return
+    message_type = message.get('type', '')
+    log_message = '{}|Message from websocket:{}'.format(PRODUCT_ID, json.dumps(message, indent=4, sort_keys=True))
+    if message_type == 'heartbeat':
+        module_logger.debug(log_message)
+    elif message_type == 'done':
+        module_logger.debug(log_message)
+        handle(message)
+    elif message_type == 'match':
+        module_logger.debug(log_message)
+        handle(message)
+
+
+def log_and_handle(message):
+    module_logger.debug('%s|Message from websocket:%s', PRODUCT_ID, LazyJson(message))
+    handle(message)
+
+
+def msgs_per_sec(fn, messages):
+    start = time.perf_counter()
+    for raw in messages:
+        fn(raw)
+    return len(messages) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            messages = [x.strip() for x in f if x.strip()]
+    else:
+        messages = synthetic_stream(200000)
+    dispatcher = MessageDispatcher({x: log_and_handle for x in ('heartbeat', 'done', 'match')},
+                                   product_ids=[PRODUCT_ID])
+    print('{} messages, {} backend'.format(len(messages), JSON_BACKEND))
+    print('{:<12}{:>14}'.format('path', 'msgs/sec'))
+    print('{:<12}{:>14,.0f}'.format('old', msgs_per_sec(old_path, messages)))
+    print('{:<12}{:>14,.0f}'.format('dispatch', msgs_per_sec(dispatcher.dispatch, messages)))
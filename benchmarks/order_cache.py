@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Lookup/insert/remove cost of the open order cache vs the old list based sliding window.
+
+    python -m benchmarks.order_cache [ops]
+"""
+import sys
+import timeit
+import uuid
+
+from trader.order_cache import OrderCache
+
+
+class ListWindow(object):
+    """The previous implementation, a list with pop(0) eviction and rebuild on remove
+    """
+
+    def __init__(self, order_ids, capacity):
+        self.ids = list(order_ids)
+        self.capacity = capacity
+
+    def add(self, order_id):
+        self.ids.append(order_id)
+        if len(self.ids) > self.capacity:
+            self.ids.pop(0)
+
+    def discard(self, order_id):
+        self.ids = [x for x in self.ids if x != order_id]
+
+    def __contains__(self, order_id):
+        return order_id in self.ids
+
+
+def per_op_us(cache, ids, ops):
+    """Microseconds per lookup (half hits), insert (with eviction) and remove
+    """
+    probes = [ids[i % len(ids)] if i % 2 else str(uuid.uuid4()) for i in range(ops)]
+    new_ids = [str(uuid.uuid4()) for _ in range(ops)]
+    lookup = timeit.timeit(lambda: [x in cache for x in probes], number=1)
+    insert = timeit.timeit(lambda: [cache.add(x) for x in new_ids], number=1)
+    remove = timeit.timeit(lambda: [cache.discard(x) for x in new_ids], number=1)
+    return [x / ops * 1e6 for x in (lookup, insert, remove)]
+
+
+if __name__ == '__main__':
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print('{:<12}{:>8}{:>14}{:>14}{:>14}'.format('cache', 'ids', 'lookup us', 'insert us', 'remove us'))
+    for size in (1000, 10000, 100000):
+        ids = [str(uuid.uuid4()) for _ in range(size)]
+        for name, cache in (('list', ListWindow(ids, size)), ('OrderCache', OrderCache(ids, capacity=size))):
+            print('{:<12}{:>8}{:>14.3f}{:>14.3f}{:>14.3f}'.format(name, size, *per_op_us(cache, ids, ops)))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Candles/sec through the regression loop (on_tick every candle) with the indexed regression client vs the old
+list scan, over a year and a bit of minute candles by default.
+
+    python -m benchmarks.regression_client [candles]
+"""
+import logging
+import sys
+import time
+
+from backtest.engine import Backtest
+from backtest.engine import random_candles
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.cost_basis import CostBasisTrader
+
+
+class ListScanClient(AuthenticatedClientRegression):
+    """The previous on_tick, partitioning the open orders and parsing their prices on every candle
+    """
+
+    def on_tick(self, low, high):
+        buy_orders = [x for x in self.orders if x['side'] == 'buy']
+        sell_orders = [x for x in self.orders if x['side'] == 'sell']
+        for buy_order in buy_orders:
+            if (buy_order['type'] == 'stop' and float(high) >= float(buy_order['price'])) or float(low) <= float(
+                    buy_order['price']):
+                return buy_order
+        for sell_order in sell_orders:
+            if float(high) >= float(sell_order['price']):
+                return sell_order
+        return None
+
+
+def candles_per_sec(client_class, candles):
+    client = client_class('ETH-USD', list(candles[0]), starting_balance=1000)
+    trader = CostBasisTrader('ETH-USD', 6, 0.13, delta=0.01, auth_client=client)
+    trader.on_start()
+    backtest = Backtest(trader, client)
+    start = time.perf_counter()
+    backtest.run_loop(candles)
+    elapsed = time.perf_counter() - start
+    trader.stop()
+    return len(candles) / elapsed, backtest.total_trades
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    # Plain lists, as the loop would step over candles from the API
+    candles = random_candles(count).tolist()
+    print('{} candles'.format(count))
+    print('{:<12}{:>14}{:>10}'.format('client', 'candles/sec', 'fills'))
+    for name, client_class in (('list scan', ListScanClient), ('indexed', AuthenticatedClientRegression)):
+        rate, fills = candles_per_sec(client_class, candles)
+        print('{:<12}{:>14,.0f}{:>10}'.format(name, rate, fills))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Per-call REST latency with a fresh connection per call vs the pooled keep-alive session.
+
+Runs against a local stub server so it only measures client/connection overhead. Plain HTTP
+means no TLS handshake is saved here, against the real exchange the gap is considerably wider.
+
+    python -m benchmarks.session_latency [calls]
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from gdax.public_client import PublicClient
+from gdax.rate_limit import RequestScheduler
+from gdax.session import create_session
+
+TICKER = json.dumps({
+    'trade_id': 4729088,
+    'price': '333.99',
+    'size': '0.193',
+    'bid': '333.98',
+    'ask': '333.99',
+    'volume': '5957.11914015',
+    'time': '2015-11-14T20:46:03.511254Z',
+}).encode('utf-8')
+# Connection overhead only, no waiting on the exchange rate limits
+UNLIMITED = RequestScheduler(public_rate=1e6, public_burst=1e6, private_rate=1e6, private_burst=1e6)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes, don't let delayed ACKs stall kept-alive sockets
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(TICKER)))
+        self.end_headers()
+        self.wfile.write(TICKER)
+
+    def log_message(self, *args):
+        pass
+
+
+class UnpooledClient(PublicClient):
+    """Pre-session behaviour, a module level requests call (and so a new connection) per call
+    """
+
+    def _request(self, method, url, **kwargs):
+        return requests.request(method, url, **kwargs)
+
+
+def time_calls(client, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client.get_product_ticker('ETH-USD')
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'mean': sum(samples) / len(samples),
+        'p50': samples[len(samples) // 2],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    results = [
+        ('fresh connection', time_calls(UnpooledClient(api_url=url, scheduler=UNLIMITED), calls)),
+        ('pooled session', time_calls(PublicClient(api_url=url, session=create_session(), scheduler=UNLIMITED),
+                                      calls)),
+    ]
+    print('{:<18}{:>12}{:>12}{:>12}'.format('client', 'mean ms', 'p50 ms', 'p99 ms'))
+    for name, stats in results:
+        print('{:<18}{:>12.3f}{:>12.3f}{:>12.3f}'.format(
+            name, stats['mean'] * 1000, stats['p50'] * 1000, stats['p99'] * 1000))
+    server.shutdown()
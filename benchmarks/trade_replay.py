@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Trades/sec replayed from a recorded file through the simulated exchange into a cost basis trader.
+
+    python -m benchmarks.trade_replay [trades]
+
+Trades are written to and read back from a temporary CSV as a stream, memory stays flat with the count.
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from backtest.trades import Meter
+from backtest.trades import read_trades
+from backtest.trades import write_trades
+from trader.cost_basis import CostBasisTrader
+
+
+def random_trades(count, seed=42, start=100.0, volatility=0.0002):
+    """Synthetic trades a tenth of a second apart, a random walk in 2dp prices
+    """
+    rand = random.Random(seed)
+    price = start
+    for i in range(count):
+        price *= 1 + rand.gauss(0, volatility)
+        yield 1500000000 + i / 10, round(price, 2), round(rand.expovariate(2), 8)
+
+
+def replay(path):
+    exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000})
+    exchange.set_price('ETH-USD', 100.0)
+    trader = CostBasisTrader('ETH-USD', 6, 0.13, delta=0.01, auth_client=exchange)
+    exchange.subscribe(trader.received_message, idle=lambda: trader.fill_executor.submit(lambda: None).result())
+    trader.on_start()
+    trades = Meter(read_trades(path), report_every=None)
+    exchange.replay_trades('ETH-USD', trades)
+    trader.stop()
+    exchange.close()
+    return trades, exchange.fills
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        write_trades(path, random_trades(count))
+        print('Wrote {:,} trades in {:.1f}s'.format(count, time.perf_counter() - start))
+        parsed = Meter(read_trades(path), report_every=None)
+        for _ in parsed:
+            pass
+        print('{:<10}{:>14}{:>10}'.format('stage', 'trades/sec', 'fills'))
+        print('{:<10}{:>14,.0f}{:>10}'.format('read', parsed.rate(), ''))
+        trades, fills = replay(path)
+        print('{:<10}{:>14,.0f}{:>10}'.format('replay', trades.rate(), fills))
+    finally:
+        os.remove(path)
@@ -1,2 +1,4 @@
+from gdax.async_client import AsyncAuthenticatedClient
+from gdax.async_client import AsyncPublicClient
 from gdax.authenticated_client import AuthenticatedClient
 from gdax.public_client import PublicClient
@@ -0,0 +1,229 @@
+import asyncio
+import functools
+import json
+from urllib.parse import urlencode
+
+import aiohttp
+from yarl import URL
+
+from gdax.authenticated_client import GdaxAuth
+from gdax.rate_limit import BACKGROUND
+from gdax.rate_limit import ORDERS
+from gdax.rate_limit import READS
+from gdax.rate_limit import get_scheduler
+from gdax.session import DEFAULT_POOL_MAXSIZE
+from gdax.session import DEFAULT_TIMEOUT
+
+
+class AsyncPublicClient(object):
+    """Asyncio version of `PublicClient`, same methods as coroutines.
+
+    Calls made concurrently (`asyncio.gather`) share the client's connection pool, so one
+    event loop can serve many products. Close the client (or use it as an async context
+    manager) when done to release pooled connections.
+
+    Attributes:
+        url (str): API URL.
+        timeout (float or tuple): (connect, read) timeout for every call.
+
+    """
+    # Which rate limit bucket calls count against
+    private = False
+
+    def __init__(self, api_url='https://api.gdax.com', session=None, timeout=DEFAULT_TIMEOUT,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, keepalive_timeout=30, scheduler=None):
+        """Create asyncio GDAX API public client.
+
+        Args:
+            api_url (Optional[str]): API URL. Defaults to GDAX API.
+            session (Optional[aiohttp.ClientSession]): Session to issue calls
+                on, for sharing one pool between clients. Created on first
+                use (inside the running loop) if not passed in.
+            timeout (Optional[float or tuple]): (connect, read) timeout in
+                seconds.
+            pool_maxsize (Optional[int]): Maximum open connections per host.
+            keepalive_timeout (Optional[float]): Seconds to keep an idle
+                connection open.
+            scheduler (Optional[RequestScheduler]): Rate limiter, defaults
+                to the one shared with the synchronous clients.
+
+        """
+        self.url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        self.session = session
+        self.owns_session = session is None
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None and self.owns_session:
+            await self.session.close()
+            self.session = None
+
+    def get_session(self):
+        if self.session is None:
+            if isinstance(self.timeout, tuple):
+                timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_maxsize,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    def get_headers(self, method, path_url, body):
+        return {}
+
+    async def _request_page(self, method, path, params=None, payload=None, priority=READS):
+        """Issue a call, returning the decoded body and the response headers (for pagination).
+        """
+        path_url = path
+        if params:
+            path_url += '?' + urlencode(params)
+        body = json.dumps(payload) if payload is not None else None
+        # The scheduler blocks, wait for it on a worker thread rather than the loop
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            self.scheduler.acquire, private=self.private, priority=priority))
+        # Sign after the wait so the timestamp is fresh
+        headers = self.get_headers(method, path_url, body)
+        async with self.get_session().request(method, URL(self.url + path_url, encoded=True),
+                                              data=body, headers=headers) as r:
+            # r.raise_for_status()
+            return await r.json(content_type=None), r.headers
+
+    async def _request(self, method, path, params=None, payload=None, priority=READS):
+        result, _ = await self._request_page(method, path, params=params, payload=payload, priority=priority)
+        return result
+
+    async def _paginate(self, path, params=None, priority=READS):
+        """Follow `cb-after` cursors, returning a list of pages like the synchronous client.
+        """
+        params = dict(params or {})
+        result, headers = await self._request_page('GET', path, params=params, priority=priority)
+        result = [result]
+        while 'cb-after' in headers:
+            params['after'] = headers['cb-after']
+            page, headers = await self._request_page('GET', path, params=params, priority=priority)
+            if page:
+                result.append(page)
+        return result
+
+    async def get_products(self):
+        return await self._request('GET', '/products')
+
+    async def get_product_order_book(self, product_id, level=1):
+        return await self._request('GET', '/products/{}/book'.format(product_id), params={'level': level})
+
+    async def get_product_ticker(self, product_id):
+        return await self._request('GET', '/products/{}/ticker'.format(product_id))
+
+    async def get_product_trades(self, product_id):
+        return await self._request('GET', '/products/{}/trades'.format(product_id))
+
+    async def get_product_historic_rates(self, product_id, start=None, end=None, granularity=None):
+        params = {}
+        if start is not None:
+            params['start'] = start
+        if end is not None:
+            params['end'] = end
+        if granularity is not None:
+            params['granularity'] = granularity
+        return await self._request('GET', '/products/{}/candles'.format(product_id), params=params)
+
+    async def get_product_24hr_stats(self, product_id):
+        return await self._request('GET', '/products/{}/stats'.format(product_id))
+
+    async def get_currencies(self):
+        return await self._request('GET', '/currencies')
+
+    async def get_time(self):
+        return await self._request('GET', '/time')
+
+
+class AsyncAuthenticatedClient(AsyncPublicClient):
+    """Asyncio version of `AuthenticatedClient` for the trading and account endpoints.
+
+    Lets a trader issue e.g. the cancel and both bracket orders concurrently::
+
+        await asyncio.gather(
+            client.cancel_order(old_id),
+            client.sell(type='limit', product_id='ETH-USD', price=101.0, size=1.0, post_only=True),
+            client.buy(type='limit', product_id='ETH-USD', price=99.0, size=1.0, post_only=True),
+        )
+
+    """
+    private = True
+
+    def __init__(self, key, b64secret, passphrase, api_url='https://api.gdax.com', session=None,
+                 timeout=DEFAULT_TIMEOUT, pool_maxsize=DEFAULT_POOL_MAXSIZE, keepalive_timeout=30, scheduler=None):
+        super(AsyncAuthenticatedClient, self).__init__(api_url, session=session, timeout=timeout,
+                                                       pool_maxsize=pool_maxsize,
+                                                       keepalive_timeout=keepalive_timeout, scheduler=scheduler)
+        self.auth = GdaxAuth(key, b64secret, passphrase)
+
+    def get_headers(self, method, path_url, body):
+        return self.auth.get_headers(method, path_url, body)
+
+    async def get_account(self, account_id):
+        return await self._request('GET', '/accounts/' + account_id)
+
+    async def get_accounts(self):
+        return await self.get_account('')
+
+    async def get_account_history(self, account_id):
+        return await self._paginate('/accounts/{}/ledger'.format(account_id), priority=BACKGROUND)
+
+    async def get_account_holds(self, account_id):
+        return await self._paginate('/accounts/{}/holds'.format(account_id), priority=BACKGROUND)
+
+    async def buy(self, **kwargs):
+        kwargs['side'] = 'buy'
+        return await self._request('POST', '/orders', payload=kwargs, priority=ORDERS)
+
+    async def sell(self, **kwargs):
+        kwargs['side'] = 'sell'
+        return await self._request('POST', '/orders', payload=kwargs, priority=ORDERS)
+
+    async def cancel_order(self, order_id):
+        return await self._request('DELETE', '/orders/' + order_id, priority=ORDERS)
+
+    async def cancel_all(self, data=None, product=''):
+        if type(data) is dict:
+            if 'product' in data:
+                product = data['product']
+        return await self._request('DELETE', '/orders/', payload={'product_id': product}, priority=ORDERS)
+
+    async def get_order(self, order_id):
+        return await self._request('GET', '/orders/' + order_id)
+
+    async def get_orders(self):
+        return await self._paginate('/orders/')
+
+    async def get_fills(self, order_id='', product_id='', before='', after='', limit=''):
+        params = {}
+        if order_id:
+            params['order_id'] = order_id
+        if product_id:
+            params['product_id'] = product_id
+        if before:
+            params['before'] = before
+        if after:
+            params['after'] = after
+        if limit:
+            # Explicit page size, just the one page
+            params['limit'] = limit
+            return [await self._request('GET', '/fills', params=params, priority=BACKGROUND)]
+        return await self._paginate('/fills', params=params, priority=BACKGROUND)
+
+    async def get_position(self):
+        return await self._request('GET', '/position')
+
+    async def get_trailing_volume(self):
+        return await self._request('GET', '/users/self/trailing-volume')
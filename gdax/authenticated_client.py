@@ -6,19 +6,22 @@ import hmac
 import json
 import time
 
-import requests
 from requests.auth import AuthBase
 
 from gdax.public_client import PublicClient
+from gdax.rate_limit import BACKGROUND
+from gdax.rate_limit import ORDERS
+from gdax.session import DEFAULT_TIMEOUT
 
 
 class AuthenticatedClient(PublicClient):
-    def __init__(self, key, b64secret, passphrase, api_url='https://api.gdax.com'):
-        super(AuthenticatedClient, self).__init__(api_url)
+    def __init__(self, key, b64secret, passphrase, api_url='https://api.gdax.com', session=None,
+                 timeout=DEFAULT_TIMEOUT, scheduler=None):
+        super(AuthenticatedClient, self).__init__(api_url, session=session, timeout=timeout, scheduler=scheduler)
         self.auth = GdaxAuth(key, b64secret, passphrase)
 
     def get_account(self, account_id):
-        r = requests.get(self.url + '/accounts/' + account_id, auth=self.auth)
+        r = self._request('get', self.url + '/accounts/' + account_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -26,57 +29,66 @@ class AuthenticatedClient(PublicClient):
         return self.get_account('')
 
     def get_account_history(self, account_id):
-        result = []
-        r = requests.get(self.url + '/accounts/{}/ledger'.format(account_id), auth=self.auth)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.history_pagination(account_id, result, r.headers['cb-after'])
-        return result
+        return list(self._iter_pages(self.url + '/accounts/{}/ledger'.format(account_id), auth=self.auth,
+                                     priority=BACKGROUND))
+
+    def get_account_history_page(self, account_id, before='', after='', limit=''):
+        """Single ledger page, newest first. Returns (entries, cb-before cursor, cb-after cursor), pass
+        the cb-before cursor back as `before` to get only entries newer than this page.
+        """
+        params = {}
+        if before:
+            params['before'] = before
+        if after:
+            params['after'] = after
+        if limit:
+            params['limit'] = limit
+        return self._get_page(self.url + '/accounts/{}/ledger'.format(account_id), params=params, auth=self.auth,
+                              priority=BACKGROUND)
+
+    def iter_account_history(self, account_id, limit=None, page_size=None, prefetch=False):
+        """Stream ledger entries newest first, a page at a time. Stop consuming (or pass `limit`) to stop
+        requesting pages, `prefetch` fetches the next page while the current one is consumed.
+        """
+        return self._iter_records(self.url + '/accounts/{}/ledger'.format(account_id), limit=limit,
+                                  page_size=page_size, prefetch=prefetch, auth=self.auth, priority=BACKGROUND)
 
     def history_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/ledger?after={}'.format(account_id, str(after)), auth=self.auth)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.history_pagination(account_id, result, r.headers['cb-after'])
+        result.extend(self._iter_pages(self.url + '/accounts/{}/ledger'.format(account_id),
+                                       params={'after': after}, auth=self.auth, priority=BACKGROUND))
         return result
 
     def get_account_holds(self, account_id):
-        result = []
-        r = requests.get(self.url + '/accounts/{}/holds'.format(account_id), auth=self.auth)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.holds_pagination(account_id, result, r.headers['cb-after'])
-        return result
+        return list(self._iter_pages(self.url + '/accounts/{}/holds'.format(account_id), auth=self.auth,
+                                     priority=BACKGROUND))
+
+    def iter_holds(self, account_id, limit=None, page_size=None, prefetch=False):
+        """Stream holds, see `iter_account_history`
+        """
+        return self._iter_records(self.url + '/accounts/{}/holds'.format(account_id), limit=limit,
+                                  page_size=page_size, prefetch=prefetch, auth=self.auth, priority=BACKGROUND)
 
     def holds_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/holds?after={}'.format(account_id, str(after)), auth=self.auth)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.holds_pagination(account_id, result, r.headers['cb-after'])
+        result.extend(self._iter_pages(self.url + '/accounts/{}/holds'.format(account_id),
+                                       params={'after': after}, auth=self.auth, priority=BACKGROUND))
         return result
 
     def buy(self, **kwargs):
         kwargs['side'] = 'buy'
-        r = requests.post(self.url + '/orders',
+        r = self._request('post', self.url + '/orders',
                           data=json.dumps(kwargs),
-                          auth=self.auth)
+                          auth=self.auth, priority=ORDERS)
         return r.json()
 
     def sell(self, **kwargs):
         kwargs['side'] = 'sell'
-        r = requests.post(self.url + '/orders',
+        r = self._request('post', self.url + '/orders',
                           data=json.dumps(kwargs),
-                          auth=self.auth)
+                          auth=self.auth, priority=ORDERS)
         return r.json()
 
     def cancel_order(self, order_id):
-        r = requests.delete(self.url + '/orders/' + order_id, auth=self.auth)
+        r = self._request('delete', self.url + '/orders/' + order_id, auth=self.auth, priority=ORDERS)
         # r.raise_for_status()
         return r.json()
 
@@ -84,81 +96,84 @@ class AuthenticatedClient(PublicClient):
         if type(data) is dict:
             if 'product' in data:
                 product = data['product']
-        r = requests.delete(self.url + '/orders/',
-                            data=json.dumps({'product_id': product}), auth=self.auth)
+        r = self._request('delete', self.url + '/orders/',
+                          data=json.dumps({'product_id': product}), auth=self.auth, priority=ORDERS)
         # r.raise_for_status()
         return r.json()
 
     def get_order(self, order_id):
-        r = requests.get(self.url + '/orders/' + order_id, auth=self.auth)
+        r = self._request('get', self.url + '/orders/' + order_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_orders(self):
-        result = []
-        r = requests.get(self.url + '/orders/', auth=self.auth)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.paginate_orders(result, r.headers['cb-after'])
-        return result
+        return list(self._iter_pages(self.url + '/orders/', auth=self.auth))
+
+    def iter_orders(self, product_id='', status='', limit=None, page_size=None, prefetch=False):
+        """Stream orders (open and pending by default), see `iter_account_history`
+        """
+        params = {}
+        if product_id:
+            params['product_id'] = product_id
+        if status:
+            params['status'] = status
+        return self._iter_records(self.url + '/orders', params=params, limit=limit, page_size=page_size,
+                                  prefetch=prefetch, auth=self.auth)
 
     def paginate_orders(self, result, after):
-        r = requests.get(self.url + '/orders?after={}'.format(str(after)), auth=self.auth)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.paginate_orders(result, r.headers['cb-after'])
+        result.extend(self._iter_pages(self.url + '/orders', params={'after': after}, auth=self.auth))
         return result
 
     def get_fills(self, order_id='', product_id='', before='', after='', limit=''):
-        result = []
-        url = self.url + '/fills?'
-        if order_id:
-            url += 'order_id={}&'.format(str(order_id))
-        if product_id:
-            url += 'product_id={}&'.format(product_id)
+        params = self.fills_params(order_id, product_id)
         if before:
-            url += 'before={}&'.format(str(before))
+            params['before'] = before
         if after:
-            url += 'after={}&'.format(str(after))
+            params['after'] = after
         if limit:
-            url += 'limit={}&'.format(str(limit))
-        r = requests.get(url, auth=self.auth)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers and limit is not len(r.json()):
-            return self.paginate_fills(result, r.headers['cb-after'], order_id=order_id, product_id=product_id)
+            params['limit'] = limit
+        pages = self._iter_pages(self.url + '/fills', params=params, auth=self.auth, priority=BACKGROUND)
+        result = [next(pages)]
+        # A full page of an explicit limit is all that was asked for
+        if limit and isinstance(result[0], list) and len(result[0]) == int(limit):
+            pages.close()
+            return result
+        result.extend(pages)
         return result
 
+    def iter_fills(self, order_id='', product_id='', limit=None, page_size=None, prefetch=False):
+        """Stream fills newest first, see `iter_account_history`
+        """
+        return self._iter_records(self.url + '/fills', params=self.fills_params(order_id, product_id),
+                                  limit=limit, page_size=page_size, prefetch=prefetch, auth=self.auth,
+                                  priority=BACKGROUND)
+
     def paginate_fills(self, result, after, order_id='', product_id=''):
-        url = self.url + '/fills?after={}&'.format(str(after))
+        params = self.fills_params(order_id, product_id)
+        params['after'] = after
+        result.extend(self._iter_pages(self.url + '/fills', params=params, auth=self.auth, priority=BACKGROUND))
+        return result
+
+    @staticmethod
+    def fills_params(order_id='', product_id=''):
+        params = {}
         if order_id:
-            url += 'order_id={}&'.format(str(order_id))
+            params['order_id'] = order_id
         if product_id:
-            url += 'product_id={}&'.format(product_id)
-        r = requests.get(url, auth=self.auth)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            return self.paginate_fills(result, r.headers['cb-after'], order_id=order_id, product_id=product_id)
-        return result
+            params['product_id'] = product_id
+        return params
 
     def get_fundings(self, result='', status='', after=''):
         if not result:
             result = []
-        url = self.url + '/funding?'
+        params = {}
         if status:
-            url += 'status={}&'.format(str(status))
+            params['status'] = status
         if after:
-            url += 'after={}&'.format(str(after))
-        r = requests.get(url, auth=self.auth)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers:
-            return self.get_fundings(result, status=status, after=r.headers['cb-after'])
+            params['after'] = after
+        pages = self._iter_pages(self.url + '/funding', params=params, auth=self.auth, priority=BACKGROUND)
+        result.append(next(pages))
+        result.extend(pages)
         return result
 
     def repay_funding(self, amount='', currency=''):
@@ -166,7 +181,7 @@ class AuthenticatedClient(PublicClient):
             'amount': amount,
             'currency': currency  # example: USD
         }
-        r = requests.post(self.url + '/funding/repay', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/funding/repay', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -177,12 +192,12 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,  # example: USD
             'amount': amount
         }
-        r = requests.post(self.url + '/profiles/margin-transfer', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/profiles/margin-transfer', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_position(self):
-        r = requests.get(self.url + '/position', auth=self.auth)
+        r = self._request('get', self.url + '/position', auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -190,7 +205,7 @@ class AuthenticatedClient(PublicClient):
         payload = {
             'repay_only': repay_only or False
         }
-        r = requests.post(self.url + '/position/close', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/position/close', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -200,7 +215,7 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,
             'payment_method_id': payment_method_id
         }
-        r = requests.post(self.url + '/deposits/payment-method', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/deposits/payment-method', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -210,7 +225,7 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,
             'coinbase_account_id': coinbase_account_id
         }
-        r = requests.post(self.url + '/deposits/coinbase-account', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/deposits/coinbase-account', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -220,7 +235,7 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,
             'payment_method_id': payment_method_id
         }
-        r = requests.post(self.url + '/withdrawals/payment-method', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/withdrawals/payment-method', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -230,7 +245,7 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,
             'coinbase_account_id': coinbase_account_id
         }
-        r = requests.post(self.url + '/withdrawals/coinbase', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/withdrawals/coinbase', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -240,17 +255,17 @@ class AuthenticatedClient(PublicClient):
             'currency': currency,
             'crypto_address': crypto_address
         }
-        r = requests.post(self.url + '/withdrawals/crypto', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/withdrawals/crypto', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_payment_methods(self):
-        r = requests.get(self.url + '/payment-methods', auth=self.auth)
+        r = self._request('get', self.url + '/payment-methods', auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_coinbase_accounts(self):
-        r = requests.get(self.url + '/coinbase-accounts', auth=self.auth)
+        r = self._request('get', self.url + '/coinbase-accounts', auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -265,17 +280,17 @@ class AuthenticatedClient(PublicClient):
             'format': report_format,
             'email': email
         }
-        r = requests.post(self.url + '/reports', data=json.dumps(payload), auth=self.auth)
+        r = self._request('post', self.url + '/reports', data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_report(self, report_id=''):
-        r = requests.get(self.url + '/reports/' + report_id, auth=self.auth)
+        r = self._request('get', self.url + '/reports/' + report_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_trailing_volume(self):
-        r = requests.get(self.url + '/users/self/trailing-volume', auth=self.auth)
+        r = self._request('get', self.url + '/users/self/trailing-volume', auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -288,17 +303,22 @@ class GdaxAuth(AuthBase):
         self.passphrase = passphrase
 
     def __call__(self, request):
+        request.headers.update(self.get_headers(request.method, request.path_url, request.body))
+        return request
+
+    def get_headers(self, method, path_url, body=None):
+        """Signed headers for a request. `path_url` is the request path including any query string.
+        """
         timestamp = str(time.time())
-        message = timestamp + request.method + request.path_url + (request.body or '')
+        message = timestamp + method.upper() + path_url + (body or '')
         message = message.encode('ascii')
         hmac_key = base64.b64decode(self.secret_key)
         signature = hmac.new(hmac_key, message, hashlib.sha256)
         signature_b64 = base64.b64encode(signature.digest())
-        request.headers.update({
+        return {
             'Content-Type': 'Application/JSON',
-            'CB-ACCESS-SIGN': signature_b64,
+            'CB-ACCESS-SIGN': signature_b64.decode('utf-8'),
             'CB-ACCESS-TIMESTAMP': timestamp,
             'CB-ACCESS-KEY': self.api_key,
             'CB-ACCESS-PASSPHRASE': self.passphrase
-        })
-        return request
+        }
@@ -1,6 +1,10 @@
 # Originally by Daniel Paquin
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+from gdax.rate_limit import READS
+from gdax.rate_limit import get_scheduler
+from gdax.session import DEFAULT_TIMEOUT
+from gdax.session import get_session
 
 
 class PublicClient(object):
@@ -11,17 +15,115 @@ class PublicClient(object):
 
     Attributes:
         url (Optional[str]): API URL. Defaults to GDAX API.
+        session (requests.Session): Pooled keep-alive session used for
+            every call. Shared process wide unless one is passed in.
+        timeout (float or tuple): (connect, read) timeout for every call.
+        scheduler (RequestScheduler): Rate limiter every call waits on.
 
     """
 
-    def __init__(self, api_url='https://api.gdax.com'):
+    def __init__(self, api_url='https://api.gdax.com', session=None, timeout=DEFAULT_TIMEOUT, scheduler=None):
         """Create GDAX API public client.
 
         Args:
             api_url (Optional[str]): API URL. Defaults to GDAX API.
+            session (Optional[requests.Session]): Session to issue calls
+                on. Defaults to the process wide pooled session, see
+                `gdax.session.get_session` to size the pool.
+            timeout (Optional[float or tuple]): (connect, read) timeout
+                in seconds.
+            scheduler (Optional[RequestScheduler]): Rate limiter. Defaults
+                to the one shared by every client in the process.
 
         """
         self.url = api_url.rstrip('/')
+        self.session = session if session is not None else get_session()
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+
+    def _request(self, method, url, priority=READS, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        self.scheduler.acquire(private='auth' in kwargs, priority=priority)
+        return self.session.request(method, url, **kwargs)
+
+    def _get_page(self, url, params=None, **kwargs):
+        """One page of a paginated endpoint.
+
+        Returns:
+            tuple: (results, `cb-before` cursor for newer results,
+                `cb-after` cursor for older results). Cursors are None
+                when absent.
+
+        """
+        r = self._request('get', url, params=params, **kwargs)
+        # r.raise_for_status()
+        return r.json(), r.headers.get('cb-before'), r.headers.get('cb-after')
+
+    def _iter_pages(self, url, params=None, prefetch=False, **kwargs):
+        """Walk a paginated endpoint by following `cb-after` cursors.
+
+        Args:
+            url (str): Endpoint URL.
+            params (Optional[dict]): Query parameters sent with every page.
+            prefetch (Optional[bool]): Request the next page in the
+                background while the caller works on the current one.
+
+        Yields:
+            list: The first page, then every non-empty page after it.
+                Stops as soon as the caller does.
+
+        """
+        params = dict(params or {})
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+        def fetch(after):
+            """Callable returning the page after the cursor, already in flight when prefetching
+            """
+            page_params = dict(params, after=after) if after else params
+            if executor is None:
+                return lambda: self._get_page(url, params=page_params, **kwargs)
+            return executor.submit(self._get_page, url, params=page_params, **kwargs).result
+
+        try:
+            pending = fetch(None)
+            first = True
+            while pending is not None:
+                page, _, after = pending()
+                pending = fetch(after) if after else None
+                if first or page:
+                    yield page
+                first = False
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _iter_records(self, url, params=None, limit=None, page_size=None, prefetch=False, **kwargs):
+        """Records of a paginated endpoint one at a time, see `_iter_pages`.
+
+        Args:
+            limit (Optional[int]): Stop after this many records.
+            page_size (Optional[int]): Records per request (exchange
+                default 100, max 100).
+
+        Raises:
+            ApiError: The exchange returned an error message instead of
+                a page.
+
+        """
+        params = dict(params or {})
+        if page_size:
+            params['limit'] = page_size
+        if limit is not None and limit <= 0:
+            return
+        count = 0
+        for page in self._iter_pages(url, params=params, prefetch=prefetch, **kwargs):
+            if isinstance(page, dict):
+                raise ApiError(page.get('message', page))
+            for record in page:
+                yield record
+                count += 1
+                if limit is not None and count >= limit:
+                    return
 
     def get_products(self):
         """Get a list of available currency pairs for trading.
@@ -41,7 +143,7 @@ class PublicClient(object):
                 ]
 
         """
-        r = requests.get(self.url + '/products')
+        r = self._request('get', self.url + '/products')
         # r.raise_for_status()
         return r.json()
 
@@ -81,8 +183,8 @@ class PublicClient(object):
 
         """
         params = {'level': level}
-        r = requests.get(self.url + '/products/{}/book'
-                         .format(product_id), params=params)
+        r = self._request('get', self.url + '/products/{}/book'
+                                 .format(product_id), params=params)
         # r.raise_for_status()
         return r.json()
 
@@ -108,8 +210,8 @@ class PublicClient(object):
                 }
 
         """
-        r = requests.get(self.url + '/products/{}/ticker'
-                         .format(product_id))
+        r = self._request('get', self.url + '/products/{}/ticker'
+                                 .format(product_id))
         # r.raise_for_status()
         return r.json()
 
@@ -136,10 +238,39 @@ class PublicClient(object):
                 }]
 
         """
-        r = requests.get(self.url + '/products/{}/trades'.format(product_id))
+        r = self._request('get', self.url + '/products/{}/trades'.format(product_id))
         # r.raise_for_status()
         return r.json()
 
+    def get_product_trades_page(self, product_id, before=None, after=None,
+                                limit=''):
+        """One page of trades for a product, newest first.
+
+        Trades are paginated by trade id. A page asked for with `before`
+        holds the trades just after that id, so following the `cb-before`
+        cursor walks forward in time and `cb-after` walks back.
+
+        Args:
+            product_id (str): Product
+            before (Optional[int]): Only trades with a higher trade id,
+                0 for the oldest.
+            after (Optional[int]): Only trades with a lower trade id.
+            limit (Optional[int]): Trades per page (max 100).
+
+        Returns:
+            tuple: (trades as from `get_product_trades`, `cb-before`
+                cursor, `cb-after` cursor). Cursors are None when absent.
+
+        """
+        params = {}
+        if before is not None:
+            params['before'] = before
+        if after is not None:
+            params['after'] = after
+        if limit:
+            params['limit'] = limit
+        return self._get_page(self.url + '/products/{}/trades'.format(product_id), params=params)
+
     def get_product_historic_rates(self, product_id, start=None, end=None,
                                    granularity=None):
         """Historic rates for a product.
@@ -184,8 +315,8 @@ class PublicClient(object):
             params['end'] = end
         if granularity is not None:
             params['granularity'] = granularity
-        r = requests.get(self.url + '/products/{}/candles'
-                         .format(product_id), params=params)
+        r = self._request('get', self.url + '/products/{}/candles'
+                                 .format(product_id), params=params)
         # r.raise_for_status()
         return r.json()
 
@@ -206,7 +337,7 @@ class PublicClient(object):
                     }
 
         """
-        r = requests.get(self.url + '/products/{}/stats'.format(product_id))
+        r = self._request('get', self.url + '/products/{}/stats'.format(product_id))
         # r.raise_for_status()
         return r.json()
 
@@ -226,7 +357,7 @@ class PublicClient(object):
                 }]
 
         """
-        r = requests.get(self.url + '/currencies')
+        r = self._request('get', self.url + '/currencies')
         # r.raise_for_status()
         return r.json()
 
@@ -242,6 +373,14 @@ class PublicClient(object):
                     }
 
         """
-        r = requests.get(self.url + '/time')
+        r = self._request('get', self.url + '/time')
         # r.raise_for_status()
         return r.json()
+
+
+class ApiError(Exception):
+    def __init__(self, value):
+        self.parameter = value
+
+    def __str__(self):
+        return repr(self.parameter)
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Priority lanes, lower numbers are served first when requests are queued on a bucket
+ORDERS = 0  # Placing and canceling orders
+READS = 1  # Order, account and market data lookups
+BACKGROUND = 2  # Reconciliation: ledger, holds and fills history
+
+LANES = {
+    ORDERS: 'orders',
+    READS: 'reads',
+    BACKGROUND: 'background',
+}
+
+
+class TokenBucket(object):
+    """`rate` requests per second on average, up to `capacity` back to back.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self):
+        """Seconds until a token can be taken, 0 if one is available now
+        """
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.refill()
+        self.tokens -= 1
+
+
+class RequestScheduler(object):
+    """Throttles REST calls to stay under the exchange limits, shared by every client in the process
+    (including several traders on one API key).
+
+    Public and private endpoints have separate buckets. When a bucket is exhausted, callers queue
+    by priority lane then arrival, so order placement/cancels pre-empt queued reconciliation reads.
+    Queue depth and wait time per lane are kept for logging, see `stats`.
+    """
+
+    def __init__(self, public_rate=3, public_burst=6, private_rate=5, private_burst=10, clock=time.monotonic):
+        self.clock = clock
+        self.buckets = {
+            'public': TokenBucket(public_rate, public_burst, clock=clock),
+            'private': TokenBucket(private_rate, private_burst, clock=clock),
+        }
+        self.queues = {name: [] for name in self.buckets}
+        self.max_depth = {name: 0 for name in self.buckets}
+        self.waits = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+
+    def acquire(self, private=False, priority=READS):
+        """Block until the call may go out, returns seconds spent waiting
+        """
+        name = 'private' if private else 'public'
+        bucket = self.buckets[name]
+        queue = self.queues[name]
+        start = self.clock()
+        with self.condition:
+            ticket = (priority, next(self.sequence))
+            heapq.heappush(queue, ticket)
+            self.max_depth[name] = max(self.max_depth[name], len(queue))
+            served = False
+            try:
+                while True:
+                    if queue[0] == ticket:
+                        delay = bucket.time_until_available()
+                        if delay <= 0:
+                            bucket.take()
+                            heapq.heappop(queue)
+                            served = True
+                            # Let the next in line work out its own wait
+                            self.condition.notify_all()
+                            break
+                        self.condition.wait(delay)
+                    else:
+                        self.condition.wait()
+            finally:
+                if not served:
+                    # Interrupted while queued, don't leave the ticket at the head blocking everyone behind it
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self.condition.notify_all()
+            waited = self.clock() - start
+            count, total, longest = self.waits.get((name, priority), (0, 0.0, 0.0))
+            self.waits[(name, priority)] = (count + 1, total + waited, max(longest, waited))
+        return waited
+
+    def stats(self):
+        """Per bucket queue depth (now and max) and per lane request count, mean and max wait in seconds
+        """
+        with self.condition:
+            result = {}
+            for name in self.buckets:
+                lanes = {}
+                for priority, lane in LANES.items():
+                    count, total, longest = self.waits.get((name, priority), (0, 0.0, 0.0))
+                    if count:
+                        lanes[lane] = {
+                            'count': count,
+                            'mean_wait': total / count,
+                            'max_wait': longest,
+                        }
+                result[name] = {
+                    'depth': len(self.queues[name]),
+                    'max_depth': self.max_depth[name],
+                    'lanes': lanes,
+                }
+            return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process wide scheduler used by clients that aren't given one
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replace the process wide scheduler, e.g. with different limits for a higher API tier
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -0,0 +1,62 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds. Connect is slightly above a multiple of 3 per the requests docs on TCP retransmits
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                keep_alive=True):
+    """Get the process wide pooled session for the given pool settings.
+
+    Every client created with the same settings shares one session (and so one set of open
+    keep-alive connections), so a dozen REST calls on the fill path only pay the TCP+TLS
+    handshake once.
+
+    Args:
+        pool_connections (Optional[int]): Number of per-host connection pools to cache.
+        pool_maxsize (Optional[int]): Maximum number of connections kept open per host.
+        pool_block (Optional[bool]): Block when the per-host pool is exhausted instead of
+            opening a throwaway connection.
+        keep_alive (Optional[bool]): Set to False to send `Connection: close` on every request.
+
+    Returns:
+        requests.Session: Shared session.
+
+    """
+    key = (pool_connections, pool_maxsize, pool_block, keep_alive)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = create_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+            _sessions[key] = session
+        return session
+
+
+def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                   keep_alive=True):
+    """Build a new (unshared) pooled session, see `get_session` for arguments.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def close_sessions():
+    """Close every shared session, dropping their pooled connections.
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Print the cost basis trader's averaging down ladder for a config, from the seed buy filling at delta below
+the price, to see how far down the balance lasts before going live.
+
+    python ladder.py ETH-USD 450.00 1000 config/sandbox.json --order-depth 8
+"""
+import argparse
+import json
+from decimal import Decimal
+
+from backtest.exchange import make_product
+from trader.base_trader import Trader
+from trader.base_trader import round_step
+from trader.base_trader import to_decimal
+from trader.ladder import Ladder
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan the cost basis ladder from a starting price')
+    parser.add_argument('product_id')
+    parser.add_argument('price', type=float, help='Market price when seeding')
+    parser.add_argument('starting_balance', nargs='?', type=float, default=1000)
+    parser.add_argument('config_file', nargs='?', default='config/sandbox.json')
+    parser.add_argument('--order-depth', type=int, default=None, help='Instead of the config file value')
+    parser.add_argument('--wallet-fraction', type=float, default=None, help='Instead of the config file value')
+    parser.add_argument('--delta', type=float, default=None, help='Instead of the config file value')
+    parser.add_argument('--quote-increment', default='0.01')
+    parser.add_argument('--base-min-size', default='0.001')
+    args = parser.parse_args()
+
+    with open(args.config_file) as config:
+        data = json.load(config)['cost_basis']
+    order_depth = args.order_depth if args.order_depth is not None else data['order_depth']
+    wallet_fraction = args.wallet_fraction if args.wallet_fraction is not None else data['wallet_fraction']
+    delta = args.delta if args.delta is not None else data.get('delta', 0.01)
+
+    product = make_product(args.product_id, quote_increment=args.quote_increment,
+                           base_min_size=args.base_min_size)
+    price_step = Decimal(product['quote_increment']).normalize()
+    size_step = Trader.currency_step(product['base_currency'])
+    quote_step = Trader.currency_step(product['quote_currency'])
+    ladder = Ladder(price_step, size_step, quote_step, delta, wallet_fraction, order_depth,
+                    base_min=Decimal(product['base_min_size']))
+
+    balance = round_step(to_decimal(args.starting_balance), quote_step)
+    paid, bought = ladder.seed(args.price, balance)
+    seed_cost = round_step(paid, quote_step)
+    legs = ladder.plan(paid, bought, 1, ladder.order_size(balance - seed_cost), balance - seed_cost)
+    print('{} from {} with {:,.2f} {}, order depth {}, wallet fraction {}, delta {}'.format(
+        args.product_id, args.price, args.starting_balance, product['quote_currency'], order_depth,
+        wallet_fraction, delta))
+    print('Seed buy {:f} @ {:f} spends {:f}, spent below is from there'.format(
+        bought.quantize(size_step), round_step(paid / bought, price_step).quantize(price_step),
+        seed_cost.quantize(quote_step)))
+    for line in ladder.format(legs):
+        print(line)
+    bottom = [x for x in legs if not x['last']]
+    spent = seed_cost + (bottom[-1]['spent'] if bottom else 0)
+    if bottom:
+        print('Lowest buy {:f} is {:.1%} below the price'.format(
+            bottom[-1]['buy_price'].quantize(price_step), 1 - float(bottom[-1]['buy_price']) / args.price))
+    print('Spends {:f} of {:f} {}, {:f} left'.format(spent.quantize(quote_step), balance.quantize(quote_step),
+                                                    product['quote_currency'], (balance - spent).quantize(quote_step)))
@@ -1,13 +1,20 @@
 #!/usr/bin/env python
+import argparse
+import itertools
 import json
 import logging
-import sys
 from datetime import datetime, timedelta
-from time import sleep
 
 import dateutil.parser
 
-from gdax.public_client import PublicClient
+from backtest.candle_store import get_candles
+from backtest.engine import Backtest
+from backtest.engine import CLOSE
+from backtest.engine import TIME
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from backtest.trades import Meter
+from backtest.trades import get_trades
 from tests.authenticated_client_regression import AuthenticatedClientRegression
 from trader.cost_basis import CostBasisTrader
 
@@ -15,101 +22,124 @@ logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
 module_logger = logging.getLogger(__name__)
 
 
-def get_rates(start, end):
-    return client.get_product_historic_rates(
+def run_exchange(parser, args, data):
+    """Run the trader against the simulated exchange, replaying candles or trades, fills arriving as websocket
+    messages
+    """
+    product_id = args.product_id
+    product = make_product(product_id)
+    exchange = SimulatedExchange([product], {product['quote_currency']: args.starting_balance},
+                                 queue_ahead=args.queue_ahead, settle_delay=args.settle_delay)
+    if args.trades:
+        trades = get_trades(product_id, args.start_time, args.end_time,
+                            path=None if args.trades == 'api' else args.trades)
+        first = next(trades, None)
+        if first is None:
+            parser.error('No trades from {} to {}'.format(args.start_time, args.end_time))
+        exchange.set_price(product_id, first[1], first[0])
+        trades = Meter(itertools.chain([first], trades))
+    else:
+        candles = get_candles(product_id, args.start_time, args.end_time, store=args.store,
+                              offline=args.offline)
+        if len(candles) == 0:
+            parser.error('No candles from {} to {}'.format(args.start_time, args.end_time))
+        exchange.set_price(product_id, candles[0][CLOSE], candles[0][TIME])
+    trader = CostBasisTrader(
         product_id,
-        start=start.isoformat() + 'Z',
-        end=end.isoformat() + 'Z',
-        granularity=60
+        data['cost_basis']['order_depth'],
+        data['cost_basis']['wallet_fraction'],
+        auth_client=exchange,
+        resting_levels=args.resting_levels,
     )
-
-
-if __name__ == '__main__':
-    time_delta = timedelta(minutes=300)
-    if len(sys.argv) == 6:
-        product_id = sys.argv[1]
-        start_time = dateutil.parser.parse(sys.argv[2])
-        end_time = dateutil.parser.parse(sys.argv[3])
-        starting_balance = sys.argv[4]
-        config_file = sys.argv[5]
+    # Each fill is handled before the replay moves on
+    exchange.subscribe(trader.received_message, idle=lambda: trader.fill_executor.submit(lambda: None).result())
+    trader.on_start()
+    if args.trades:
+        exchange.replay_trades(product_id, trades)
+        module_logger.info('Replayed {:,} trades in {:,.1f}s, {:,.0f} trades/sec'.format(
+            trades.count, trades.elapsed, trades.rate()))
     else:
-        product_id = 'ETH-USD'
-        start_time = datetime.utcnow() - timedelta(days=10)
-        end_time = datetime.utcnow()
-        starting_balance = 1000
-        config_file = 'config/sandbox.json'
+        exchange.replay_candles(product_id, candles)
+    trader.cancel_all()
+    trader.stop()
+    exchange.close()
+    module_logger.info('Ending balances:{}'.format(json.dumps(exchange.get_accounts(), indent=4, sort_keys=True)))
+    module_logger.info('Made a total of {} fills ({} partial), {} rejected orders'.format(
+        exchange.fills, exchange.partial_fills, exchange.rejects))
+    module_logger.info('Incurred {:,.2f} in fees'.format(sum(x['fill_fees'] for x in exchange.orders.values())))
+    for line in trader.metrics.format():
+        module_logger.info(line)
+    module_logger.info('Total sell balance @ {}: {:,.2f}'.format(exchange.prices[product_id],
+                                                                 exchange.value(product['quote_currency'])))
 
-    with open(config_file) as config:
-        data = json.load(config)
 
-    client = PublicClient()
+def run_regression(parser, args, data):
+    """Run the trader against the regression client, stepping through candles
+    """
+    product_id = args.product_id
+    candles = get_candles(product_id, args.start_time, args.end_time, store=args.store, offline=args.offline)
+    if len(candles) == 0:
+        parser.error('No candles from {} to {}'.format(args.start_time, args.end_time))
     # Seed with indicative rates
-    last_rates = get_rates(start_time, start_time + timedelta(minutes=2))[-1]
-    regression_client = AuthenticatedClientRegression(product_id, last_rates, starting_balance=starting_balance)
+    last_rates = candles[0].tolist()
+    regression_client = AuthenticatedClientRegression(product_id, last_rates, starting_balance=args.starting_balance)
     trader = CostBasisTrader(
         product_id,
         data['cost_basis']['order_depth'],
         data['cost_basis']['wallet_fraction'],
         auth_client=regression_client,
+        resting_levels=args.resting_levels,
     )
     # Place starting orders
     trader.on_start()
 
     # Let'er rip!
-    current_time = start_time
-    last_high = 0
-    fees = 0
-    total_trades = 0
-    fee_trades = 0
-    accounts = trader.accounts
-    while current_time < end_time:
-        next_time = current_time + time_delta
-        module_logger.info('Running from {} to {}'.format(current_time, next_time))
-        rates = get_rates(current_time, next_time)
-        for candle in reversed(rates):
-            # time, low, high, open, close, volume
-            last_high = candle[2]
-            order = regression_client.on_tick(candle[1], candle[2])
-            if order:
-                module_logger.info(
-                    '{}: Low:{} High:{} Open:{} Close:{}'.format(
-                        datetime.fromtimestamp(candle[0]), candle[1],
-                        candle[2], candle[3], candle[4]
-                    )
-                )
-                total_trades += 1
-                size = float(order['size'])
-                price = float(order['price'])
-                if order['type'] == 'stop':
-                    fee_trades += 1
-                    fees += 0.003 * size * price
-                trader.place_next_orders({
-                    'id': order['id'],
-                    'price': order['price'],
-                    'side': order['side'],
-                    'filled_size': order['size'],
-                })
-                if order['side'] == 'buy':
-                    accounts[trader.base_currency]['available'] += size
-                    accounts[trader.quote_currency]['available'] -= price * size
-                else:
-                    accounts[trader.base_currency]['available'] -= size
-                    accounts[trader.quote_currency]['available'] += price * size
-                regression_client.last_rates = candle
-        current_time = next_time
-        sleep(1)
+    backtest = Backtest(trader, regression_client)
+    if args.loop:
+        backtest.run_loop(candles)
+    else:
+        backtest.run(candles)
 
     # Cancel remaining to release held balances
     trader.cancel_all()
+    trader.stop()
 
     # What do we have left?
-    module_logger.info('Ending balances:{}'.format(json.dumps(accounts, indent=4, sort_keys=True)))
-    total = 0
-    for currency, balance in accounts.items():
-        if currency == 'USD':
-            total += float(balance['available'])
-        else:
-            total += float(balance['available']) * last_high
-    module_logger.info('Made a total of {} trades'.format(total_trades))
-    module_logger.info('Incurred {:,.2f} on {} feed trades'.format(fees, fee_trades))
-    module_logger.info('Total sell balance @ {}: {:,.2f}'.format(last_high, total - fees))
+    module_logger.info('Ending balances:{}'.format(json.dumps(trader.accounts, indent=4, sort_keys=True)))
+    module_logger.info('Made a total of {} trades'.format(backtest.total_trades))
+    module_logger.info('Incurred {:,.2f} on {} feed trades'.format(backtest.fees, backtest.fee_trades))
+    module_logger.info('Total sell balance @ {}: {:,.2f}'.format(backtest.last_high, backtest.total()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest the cost basis trader against historic candles')
+    parser.add_argument('product_id', nargs='?', default='ETH-USD')
+    parser.add_argument('start_time', nargs='?', type=dateutil.parser.parse,
+                        default=datetime.utcnow() - timedelta(days=10))
+    parser.add_argument('end_time', nargs='?', type=dateutil.parser.parse, default=datetime.utcnow())
+    parser.add_argument('starting_balance', nargs='?', type=float, default=1000)
+    parser.add_argument('config_file', nargs='?', default='config/sandbox.json')
+    parser.add_argument('--loop', action='store_true', help='Step through every candle instead of jumping to fills')
+    parser.add_argument('--store', default=None, help='Candle store directory, missing candles are added to it')
+    parser.add_argument('--offline', action='store_true', help='Only use candles already in the store')
+    parser.add_argument('--exchange', action='store_true',
+                        help='Run against the simulated exchange, fills arrive as websocket messages')
+    parser.add_argument('--queue-ahead', type=float, default=0.0,
+                        help='Simulated exchange: base currency queued ahead of each order at its price')
+    parser.add_argument('--settle-delay', type=float, default=0.0,
+                        help='Simulated exchange: seconds from fill to settled')
+    parser.add_argument('--trades', default=None, metavar='CSV_FILE',
+                        help='Replay trade by trade through the simulated exchange instead of candles, from a file '
+                             'recorded with backtest.trades or "api" to stream them from the API')
+    parser.add_argument('--resting-levels', type=int, default=1,
+                        help='Ladder buys kept resting below cost basis at once, 1 (the default) replaces the one '
+                             'buy after every fill')
+    args = parser.parse_args()
+
+    with open(args.config_file) as config:
+        data = json.load(config)
+
+    if args.exchange or args.trades:
+        run_exchange(parser, args, data)
+    else:
+        run_regression(parser, args, data)
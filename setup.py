@@ -5,7 +5,9 @@ from setuptools import setup, find_packages
 install_requires = [
     'ws4py==0.4.3',
     'requests==2.13.0',
-    'python-dateutil==2.6.1',
+    'python-dateutil>=2.7.0',
+    'aiohttp>=3.8',
+    'numpy>=1.23',
 ]
 
 tests_require = [
@@ -4,6 +4,7 @@ import logging.config
 import sys
 
 from trader.cost_basis import CostBasisTrader
+from trader.journal import Journal
 
 if __name__ == '__main__':
     if len(sys.argv) == 3:
@@ -44,6 +45,8 @@ if __name__ == '__main__':
         },
     })
 
+    # Restarts resume from here instead of guessing from open orders
+    journal = Journal('/root/Trader/cost_basis_{}.journal'.format(product_id))
     trader = CostBasisTrader(
         product_id,
         data['cost_basis']['order_depth'],
@@ -54,6 +57,7 @@ if __name__ == '__main__':
         pass_phrase=data['auth']['phrase'],
         api_url=data['endpoints']['rest'],
         ws_url=data['endpoints']['socket'],
+        journal=journal,
     )
     try:
         trader.on_start()
@@ -61,3 +65,5 @@ if __name__ == '__main__':
         trader.run_forever()
     except KeyboardInterrupt:
         trader.close()
+    finally:
+        journal.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import json
+import logging.config
+import sys
+
+from trader.cost_basis import CostBasisTrader
+from trader.journal import Journal
+from trader.supervisor import Supervisor
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3:
+        file = sys.argv[1]
+        product_ids = sys.argv[2:]
+    else:
+        file = 'config/prod.json'
+        product_ids = ['ETH-USD', 'LTC-USD']
+
+    with open(file) as config:
+        data = json.load(config)
+
+    logging.config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'standard': {
+                'format': '%(asctime)s|%(message)s'
+            },
+        },
+        'handlers': {
+            'file': {
+                'level': 'INFO',
+                'class': 'logging.handlers.TimedRotatingFileHandler',
+                'formatter': 'standard',
+                'filename': '/root/Trader/cost_basis.log',
+                'when': 'midnight',
+                'interval': 1,
+                'backupCount': 5
+            },
+        },
+        'loggers': {
+            '': {
+                'handlers': ['file'],
+                'level': 'INFO',
+                'propagate': False
+            },
+        },
+    })
+
+    supervisor = Supervisor(
+        api_key=data['auth']['key'],
+        secret_key=data['auth']['secret'],
+        pass_phrase=data['auth']['phrase'],
+        api_url=data['endpoints']['rest'],
+        ws_url=data['endpoints']['socket'],
+    )
+    # Restarts resume from here instead of guessing from open orders, a journal per product
+    journals = []
+    for product_id in product_ids:
+        journal = Journal('/root/Trader/cost_basis_{}.journal'.format(product_id))
+        journals.append(journal)
+        supervisor.add_trader(
+            CostBasisTrader,
+            product_id,
+            data['cost_basis']['order_depth'],
+            data['cost_basis']['wallet_fraction'],
+            delta=data['cost_basis']['delta'],
+            journal=journal,
+        )
+    try:
+        supervisor.on_start()
+        supervisor.connect()
+        supervisor.run_forever()
+    except KeyboardInterrupt:
+        supervisor.close()
+    finally:
+        for journal in journals:
+            journal.close()
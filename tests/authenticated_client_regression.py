@@ -1,9 +1,14 @@
+import bisect
+import itertools
+import threading
 import uuid
 
 
 # noinspection PyMethodMayBeStatic
 class AuthenticatedClientRegression(object):
     def __init__(self, product_id, last_rates, starting_balance=1000):
+        # Trader places and cancels from several threads
+        self.lock = threading.RLock()
         self.orders = []
         self.starting_balance = [
             {
@@ -40,8 +45,62 @@ class AuthenticatedClientRegression(object):
         self.product_id = product_id
         self.last_rates = last_rates
 
+    @property
+    def orders(self):
+        """Open orders in the order they were placed, the list assigned (if any) kept up to date
+        """
+        return self.order_list
+
+    @orders.setter
+    def orders(self, orders):
+        with self.lock:
+            self.order_list = orders
+            # Insertion number -> order, ids can repeat so those map to a list of insertion numbers
+            self.entries = {}
+            self.ids = {}
+            self.prices = {}
+            self.sequence = itertools.count()
+            # (price key, insertion number) sorted best first: buys highest, buy stops and sells lowest
+            self.buys = []
+            self.buy_stops = []
+            self.sells = []
+            for order in orders:
+                self.index_order(order)
+
+    def add_order(self, order):
+        with self.lock:
+            self.order_list.append(order)
+            self.index_order(order)
+
+    def index_order(self, order):
+        """Parse the price once and file the order by id, side and price
+        """
+        with self.lock:
+            number = next(self.sequence)
+            price = float(order['price'])
+            self.entries[number] = order
+            self.ids.setdefault(order['id'], []).append(number)
+            self.prices[number] = price
+            if order['side'] == 'buy':
+                bisect.insort(self.buys, (-price, number))
+                if order['type'] == 'stop':
+                    bisect.insort(self.buy_stops, (price, number))
+            else:
+                bisect.insort(self.sells, (price, number))
+
+    def remove_order(self, number):
+        order = self.entries.pop(number)
+        self.order_list.remove(order)
+        price = self.prices.pop(number)
+        if order['side'] == 'buy':
+            self.buys.pop(bisect.bisect_left(self.buys, (-price, number)))
+            if order['type'] == 'stop':
+                self.buy_stops.pop(bisect.bisect_left(self.buy_stops, (price, number)))
+        else:
+            self.sells.pop(bisect.bisect_left(self.sells, (price, number)))
+
     def get_order(self, order_id):
-        order = [x for x in self.orders if x['id'] == order_id][0]
+        order = self.entries[self.ids[order_id][0]]
         order['settled'] = True
         order['filled_size'] = order['size']
         return order
@@ -65,7 +124,7 @@ class AuthenticatedClientRegression(object):
             'product_id': self.product_id,
             'post_only': post_only,
         }
-        self.orders.append(order)
+        self.add_order(order)
         return order
 
     def get_products(self):
@@ -242,7 +301,9 @@ class AuthenticatedClientRegression(object):
         return self.mock_trade('sell', kwargs['price'], kwargs['size'], kwargs['type'], kwargs.get('post_only', False))
 
     def cancel_order(self, order_id):
-        self.orders = [x for x in self.orders if x['id'] != order_id]
+        with self.lock:
+            for number in self.ids.pop(order_id, []):
+                self.remove_order(number)
         return {
             'id': order_id,
         }
@@ -251,17 +312,31 @@ class AuthenticatedClientRegression(object):
         self.orders = []
         return {}
 
+    def trigger_prices(self):
+        """(buy_below, sell_above): a candle fills something only if its low is at or below buy_below
+        or its high is at or above sell_above (buy stops also trigger on the high)
+        """
+        with self.lock:
+            buy_below = -self.buys[0][0] if self.buys else float('-inf')
+            sell_above = min(self.sells[0][0] if self.sells else float('inf'),
+                             self.buy_stops[0][0] if self.buy_stops else float('inf'))
+        return buy_below, sell_above
+
     def on_tick(self, low, high):
         """Give a market data slice, return the order (if any) that needs to be filled.
-        Precedence given to buy orders in case the candle is really wide.
+        Precedence given to buy orders in case the candle is really wide, then to the earliest placed.
         """
-        buy_orders = [x for x in self.orders if x['side'] == 'buy']
-        sell_orders = [x for x in self.orders if x['side'] == 'sell']
-        for buy_order in buy_orders:
-            if (buy_order['type'] == 'stop' and float(high) >= float(buy_order['price'])) or float(low) <= float(
-                    buy_order['price']):
-                return buy_order
-        for sell_order in sell_orders:
-            if float(high) >= float(sell_order['price']):
-                return sell_order
+        low = float(low)
+        high = float(high)
+        with self.lock:
+            # Nearly every candle misses the best buy, stop and sell, only scan when one is reached
+            if (self.buys and -self.buys[0][0] >= low) or (self.buy_stops and self.buy_stops[0][0] <= high):
+                for number, order in self.entries.items():
+                    if order['side'] == 'buy' and (
+                            (order['type'] == 'stop' and high >= self.prices[number]) or low <= self.prices[number]):
+                        return order
+            if self.sells and self.sells[0][0] <= high:
+                for number, order in self.entries.items():
+                    if order['side'] == 'sell' and high >= self.prices[number]:
+                        return order
         return None
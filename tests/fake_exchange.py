@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import hmac
+import json
+import uuid
+
+from aiohttp import web
+
+
+# noinspection PyMethodMayBeStatic
+class FakeExchange(object):
+    """In-process stand-in for the GDAX REST api, for exercising the real HTTP clients.
+    Checks request signatures and paginates list endpoints `page_size` at a time.
+    """
+
+    def __init__(self, secret, page_size=2):
+        self.secret = secret
+        self.page_size = page_size
+        self.orders = {}
+        self.ledger = {}
+        self.requests = []
+        self.app = web.Application(middlewares=[self.check_signature])
+        self.app.add_routes([
+            web.get('/products', self.get_products),
+            web.get('/products/{product_id}/ticker', self.get_ticker),
+            web.get('/accounts/', self.get_accounts),
+            web.get('/accounts/{account_id}/ledger', self.get_ledger),
+            web.post('/orders', self.place_order),
+            web.get('/orders/', self.get_orders),
+            web.get('/orders', self.get_orders),
+            web.get('/orders/{order_id}', self.get_order),
+            web.delete('/orders/{order_id}', self.cancel_order),
+        ])
+
+    @web.middleware
+    async def check_signature(self, request, handler):
+        body = await request.text()
+        self.requests.append((request.method, request.path_qs))
+        if request.path.startswith('/products'):
+            return await handler(request)
+        message = request.headers.get('CB-ACCESS-TIMESTAMP', '') + request.method + request.path_qs + body
+        signature = hmac.new(base64.b64decode(self.secret), message.encode('ascii'), hashlib.sha256)
+        if base64.b64encode(signature.digest()).decode('utf-8') != request.headers.get('CB-ACCESS-SIGN'):
+            return web.json_response({'message': 'invalid signature'}, status=400)
+        return await handler(request)
+
+    def paginate(self, request, items):
+        """Newest first, `after` is the index to continue from
+        """
+        start = int(request.query.get('after', 0))
+        page = items[start:start + self.page_size]
+        headers = {}
+        if start + self.page_size < len(items):
+            headers['cb-after'] = str(start + self.page_size)
+        return web.json_response(page, headers=headers)
+
+    async def get_products(self, request):
+        return web.json_response([{
+            'id': 'ETH-USD',
+            'base_currency': 'ETH',
+            'quote_currency': 'USD',
+            'base_min_size': '0.001',
+            'base_max_size': '5000',
+            'quote_increment': '0.01',
+            'status': 'online',
+        }])
+
+    async def get_ticker(self, request):
+        return web.json_response({'price': '100.00', 'bid': '99.99', 'ask': '100.00'})
+
+    async def get_accounts(self, request):
+        return web.json_response([
+            {'id': 'usd', 'currency': 'USD', 'balance': '1000', 'available': '1000', 'hold': '0'},
+            {'id': 'eth', 'currency': 'ETH', 'balance': '0', 'available': '0', 'hold': '0'},
+        ])
+
+    async def get_ledger(self, request):
+        return self.paginate(request, self.ledger.get(request.match_info['account_id'], []))
+
+    async def place_order(self, request):
+        order = json.loads(await request.text())
+        order.update({
+            'id': str(uuid.uuid4()),
+            'price': str(order['price']),
+            'size': str(order['size']),
+            'status': 'open',
+            'settled': False,
+        })
+        self.orders[order['id']] = order
+        return web.json_response(order)
+
+    async def get_orders(self, request):
+        return self.paginate(request, list(reversed(list(self.orders.values()))))
+
+    async def get_order(self, request):
+        order = self.orders.get(request.match_info['order_id'])
+        if order is None:
+            return web.json_response({'message': 'NotFound'}, status=404)
+        return web.json_response(order)
+
+    async def cancel_order(self, request):
+        order_id = request.match_info['order_id']
+        if self.orders.pop(order_id, None) is None:
+            return web.json_response({'message': 'order not found'}, status=404)
+        return web.json_response([order_id])
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from aiohttp.test_utils import TestServer
+
+from gdax.async_client import AsyncAuthenticatedClient
+from gdax.rate_limit import RequestScheduler
+from tests.fake_exchange import FakeExchange
+
+SECRET = 'c2VjcmV0'
+# Fake exchange has no limits, don't throttle against the real ones
+UNLIMITED = RequestScheduler(public_rate=1e6, public_burst=1e6, private_rate=1e6, private_burst=1e6)
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.exchange = FakeExchange(SECRET)
+        self.server = TestServer(self.exchange.app)
+        await self.server.start_server()
+        self.client = AsyncAuthenticatedClient('key', SECRET, 'phrase', api_url=str(self.server.make_url('')),
+                                               scheduler=UNLIMITED)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_public(self):
+        products = await self.client.get_products()
+        self.assertEqual(products[0]['id'], 'ETH-USD')
+        ticker = await self.client.get_product_ticker('ETH-USD')
+        self.assertEqual(ticker['price'], '100.00')
+
+    async def test_concurrent_cancel_and_replace(self):
+        old_order = await self.client.buy(type='limit', product_id='ETH-USD', price=98.0, size=1.0, post_only=True)
+        self.assertNotIn('message', old_order)
+        cancel, sell, buy = await asyncio.gather(
+            self.client.cancel_order(old_order['id']),
+            self.client.sell(type='limit', product_id='ETH-USD', price=101.0, size=1.0, post_only=True),
+            self.client.buy(type='limit', product_id='ETH-USD', price=99.0, size=1.0, post_only=True),
+        )
+        self.assertEqual(cancel, [old_order['id']])
+        self.assertEqual(sell['side'], 'sell')
+        self.assertEqual(buy['side'], 'buy')
+        self.assertEqual(set(self.exchange.orders.keys()), {sell['id'], buy['id']})
+        order = await self.client.get_order(buy['id'])
+        self.assertEqual(order['price'], '99.0')
+
+    async def test_pagination(self):
+        for i in range(5):
+            await self.client.buy(type='limit', product_id='ETH-USD', price=90.0 + i, size=1.0, post_only=True)
+        pages = await self.client.get_orders()
+        self.assertEqual([len(x) for x in pages], [2, 2, 1])
+        self.exchange.ledger['usd'] = [{'id': str(i), 'type': 'match'} for i in range(3)]
+        pages = await self.client.get_account_history('usd')
+        self.assertEqual([x['id'] for page in pages for x in page], ['0', '1', '2'])
+        self.assertIn(('GET', '/accounts/usd/ledger?after=2'), self.exchange.requests)
+
+    async def test_bad_signature(self):
+        client = AsyncAuthenticatedClient('key', 'b3RoZXI=', 'phrase', api_url=str(self.server.make_url('')),
+                                          scheduler=UNLIMITED)
+        async with client:
+            result = await client.get_accounts()
+        self.assertEqual(result['message'], 'invalid signature')
@@ -0,0 +1,77 @@
+import logging
+import unittest
+
+from backtest.engine import Backtest
+from backtest.engine import random_candles
+from backtest.engine import to_candles
+from backtest.sweep import run_backtest
+from backtest.sweep import sweep
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.cost_basis import CostBasisTrader
+
+
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def backtest(self, candles, vectorized):
+        client = AuthenticatedClientRegression('ETH-USD', candles[0].tolist(), starting_balance=1000)
+        trader = CostBasisTrader('ETH-USD', 4, 0.2, delta=0.01, auth_client=client)
+        trader.on_start()
+        backtest = Backtest(trader, client)
+        if vectorized:
+            backtest.run(candles, chunk_size=256)
+        else:
+            backtest.run_loop(candles)
+        trader.stop()
+        return backtest
+
+    def test_same_fills_as_loop(self):
+        candles = random_candles(20000)
+        loop = self.backtest(candles, False)
+        vectorized = self.backtest(candles, True)
+        self.assertGreater(len(loop.fills), 10)
+        self.assertEqual(vectorized.fills, loop.fills)
+        self.assertEqual(vectorized.trader.accounts, loop.trader.accounts)
+        self.assertEqual(vectorized.fees, loop.fees)
+        self.assertEqual(vectorized.total(), loop.total())
+
+    def test_to_candles(self):
+        candles = to_candles([[120, 1, 2, 1, 2, 5], [60, 3, 4, 3, 4, 5]])
+        self.assertEqual(candles[:, 0].tolist(), [60, 120])
+
+    def test_sweep(self):
+        candles = random_candles(5000)
+        results = sweep('ETH-USD', candles, [2, 4], [0.2], [0.01, 0.02], workers=2)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(results, key=lambda x: x['final_balance'], reverse=True), results)
+        row = [x for x in results if x['order_depth'] == 4 and x['delta'] == 0.01][0]
+        self.assertEqual(row, run_backtest('ETH-USD', 4, 0.2, 0.01, 1000, candles=candles))
+        self.assertGreater(row['trades'], 0)
+        # Buying stops once depth goes past order_depth
+        self.assertEqual(row['max_depth'], 5)
+        self.assertGreater(row['drawdown'], 0)
+
+    def test_on_tick(self):
+        client = AuthenticatedClientRegression('ETH-USD', [0, 100, 100, 100, 100, 1])
+        sell = client.sell(type='limit', product_id='ETH-USD', price=105, size=1)
+        low_buy = client.buy(type='limit', product_id='ETH-USD', price=95, size=1)
+        high_buy = client.buy(type='limit', product_id='ETH-USD', price=98, size=1)
+        self.assertEqual(client.trigger_prices(), (98, 105))
+        self.assertIsNone(client.on_tick(99, 104))
+        # Earliest placed triggering buy wins, not the best priced one, and buys before sells
+        self.assertIs(client.on_tick(90, 106), low_buy)
+        self.assertIs(client.on_tick(97, 106), high_buy)
+        self.assertIs(client.on_tick(99, 106), sell)
+        # Stops trigger on the high too
+        stop = client.buy(type='stop', product_id='ETH-USD', price=102, size=1)
+        self.assertEqual(client.trigger_prices(), (102, 102))
+        self.assertIs(client.on_tick(103, 106), stop)
+        self.assertIs(client.on_tick(90, 106), low_buy)
+        client.cancel_order(low_buy['id'])
+        self.assertEqual(client.orders, [sell, high_buy, stop])
+        self.assertIs(client.on_tick(90, 106), high_buy)
+        self.assertIs(client.get_order(stop['id']), stop)
@@ -0,0 +1,104 @@
+import logging
+import unittest
+
+from backtest.engine import random_candles
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from trader.balance_ledger import BalanceLedger
+from trader.cost_basis import CostBasisTrader
+
+
+class TestBalanceLedger(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.accounts = {
+            'USD': {'available': 1000.0, 'balance': 1000.0, 'id': '1'},
+            'ETH': {'available': 0.0, 'balance': 0.0, 'id': '2'},
+        }
+        self.ledger = BalanceLedger(self.accounts, reconcile_interval=60, clock=lambda: self.now)
+        self.ledger.add_product(make_product('ETH-USD'))
+        self.ledger.reset()
+
+    def test_order_events(self):
+        self.ledger.on_order_placed({'id': 'a', 'product_id': 'ETH-USD', 'side': 'buy', 'type': 'limit',
+                                     'price': '99.00', 'size': '2.0'})
+        # Already tracked from placement
+        self.ledger.on_message({'type': 'received', 'product_id': 'ETH-USD', 'order_id': 'a', 'side': 'buy',
+                                'order_type': 'limit', 'price': '99.00', 'size': '2.0'})
+        self.assertEqual(self.accounts['USD'], {'available': 802.0, 'balance': 1000.0, 'id': '1'})
+        self.ledger.on_message({'type': 'match', 'product_id': 'ETH-USD', 'maker_order_id': 'a',
+                                'taker_order_id': 'x', 'side': 'buy', 'price': '99.00', 'size': '1.0',
+                                'maker_fee_rate': '0.0000'})
+        self.assertEqual(self.accounts['USD'], {'available': 802.0, 'balance': 901.0, 'id': '1'})
+        self.assertEqual(self.accounts['ETH'], {'available': 1.0, 'balance': 1.0, 'id': '2'})
+        self.ledger.on_message({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'a', 'reason': 'canceled'})
+        self.assertEqual(self.accounts['USD'], {'available': 901.0, 'balance': 901.0, 'id': '1'})
+        # A stop holds its funds, and the taker fee comes out of the balance
+        self.ledger.on_order_placed({'id': 'b', 'product_id': 'ETH-USD', 'side': 'buy', 'type': 'stop',
+                                     'price': '101.00', 'size': '1.0', 'funds': '101.00'})
+        self.assertEqual(self.accounts['USD']['available'], 800.0)
+        self.ledger.on_message({'type': 'match', 'product_id': 'ETH-USD', 'maker_order_id': 'x',
+                                'taker_order_id': 'b', 'side': 'sell', 'price': '100.00', 'size': '1.0',
+                                'taker_fee_rate': '0.0030'})
+        self.ledger.on_message({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'b', 'reason': 'filled'})
+        self.assertAlmostEqual(self.accounts['USD']['balance'], 800.7)
+        self.assertAlmostEqual(self.accounts['USD']['available'], 800.7)
+        self.assertEqual(self.accounts['ETH']['available'], 2.0)
+        self.assertFalse(self.ledger.needs_reconcile())
+
+    def test_done_before_ack(self):
+        # The websocket beats the REST response, the late placement mustn't hold anything
+        message = {'product_id': 'ETH-USD', 'order_id': 'a', 'side': 'buy', 'order_type': 'limit',
+                   'price': '99.00', 'size': '2.0'}
+        self.ledger.on_message(dict(message, type='received'))
+        self.ledger.on_message({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'a', 'reason': 'canceled'})
+        self.ledger.on_order_placed({'id': 'a', 'product_id': 'ETH-USD', 'side': 'buy', 'type': 'limit',
+                                     'price': '99.00', 'size': '2.0'})
+        self.assertEqual(self.accounts['USD'], {'available': 1000.0, 'balance': 1000.0, 'id': '1'})
+        self.assertEqual(self.ledger.orders, {})
+        self.assertFalse(self.ledger.needs_reconcile())
+
+    def test_reconcile(self):
+        self.assertFalse(self.ledger.needs_reconcile())
+        self.now = 61
+        self.assertTrue(self.ledger.needs_reconcile())
+        self.ledger.on_order_placed({'id': 'a', 'product_id': 'ETH-USD', 'side': 'sell', 'type': 'limit',
+                                     'price': '101.00', 'size': '1.0'})
+        self.ledger.reset()
+        self.assertFalse(self.ledger.needs_reconcile())
+        # The snapshot holds for orders from before it
+        self.assertEqual(self.ledger.orders, {})
+        # Orders placed before we started can't be accounted for
+        self.ledger.on_message({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'old', 'reason': 'filled'})
+        self.assertTrue(self.ledger.needs_reconcile())
+        previous = {x: dict(y) for x, y in self.accounts.items()}
+        self.accounts['ETH'] = {'available': 1.0, 'balance': 1.0, 'id': '2'}
+        self.assertEqual(self.ledger.reset(previous), ['ETH'])
+        self.assertFalse(self.ledger.needs_reconcile())
+        # Other products are none of our business
+        self.ledger.on_message({'type': 'done', 'product_id': 'LTC-USD', 'order_id': 'old', 'reason': 'filled'})
+        self.assertFalse(self.ledger.needs_reconcile())
+
+    def test_trader(self):
+        logging.disable(logging.WARNING)
+        try:
+            candles = random_candles(5000)
+            exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000}, settle_delay=0.001)
+            exchange.set_price('ETH-USD', candles[0][4], candles[0][0])
+            trader = CostBasisTrader('ETH-USD', 4, 0.2, auth_client=exchange, use_ledger=True)
+            trader.settlements.initial_delay = 0.001
+            exchange.subscribe(trader.received_message,
+                               idle=lambda: trader.fill_executor.submit(lambda: None).result())
+            trader.on_start()
+            exchange.replay_candles('ETH-USD', candles)
+            trader.stop()
+            exchange.close()
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertGreater(exchange.fills, 3)
+        # Only the startup query, fills were accounted for from the messages
+        self.assertEqual(trader.metrics.get('account_queries'), 1)
+        self.assertEqual(trader.metrics.get('ledger_drift'), 0)
+        for account in exchange.get_accounts():
+            self.assertAlmostEqual(trader.accounts[account['currency']]['balance'], float(account['balance']))
+            self.assertAlmostEqual(trader.accounts[account['currency']]['available'], float(account['available']))
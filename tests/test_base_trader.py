@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.base_trader import Trader
+
+
+def ledger_match(entry_id, order_id, product_id='ETH-USD'):
+    return {
+        'id': entry_id,
+        'type': 'match',
+        'details': {
+            'order_id': order_id,
+            'product_id': product_id,
+        },
+    }
+
+
+class TestTrader(unittest.TestCase):
+    def test_incremental_reconciliation(self):
+        auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
+        trader = Trader('ETH-USD', auth_client=auth_client_mock)
+        trader.on_order_done = MagicMock()
+        trader.cache_orders('filled')
+        trader.cache_orders('partial')
+        pages = {
+            # First run, newest page only
+            (2, ''): ([ledger_match('11', 'old')], '11', '10'),
+            (1, ''): ([], None, None),
+            # Later runs walk forward from the cursor
+            (2, '11'): ([ledger_match('13', 'filled'), ledger_match('12', 'filled')], '13', '12'),
+            (2, '13'): ([ledger_match('14', 'partial'), ledger_match('14', 'other', 'LTC-USD')], '14', '14'),
+            (2, '14'): ([], None, None),
+            (1, '5'): ([ledger_match('6', 'filled')], '6', '6'),
+            (1, '6'): ([], None, None),
+        }
+        auth_client_mock.get_account_history_page = MagicMock(
+            side_effect=lambda account_id, before='': pages[(account_id, before)])
+        auth_client_mock.get_order = MagicMock(side_effect=lambda order_id: {
+            'id': order_id,
+            'status': 'done' if order_id == 'filled' else 'open',
+            'done_reason': 'filled' if order_id == 'filled' else '',
+        })
+
+        self.assertEqual(trader.check_missed_fills(), {'pages': 2, 'entries': 1, 'orders': 1})
+        self.assertEqual(trader.ledger_cursors, {2: '11'})
+        trader.on_order_done.assert_not_called()
+
+        trader.ledger_cursors[1] = '5'
+        self.assertEqual(trader.check_missed_fills(), {'pages': 3, 'entries': 5, 'orders': 2})
+        self.assertEqual(trader.ledger_cursors, {2: '14', 1: '6'})
+        # Matched in both accounts and twice in one, but only looked up and handled once
+        trader.on_order_done.assert_called_once_with({
+            'order_id': 'filled',
+            'reason': 'filled',
+            'product_id': 'ETH-USD',
+        })
+        self.assertEqual(auth_client_mock.get_order.call_count, 2)
+        self.assertEqual(trader.metrics.get('reconcile_pages'), 5)
+
+    def test_book_pricing(self):
+        auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
+        trader = Trader('ETH-USD', auth_client=auth_client_mock, use_book=True)
+        trader.book.load_snapshot([['99.00', '1']], [['100.00', '1']])
+        # Would cross the ask, priced one increment inside it instead of retrying
+        trader.buy_limit_ptc(1, 101)
+        self.assertEqual(auth_client_mock.orders[-1]['price'], '99.99')
+        self.assertEqual(trader.metrics.get('post_only_repriced'), 1)
+        self.assertEqual(trader.metrics.get('post_only_retries_avoided'), 2)
+        # Already behind the book, left alone
+        trader.sell_limit_ptc(1, 105)
+        self.assertEqual(auth_client_mock.orders[-1]['price'], '105.00')
+        self.assertEqual(trader.metrics.get('post_only_repriced'), 1)
+        self.assertEqual(trader.metrics.latency('order_ack').count, 2)
+
+        # Genuine reject, book moved before the order landed so widen from there
+        trader.client.sell = MagicMock(side_effect=[{'message': 'Post only mode'}, {'id': 'id1'}])
+        with patch('trader.base_trader.time.sleep') as sleep:
+            trader.sell_limit_ptc(1, 98)
+        sleep.assert_called_once_with(1)
+        self.assertEqual([x[1]['price'] for x in trader.client.sell.call_args_list], ['99.01', '99.31'])
+        self.assertEqual(trader.metrics.get('order_rejects'), 1)
+        self.assertIn('id1', trader.opened_orders)
+        trader.stop()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from backtest.candle_store import CandleStore
+from backtest.engine import random_candles
+
+START = 1500000000
+
+
+def historic_rates(product_id, start, end, granularity):
+    """Fake get_product_historic_rates, a candle a minute newest first, inclusive of both ends like the API
+    """
+    start = (datetime.strptime(start, '%Y-%m-%dT%H:%M:%SZ') - datetime(1970, 1, 1)).total_seconds()
+    end = (datetime.strptime(end, '%Y-%m-%dT%H:%M:%SZ') - datetime(1970, 1, 1)).total_seconds()
+    return [[t, 1, 2, 1, 2, 0] for t in range(int(end), int(start) - 1, -granularity)]
+
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.client = MagicMock()
+        self.client.get_product_historic_rates = MagicMock(side_effect=historic_rates)
+        self.store = CandleStore(self.directory.name, self.client, pause=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fills_only_missing(self):
+        candles = self.store.get('ETH-USD', START, START + 600 * 60)
+        self.assertEqual(candles[:, 0].tolist(), list(range(START, START + 600 * 60, 60)))
+        self.assertEqual(self.client.get_product_historic_rates.call_count, 2)
+        self.assertEqual(self.store.coverage('ETH-USD'), [[START, START + 600 * 60]])
+
+        self.client.get_product_historic_rates.reset_mock()
+        candles = self.store.get('ETH-USD', START + 300 * 60, START + 700 * 60)
+        self.assertEqual(len(candles), 400)
+        # Only the last 100 minutes were fetched
+        self.assertEqual(self.client.get_product_historic_rates.call_count, 1)
+        self.assertEqual(self.store.missing('ETH-USD', START - 60, START + 800 * 60),
+                         [[START - 60, START], [START + 700 * 60, START + 800 * 60]])
+
+    def test_memory_mapped(self):
+        self.store.add('ETH-USD', random_candles(1000), START, START + 1000 * 60)
+        candles = self.store.load('ETH-USD', START + 60, START + 120)
+        self.assertEqual(candles.shape, (1, 6))
+        self.assertIsInstance(candles.base, np.memmap)
+        self.assertFalse(candles.flags.writeable)
+        np.testing.assert_array_equal(self.store.load('ETH-USD'), random_candles(1000))
+
+    def test_import_csv(self):
+        path = os.path.join(self.directory.name, 'dump.csv')
+        with open(path, 'w') as f:
+            f.write('time,low,high,open,close,volume\n')
+            f.write('2017-07-14T02:39:00Z,99,101,100,100.5,3\n')
+            f.write('{},98,102,100.5,99,4\n'.format(START))
+        self.assertEqual(self.store.import_csv('ETH-USD', path), 2)
+        offline = CandleStore(self.directory.name)
+        candles = offline.get('ETH-USD', START - 60, START + 60)
+        self.assertEqual(candles.tolist(), [[START - 60, 99, 101, 100, 100.5, 3], [START, 98, 102, 100.5, 99, 4]])
+        self.assertEqual(offline.coverage('ETH-USD'), [[START - 60, START + 60]])
@@ -0,0 +1,95 @@
+import unittest
+
+from gdax.authenticated_client import AuthenticatedClient
+from gdax.public_client import PublicClient
+from gdax.rate_limit import RequestScheduler
+from gdax.session import create_session, get_session
+
+
+class TestSession(unittest.TestCase):
+    def test_shared_session(self):
+        public_client = PublicClient()
+        auth_client = AuthenticatedClient('key', 'c2VjcmV0', 'phrase', api_url='https://api-public.sandbox.gdax.com')
+        self.assertIs(public_client.session, auth_client.session)
+        self.assertIs(public_client.session, get_session())
+        # Different pool settings get their own session
+        self.assertIsNot(get_session(pool_maxsize=2), get_session())
+        self.assertIs(get_session(pool_maxsize=2), get_session(pool_maxsize=2))
+
+    def test_session_settings(self):
+        session = create_session(pool_connections=2, pool_maxsize=3, keep_alive=False)
+        adapter = session.get_adapter('https://api.gdax.com')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(session.headers['Connection'], 'close')
+        client = PublicClient(session=session, timeout=1)
+        self.assertIs(client.session, session)
+        self.assertEqual(client.timeout, 1)
+
+
+class FakeResponse(object):
+    def __init__(self, body, headers):
+        self.body = body
+        self.headers = headers
+
+    def json(self):
+        return self.body
+
+
+class PagedSession(object):
+    """Serves `page_size` records per page, newest first, recording every request
+    """
+
+    def __init__(self, records, page_size=2):
+        self.records = records
+        self.page_size = page_size
+        self.requests = []
+
+    def request(self, method, url, params=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        start = int((params or {}).get('after', 0))
+        page_size = int((params or {}).get('limit', self.page_size))
+        headers = {}
+        if start + page_size < len(self.records):
+            headers['cb-after'] = str(start + page_size)
+        return FakeResponse(self.records[start:start + page_size], headers)
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.session = PagedSession([{'id': i} for i in range(5)])
+        self.client = AuthenticatedClient('key', 'c2VjcmV0', 'phrase', api_url='https://api.gdax.com',
+                                          session=self.session, scheduler=RequestScheduler(private_burst=100))
+
+    def test_get_pages(self):
+        pages = self.client.get_account_history('usd')
+        self.assertEqual([[x['id'] for x in page] for page in pages], [[0, 1], [2, 3], [4]])
+        pages = self.client.get_fills(product_id='ETH-USD', limit=2)
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(self.session.requests[-1][1], {'product_id': 'ETH-USD', 'limit': 2})
+
+    def test_iter_early_termination(self):
+        records = self.client.iter_orders(product_id='ETH-USD', limit=3)
+        self.assertEqual([x['id'] for x in records], [0, 1, 2])
+        self.assertEqual([x[1].get('after') for x in self.session.requests], [None, '2'])
+
+        records = self.client.iter_account_history('usd')
+        self.assertEqual(next(records)['id'], 0)
+        records.close()
+        self.assertEqual(len(self.session.requests), 3)
+
+    def test_iter_page_size_and_prefetch(self):
+        records = list(self.client.iter_fills(product_id='ETH-USD', page_size=3, prefetch=True))
+        self.assertEqual([x['id'] for x in records], [0, 1, 2, 3, 4])
+        self.assertEqual(self.session.requests, [
+            ('https://api.gdax.com/fills', {'product_id': 'ETH-USD', 'limit': 3}),
+            ('https://api.gdax.com/fills', {'product_id': 'ETH-USD', 'limit': 3, 'after': '3'}),
+        ])
+
+    def test_trades_page_cursors(self):
+        client = PublicClient(api_url='https://api.gdax.com', session=self.session,
+                              scheduler=RequestScheduler(public_burst=100))
+        client.get_product_trades_page('ETH-USD', limit=1)
+        # 0 is a cursor (from the oldest trade), not a missing one
+        client.get_product_trades_page('ETH-USD', before=0, limit=1)
+        self.assertEqual([x[1] for x in self.session.requests], [{'limit': 1}, {'before': 0, 'limit': 1}])
@@ -2,11 +2,15 @@ import logging
 import unittest
 from unittest.mock import Mock, MagicMock
 
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
 from tests.authenticated_client_regression import AuthenticatedClientRegression
 from trader.cost_basis import CostBasisTrader
 
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.DEBUG)
 
+START = 1500000000
+
 
 class TestCostBasis(unittest.TestCase):
     def test_on_order_done(self):
@@ -31,7 +35,7 @@ class TestCostBasis(unittest.TestCase):
         self.assertEqual(len(auth_client_mock.orders), 2)
         expected = {
             'side': 'sell',
-            'size': '10.0',
+            'size': '10.00000000',
             'price': '99.99',
             'type': 'limit',
             'post_only': True,
@@ -54,7 +58,7 @@ class TestCostBasis(unittest.TestCase):
             'product_id': 'ETH-USD',
         })
         self.assertEqual(trader.current_order_depth, 2)
-        self.assertEqual(trader.quote_currency_paid, 1990.0081117005002)
+        self.assertEqual(trader.quote_currency_paid, 1990.0081117005)
         self.assertEqual(trader.base_currency_bought, 20.30405061)
         self.assertEqual(len(auth_client_mock.orders), 2)
         expected = {
@@ -88,7 +92,7 @@ class TestCostBasis(unittest.TestCase):
         expected = {
             'side': 'sell',
             'size': '30.81520154',
-            'price': '98.0',
+            'price': '98.00',
             'type': 'limit',
             'post_only': True,
         }
@@ -115,7 +119,7 @@ class TestCostBasis(unittest.TestCase):
         expected = {
             'side': 'sell',
             'size': '30.81520154',
-            'price': '98.0',
+            'price': '98.00',
             'type': 'limit',
             'post_only': True,
         }
@@ -166,16 +170,16 @@ class TestCostBasis(unittest.TestCase):
         self.assertEqual(len(auth_client_mock.orders), 2)
         expected = {
             'side': 'buy',
-            'size': '10.0',
-            'price': '101.0',
+            'size': '10.00000000',
+            'price': '101.00',
             'type': 'stop',
             'post_only': False,
         }
         self.assertIn(expected, [{k: x[k] for k in expected.keys()} for x in auth_client_mock.orders])
         expected = {
             'side': 'buy',
-            'size': '10.0',
-            'price': '99.0',
+            'size': '10.00000000',
+            'price': '99.00',
             'type': 'limit',
             'post_only': True,
         }
@@ -185,6 +189,43 @@ class TestCostBasis(unittest.TestCase):
             wallet_value += float(order['size']) * float(order['price'])
         # Make sure we actually made money...
         self.assertGreater(wallet_value, 10000)
+        # Four buy fills went through settle and cancel/replace
+        self.assertEqual(trader.metrics.latency('fill_to_orders_live').count, 4)
+        self.assertEqual(trader.metrics.latency('fill_to_settled').count, 4)
+
+    def test_resting_levels(self):
+        exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 10000})
+        exchange.set_price('ETH-USD', 100.0)
+        trader = CostBasisTrader('ETH-USD', 3, 0.1, auth_client=exchange, resting_levels=2)
+        exchange.subscribe(trader.received_message, idle=lambda: trader.fill_executor.submit(lambda: None).result())
+        trader.on_start()
+        # Seed buy fills, leaving the sell and the next two levels down
+        exchange.replay_trades('ETH-USD', iter([(START, 98.9, 100)]))
+        buys = sorted([x for x in exchange.get_orders()[0] if x['side'] == 'buy'], key=lambda x: -float(x['price']))
+        self.assertEqual(len(exchange.get_orders()[0]), 3)
+        self.assertEqual([float(x['price']) for x in buys], [float(x['buy_price']) for x in trader.ladder.planned[:2]])
+        self.assertEqual(trader.ladder.plans, 1)
+
+        # Top level fills as planned, the lower buy stays put
+        exchange.replay_trades('ETH-USD', iter([(START + 1, 96.0, 100)]))
+        orders = exchange.get_orders()[0]
+        self.assertEqual(trader.current_order_depth, 2)
+        self.assertEqual(len(orders), 3)
+        self.assertIn(buys[1]['id'], [x['id'] for x in orders])
+        self.assertEqual(trader.metrics.get('resting_kept'), 1)
+        self.assertEqual(trader.ladder.plans, 1)
+        self.assertEqual([float(x['price']) for x in orders if x['side'] == 'sell'],
+                         [float(trader.ladder.planned[1]['sell_price'])])
+        bought = trader.ladder.planned[1]['bought']
+        trader.stop()
+        exchange.close()
+
+        # A restart picks up from the sell with the buys resting
+        trader = CostBasisTrader('ETH-USD', 3, 0.1, auth_client=exchange, resting_levels=2)
+        trader.on_start()
+        self.assertEqual(trader.base_bought, bought)
+        self.assertEqual(len(exchange.get_orders()[0]), 3)
+        trader.stop()
 
     def test_recovery(self):
         auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
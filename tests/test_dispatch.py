@@ -0,0 +1,39 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.base_trader import Trader
+from trader.dispatch import MessageDispatcher
+from trader.dispatch import peek
+
+
+class TestDispatch(unittest.TestCase):
+    def test_peek(self):
+        raw = '{"type": "done", "side":"buy","product_id":"ETH-USD","price":"100.00"}'
+        self.assertEqual(peek(raw, 'type'), 'done')
+        self.assertEqual(peek(raw, 'product_id'), 'ETH-USD')
+        self.assertIsNone(peek(raw, 'order_id'))
+
+    def test_skips_decode(self):
+        done = MagicMock()
+        dispatcher = MessageDispatcher({'done': done}, product_ids=['ETH-USD'])
+        dispatcher.dispatch(json.dumps({'type': 'l2update', 'product_id': 'ETH-USD', 'changes': []}))
+        dispatcher.dispatch(json.dumps({'type': 'done', 'product_id': 'LTC-USD', 'order_id': 'id1'}))
+        done.assert_not_called()
+        self.assertEqual(dispatcher.skipped, 2)
+        dispatcher.dispatch(json.dumps({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'id2'}))
+        done.assert_called_once_with({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'id2'})
+        self.assertEqual(dispatcher.decoded, 1)
+
+    def test_trader_routing(self):
+        auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
+        trader = Trader('ETH-USD', auth_client=auth_client_mock)
+        trader.on_order_done = MagicMock()
+        trader.received_message(json.dumps({'type': 'done', 'product_id': 'LTC-USD', 'order_id': 'id1'}))
+        trader.received_message(json.dumps({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'id2'}))
+        trader.on_message({'type': 'received', 'product_id': 'ETH-USD', 'order_id': 'id3'})
+        # Barrier, fills are handled on their own thread
+        trader.fill_executor.submit(lambda: None).result()
+        trader.on_order_done.assert_called_once_with({'type': 'done', 'product_id': 'ETH-USD', 'order_id': 'id2'})
+        trader.stop()
@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+import unittest
+
+from backtest.engine import random_candles
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from trader.cost_basis import CostBasisTrader
+
+
+def balances(exchange):
+    return {x['currency']: (float(x['balance']), float(x['available'])) for x in exchange.get_accounts()}
+
+
+class TestSimulatedExchange(unittest.TestCase):
+    def setUp(self):
+        self.exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000})
+        self.exchange.set_price('ETH-USD', 100.0)
+        self.messages = []
+        self.exchange.subscribe(lambda x: self.messages.append(json.loads(x)))
+
+    def test_holds_and_rejects(self):
+        self.assertEqual(self.exchange.buy(type='limit', product_id='ETH-USD', price=101, size=1, post_only=True),
+                         {'message': 'Post only mode'})
+        self.assertEqual(self.exchange.buy(type='limit', product_id='ETH-USD', price=99, size=20, post_only=True),
+                         {'message': 'Insufficient funds'})
+        order = self.exchange.buy(type='limit', product_id='ETH-USD', price=99, size=2, post_only=True)
+        self.assertEqual(balances(self.exchange)['USD'], (1000, 802))
+        self.assertEqual(self.exchange.get_orders(), [[order]])
+        self.assertEqual(self.exchange.cancel_order(order['id']), [order['id']])
+        self.assertEqual(balances(self.exchange)['USD'], (1000, 1000))
+        self.assertEqual(self.messages[-1]['type'], 'done')
+        self.assertEqual(self.messages[-1]['reason'], 'canceled')
+        self.assertEqual(self.exchange.rejects, 2)
+
+    def test_queue_and_partial_fills(self):
+        self.exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000}, queue_ahead=1,
+                                          settle_delay=0.01)
+        self.exchange.subscribe(lambda x: self.messages.append(json.loads(x)))
+        order = self.exchange.buy(type='limit', product_id='ETH-USD', price=99, size=2, post_only=True)
+        self.assertFalse(self.exchange.on_trade('ETH-USD', 99.5, 5))
+        # One ahead of us in the queue, then one for us
+        self.assertTrue(self.exchange.on_trade('ETH-USD', 99, 2))
+        self.assertEqual([x['type'] for x in self.messages], ['received', 'match'])
+        self.assertEqual(self.messages[1]['maker_order_id'], order['id'])
+        self.assertEqual(self.exchange.get_order(order['id'])['filled_size'], '1.00000000')
+        self.assertEqual(balances(self.exchange)['USD'], (901, 802))
+        # Traded through, rest fills at our price
+        self.exchange.on_trade('ETH-USD', 98.5, 0.1)
+        self.assertEqual([x['type'] for x in self.messages], ['received', 'match', 'match', 'done'])
+        self.assertEqual(self.messages[-1]['reason'], 'filled')
+        self.assertEqual(balances(self.exchange), {'USD': (802, 802), 'ETH': (2, 2)})
+        self.assertFalse(self.exchange.get_order(order['id'])['settled'])
+        time.sleep(0.05)
+        self.assertTrue(self.exchange.get_order(order['id'])['settled'])
+
+    def test_stop(self):
+        order = self.exchange.buy(type='stop', product_id='ETH-USD', price=101, size=2, funds=202)
+        self.assertEqual(balances(self.exchange)['USD'], (1000, 798))
+        self.exchange.on_trade('ETH-USD', 101, 0.1)
+        order = self.exchange.get_order(order['id'])
+        self.assertEqual(order['status'], 'done')
+        self.assertEqual(order['filled_size'], '2.00000000')
+        self.assertAlmostEqual(float(order['fill_fees']), 0.606)
+        # Only received once triggered
+        self.assertEqual([x['type'] for x in self.messages], ['received', 'match', 'done'])
+        self.assertEqual(self.messages[1]['taker_order_id'], order['id'])
+
+    def test_trader(self):
+        logging.disable(logging.WARNING)
+        try:
+            candles = random_candles(20000)
+            exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000}, settle_delay=0.001)
+            exchange.set_price('ETH-USD', candles[0][4], candles[0][0])
+            trader = CostBasisTrader('ETH-USD', 4, 0.2, auth_client=exchange)
+            trader.settlements.initial_delay = 0.001
+            exchange.subscribe(trader.received_message,
+                               idle=lambda: trader.fill_executor.submit(lambda: None).result())
+            trader.on_start()
+            exchange.replay_candles('ETH-USD', candles)
+            trader.stop()
+            exchange.close()
+        finally:
+            logging.disable(logging.NOTSET)
+        filled = [x for x in exchange.orders.values() if x['done_reason'] == 'filled']
+        self.assertGreater(len(filled), 5)
+        # Every fill went through the live done -> settle -> replace path
+        self.assertEqual(trader.metrics.latency('fill_to_orders_live').count, len(filled))
+        self.assertEqual(len(exchange.get_orders()[0]), 2)
+        for balance, available in balances(exchange).values():
+            self.assertGreaterEqual(available, -1e-9)
@@ -0,0 +1,100 @@
+import logging
+import os
+import tempfile
+import time
+import unittest
+from decimal import Decimal
+
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from trader.cost_basis import CostBasisTrader
+from trader.journal import Journal
+from trader.journal import read_journal
+from trader.journal import replay
+
+START = 1500000000
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.journal')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_batched_sync(self):
+        journal = Journal(self.path, sync_every=2, sync_interval=0.05)
+        journal.append({'type': 'state', 'product_id': 'ETH-USD', 'depth': 1, 'orders': ['a']})
+        self.assertEqual(journal.syncs, 0)
+        journal.append({'type': 'fill', 'product_id': 'ETH-USD', 'order_id': 'a', 'side': 'buy'})
+        self.assertEqual(journal.syncs, 1)
+        # A lone record is synced within the interval
+        journal.append({'type': 'state', 'product_id': 'LTC-USD', 'depth': 0, 'orders': []})
+        time.sleep(0.2)
+        self.assertEqual(journal.syncs, 2)
+        journal.close()
+        # Torn write from a crash
+        with open(self.path, 'a') as torn:
+            torn.write('{"type": "fi')
+        records = read_journal(self.path)
+        self.assertEqual(len(records), 3)
+        state = replay(records, 'ETH-USD')
+        self.assertEqual((state['depth'], state['orders'], len(state['fills'])), (1, ['a'], 1))
+        self.assertIsNone(replay(records, 'BTC-USD'))
+        self.assertEqual(read_journal(self.path + '.missing'), [])
+
+    def start(self, exchange):
+        trader = CostBasisTrader('ETH-USD', 3, 0.1, auth_client=exchange, journal=Journal(self.path))
+        trader.on_start()
+        return trader
+
+    def stop(self, trader):
+        trader.stop()
+        trader.journal.close()
+
+    def test_resume(self):
+        logging.disable(logging.WARNING)
+        try:
+            exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 10000})
+            exchange.set_price('ETH-USD', 100.0)
+            trader = self.start(exchange)
+            exchange.subscribe(trader.received_message,
+                               idle=lambda: trader.fill_executor.submit(lambda: None).result())
+            exchange.replay_trades('ETH-USD', iter([(START, 98.9, 100)]))
+            position = (trader.current_order_depth, trader.quote_paid, trader.base_bought)
+            orders = sorted(x['id'] for x in exchange.get_orders()[0])
+            self.stop(trader)
+            exchange.listeners = []
+
+            # Exactly where it was, orders untouched
+            trader = self.start(exchange)
+            self.assertEqual((trader.current_order_depth, trader.quote_paid, trader.base_bought),
+                             position)
+            self.assertEqual(sorted(x['id'] for x in exchange.get_orders()[0]), orders)
+            self.assertEqual(trader.metrics.get('journal_resumes'), 1)
+            self.stop(trader)
+
+            # Crashed after journaling a fill, before replacing orders
+            buy = [x for x in exchange.get_orders()[0] if x['side'] == 'buy'][0]
+            journal = Journal(self.path)
+            journal.append({'type': 'fill', 'product_id': 'ETH-USD', 'order_id': buy['id'], 'side': 'buy',
+                            'filled_size': buy['size'], 'price': buy['price'], 'executed_value': None})
+            journal.close()
+            exchange.replay_trades('ETH-USD', iter([(START + 1, float(buy['price']) - 0.5, 100)]))
+            trader = self.start(exchange)
+            self.assertEqual(trader.current_order_depth, position[0] + 1)
+            self.assertEqual(trader.metrics.get('journal_resumes'), 1)
+            self.assertEqual(len(exchange.get_orders()[0]), 2)
+            self.assertNotIn(buy['id'], [x['id'] for x in exchange.get_orders()[0]])
+            self.stop(trader)
+
+            # An order vanished without a journaled fill, back to guessing from the sell
+            exchange.cancel_order([x for x in exchange.get_orders()[0] if x['side'] == 'buy'][0]['id'])
+            trader = self.start(exchange)
+            self.assertEqual(trader.metrics.get('journal_resumes'), 0)
+            self.assertEqual(trader.base_bought, position[2] + Decimal(buy['size']))
+            self.stop(trader)
+        finally:
+            logging.disable(logging.NOTSET)
+            exchange.close()
@@ -0,0 +1,48 @@
+import unittest
+from decimal import Decimal
+
+from trader.base_trader import CENT
+from trader.base_trader import SATOSHI
+from trader.ladder import Ladder
+
+
+class TestLadder(unittest.TestCase):
+    def setUp(self):
+        self.ladder = Ladder(CENT, SATOSHI, CENT, 0.01, 0.1, 3, base_min=Decimal('0.001'))
+
+    def test_plan(self):
+        # 10 @ 99.00 bought, 1000.00 to spend out of 10000.00
+        legs = self.ladder.plan(Decimal('990'), Decimal('10'), 1, Decimal('1000'), Decimal('10000'))
+        # As the trader placed them before planning ahead
+        self.assertEqual((legs[0]['sell_price'], legs[0]['buy_size'], legs[0]['buy_price']),
+                         (Decimal('99.99'), Decimal('10.30405061'), Decimal('97.05')))
+        # 1000.0081 spent, to the cent
+        self.assertEqual(legs[0]['spent'], Decimal('1000.01'))
+        self.assertEqual([x['depth'] for x in legs], [1, 2, 3, 4])
+        self.assertEqual([x['last'] for x in legs], [False, False, False, True])
+        for before, after in zip(legs, legs[1:]):
+            self.assertEqual(after['paid'], before['paid'] + before['buy_size'] * before['buy_price'])
+            self.assertEqual(after['bought'], before['bought'] + before['buy_size'])
+            self.assertEqual(after['order_size'], ((Decimal('10000') - before['spent']) / 10).quantize(CENT))
+            self.assertLess(after['sell_price'], before['sell_price'])
+            self.assertLess(after['buy_price'], before['buy_price'])
+
+    def test_leg(self):
+        first = self.ladder.leg(Decimal('990'), Decimal('10'), 1, 1000.0, 10000.0)
+        second = self.ladder.legs[(first['paid'] + first['buy_size'] * first['buy_price'],
+                                   first['bought'] + first['buy_size'], 2, Decimal('900'))]
+        # The fill went as planned, no replanning
+        self.assertIs(self.ladder.leg(second['paid'], second['bought'], 2, 900.0, 9000.0), second)
+        self.assertEqual((self.ladder.plans, self.ladder.hits), (1, 1))
+        # Balance moved under us, plan again from here
+        third = self.ladder.leg(second['paid'], second['bought'], 2, 850.0, 8500.0)
+        self.assertEqual(third['order_size'], Decimal('850'))
+        self.assertEqual((self.ladder.plans, self.ladder.hits), (2, 1))
+
+    def test_exhaustion(self):
+        # Runs out of balance before the order depth
+        ladder = Ladder(CENT, SATOSHI, CENT, 0.01, 0.5, 50, base_min=Decimal('0.001'))
+        legs = ladder.plan(Decimal('990'), Decimal('10'), 1, Decimal('1'), Decimal('2'))
+        self.assertEqual(len(legs), 8)
+        self.assertTrue(legs[-1]['last'])
+        self.assertEqual(legs[-1]['order_size'], 0)
@@ -0,0 +1,102 @@
+import json
+import random
+import unittest
+from unittest.mock import MagicMock
+
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.base_trader import Trader
+from trader.order_book import OrderBook
+
+
+def snapshot(bids, asks, sequence=None):
+    message = {
+        'type': 'snapshot',
+        'product_id': 'ETH-USD',
+        'bids': [[str(price), str(size)] for price, size in bids],
+        'asks': [[str(price), str(size)] for price, size in asks],
+    }
+    if sequence is not None:
+        message['sequence'] = sequence
+    return message
+
+
+def update(changes, sequence=None):
+    message = {
+        'type': 'l2update',
+        'product_id': 'ETH-USD',
+        'changes': [[side, str(price), str(size)] for side, price, size in changes],
+    }
+    if sequence is not None:
+        message['sequence'] = sequence
+    return message
+
+
+class TestOrderBook(unittest.TestCase):
+    def test_best_levels(self):
+        book = OrderBook('ETH-USD')
+        self.assertIsNone(book.best_bid())
+        book.on_message(snapshot([(99.0, 1), (98.0, 2)], [(101.0, 1), (102.0, 3)]))
+        self.assertEqual(book.best_bid(), (99.0, 1.0))
+        self.assertEqual(book.best_ask(), (101.0, 1.0))
+        self.assertEqual(book.mid_price(), 100.0)
+        book.on_message(update([('buy', 99.5, 4), ('sell', 101.0, 0)]))
+        self.assertEqual(book.best_bid(), (99.5, 4.0))
+        self.assertEqual(book.best_ask(), (102.0, 3.0))
+        book.on_message(update([('buy', 99.5, 0), ('buy', 99.0, 0)]))
+        self.assertEqual(book.best_bid(), (98.0, 2.0))
+        # Removed and re-added
+        book.on_message(update([('buy', 99.0, 5)]))
+        self.assertEqual(book.best_bid(), (99.0, 5.0))
+
+    def test_matches_sorted_levels(self):
+        rand = random.Random(7)
+        book = OrderBook('ETH-USD')
+        book.load_snapshot([], [])
+        bids = {}
+        for _ in range(5000):
+            price = float(rand.randint(1, 200))
+            size = rand.choice([0, 0, 1, 2])
+            book.set_level('buy', price, size)
+            if size:
+                bids[price] = float(size)
+            else:
+                bids.pop(price, None)
+            self.assertEqual(book.best_bid(), (max(bids), bids[max(bids)]) if bids else None)
+        self.assertLess(len(book.heaps['buy']), 2 * len(bids) + 65)
+
+    def test_resync(self):
+        client = MagicMock()
+        client.get_product_order_book = MagicMock(return_value={
+            'sequence': 10,
+            'bids': [['99.00', '1.0', 1]],
+            'asks': [['100.00', '1.0', 1]],
+        })
+        book = OrderBook('ETH-USD', client)
+        # Update before a snapshot
+        book.on_message(update([('buy', 98.0, 1)], sequence=5))
+        self.assertEqual(book.resyncs, 1)
+        self.assertEqual(book.best_bid(), (99.0, 1.0))
+        # Stale, then in order
+        book.on_message(update([('buy', 98.0, 1)], sequence=9))
+        book.on_message(update([('buy', 99.5, 1)], sequence=11))
+        self.assertEqual(book.best_bid(), (99.5, 1.0))
+        # Gap
+        book.on_message(update([('buy', 99.7, 1)], sequence=13))
+        self.assertEqual(book.resyncs, 2)
+        self.assertEqual(book.best_bid(), (99.0, 1.0))
+        self.assertEqual(book.sequence, 10)
+        # Crossed, no sequence
+        book.on_message(update([('buy', 100.5, 1)]))
+        self.assertEqual(book.resyncs, 3)
+        self.assertEqual(book.best_bid(), (99.0, 1.0))
+
+    def test_trader_prices_from_book(self):
+        auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
+        auth_client_mock.get_product_ticker = MagicMock()
+        trader = Trader('ETH-USD', auth_client=auth_client_mock, use_book=True)
+        self.assertIn('level2', trader.channels())
+        trader.received_message(json.dumps(snapshot([(99.0, 1)], [(103.0, 1)])))
+        trader.received_message(json.dumps(update([('sell', 101.0, 1)])))
+        self.assertEqual(trader.get_market_price(), 100.0)
+        auth_client_mock.get_product_ticker.assert_not_called()
+        trader.stop()
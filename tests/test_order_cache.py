@@ -0,0 +1,23 @@
+import unittest
+
+from trader.order_cache import OrderCache
+
+
+class TestOrderCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = OrderCache(['a', 'b', 'c'], capacity=3)
+        self.assertEqual(list(cache), ['a', 'b', 'c'])
+        # Refreshing moves to newest so b is evicted next instead
+        cache.add('a')
+        cache.add('d')
+        self.assertEqual(list(cache), ['c', 'a', 'd'])
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.evicted, 1)
+
+    def test_discard(self):
+        cache = OrderCache(['a', 'b'])
+        cache.discard('a')
+        cache.discard('missing')
+        self.assertNotIn('a', cache)
+        self.assertIn('b', cache)
+        self.assertEqual(len(cache), 1)
@@ -0,0 +1,59 @@
+import logging
+import unittest
+
+from backtest.engine import random_candles
+from backtest.portfolio import Portfolio
+from backtest.portfolio import format_results
+from backtest.portfolio import merge_candles
+from backtest.portfolio import parse_spec
+
+
+class TestPortfolio(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_parse_spec(self):
+        self.assertEqual(parse_spec('ETH-USD', 6, 0.13, 0.01), ('ETH-USD', 6, 0.13, 0.01))
+        self.assertEqual(parse_spec('LTC-USD:4:0.2', 6, 0.13, 0.01), ('LTC-USD', 4, 0.2, 0.01))
+
+    def test_merge_candles(self):
+        eth = random_candles(100)
+        ltc = random_candles(50, seed=7)
+        # Every other minute
+        ltc[:, 0] = eth[::2, 0] + 30
+        merged = list(merge_candles({'ETH-USD': eth, 'LTC-USD': ltc}))
+        self.assertEqual(len(merged), 150)
+        self.assertEqual([x[0] for x in merged], sorted(x[0] for x in merged))
+        self.assertEqual([x[1] for x in merged[:4]], ['ETH-USD', 'LTC-USD', 'ETH-USD', 'ETH-USD'])
+
+    def test_shared_account(self):
+        candles = {'ETH-USD': random_candles(5000), 'LTC-USD': random_candles(5000, seed=7, start=50.0)}
+        portfolio = Portfolio([('ETH-USD', 4, 0.2, 0.01), ('LTC-USD', 4, 0.2, 0.01)], starting_balance=1000)
+        try:
+            portfolio.run(candles)
+        finally:
+            portfolio.stop()
+        self.assertEqual(portfolio.candles, 10000)
+        rows = portfolio.results()
+        self.assertEqual([x['product_id'] for x in rows], ['ETH-USD', 'LTC-USD', 'Total'])
+        for row in rows[:2]:
+            self.assertGreater(row['fills'], 0)
+            self.assertAlmostEqual(row['position'], portfolio.exchange.accounts[row['product_id'][:3]]['balance'])
+        # Per product P&L adds up to the change in the shared account's value
+        self.assertAlmostEqual(rows[0]['pnl'] + rows[1]['pnl'], rows[2]['pnl'])
+        self.assertEqual(len(format_results(rows)), 4)
+        self.assertGreaterEqual(portfolio.exchange.accounts['USD']['balance'], 0)
+
+    def test_missing_candles(self):
+        portfolio = Portfolio([('ETH-USD', 4, 0.2, 0.01), ('LTC-USD', 4, 0.2, 0.01)])
+        try:
+            with self.assertRaisesRegex(ValueError, 'LTC-USD'):
+                portfolio.run({'ETH-USD': random_candles(10), 'LTC-USD': random_candles(10)[:0]})
+            with self.assertRaisesRegex(ValueError, 'LTC-USD'):
+                portfolio.run({'ETH-USD': random_candles(10)})
+        finally:
+            portfolio.stop()
+        self.assertIsNone(portfolio.supervisor)
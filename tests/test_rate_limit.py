@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+
+from gdax.rate_limit import BACKGROUND, ORDERS, READS
+from gdax.rate_limit import RequestScheduler
+from gdax.rate_limit import TokenBucket
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, 3, clock=clock)
+        for _ in range(3):
+            self.assertEqual(bucket.time_until_available(), 0)
+            bucket.take()
+        self.assertAlmostEqual(bucket.time_until_available(), 0.5)
+        clock.now = 0.25
+        self.assertAlmostEqual(bucket.time_until_available(), 0.25)
+        # Refill is capped at capacity
+        clock.now = 100
+        bucket.refill()
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_priority_lanes(self):
+        scheduler = RequestScheduler(private_rate=10, private_burst=1)
+        scheduler.acquire(private=True)
+        served = []
+
+        def request(priority):
+            scheduler.acquire(private=True, priority=priority)
+            served.append(priority)
+
+        # Reconciliation read queues first, but the order placement behind it gets the next token
+        threads = [threading.Thread(target=request, args=(BACKGROUND,)),
+                   threading.Thread(target=request, args=(ORDERS,))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(served, [ORDERS, BACKGROUND])
+        # Public calls have their own bucket, no waiting behind the private ones
+        self.assertLess(scheduler.acquire(priority=READS), 0.01)
+
+        stats = scheduler.stats()
+        self.assertEqual(stats['private']['depth'], 0)
+        self.assertEqual(stats['private']['max_depth'], 2)
+        self.assertEqual(stats['private']['lanes']['orders']['count'], 1)
+        self.assertGreater(stats['private']['lanes']['background']['mean_wait'],
+                           stats['private']['lanes']['orders']['mean_wait'])
+        self.assertEqual(stats['public']['lanes']['reads']['count'], 1)
+
+    def test_interrupted_wait(self):
+        scheduler = RequestScheduler(private_rate=10, private_burst=1)
+        bucket = scheduler.buckets['private']
+        scheduler.acquire(private=True)
+        served = []
+
+        def request():
+            scheduler.acquire(private=True, priority=READS)
+            served.append(READS)
+
+        waiter = threading.Thread(target=request, daemon=True)
+        waiter.start()
+        time.sleep(0.02)
+        # An order placement jumps ahead of the queued read and is interrupted while at the head
+        scheduler.buckets['private'] = FailingBucket(bucket)
+        with self.assertRaises(KeyboardInterrupt):
+            scheduler.acquire(private=True, priority=ORDERS)
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(served, [READS])
+        self.assertEqual(scheduler.stats()['private']['depth'], 0)
+
+
+class FailingBucket(object):
+    """Raises the first time it's asked for a token, as an interrupt in the wait would
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.failed = False
+
+    def time_until_available(self):
+        if not self.failed:
+            self.failed = True
+            raise KeyboardInterrupt()
+        return self.bucket.time_until_available()
+
+    def take(self):
+        self.bucket.take()
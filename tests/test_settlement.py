@@ -0,0 +1,43 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from trader.settlement import SettlementTimeout
+from trader.settlement import SettlementTracker
+
+
+class TestSettlementTracker(unittest.TestCase):
+    def test_polls_until_settled(self):
+        client = MagicMock()
+        client.get_order.side_effect = [
+            {'id': 'id1', 'settled': False},
+            {'id': 'id1', 'settled': False},
+            {'id': 'id1', 'settled': True, 'filled_size': '1.0'},
+        ]
+        tracker = SettlementTracker(client, initial_delay=0.01)
+        order = tracker.track('id1').result(timeout=1)
+        self.assertEqual(order['filled_size'], '1.0')
+        self.assertEqual(client.get_order.call_count, 3)
+        self.assertEqual(tracker.futures, {})
+
+    def test_message_wakes_poller(self):
+        orders = [{'id': 'id1', 'settled': False}]
+        client = MagicMock()
+        client.get_order.side_effect = lambda order_id: orders[-1]
+        # Backoff long enough that only the message can explain a quick result
+        tracker = SettlementTracker(client, initial_delay=30)
+        start = time.time()
+        future = tracker.track('id1')
+        self.assertIs(future, tracker.track('id1'))
+        time.sleep(0.05)
+        orders.append({'id': 'id1', 'settled': True})
+        tracker.on_message({'type': 'match', 'maker_order_id': 'id1', 'taker_order_id': 'id2'})
+        self.assertTrue(future.result(timeout=1)['settled'])
+        self.assertLess(time.time() - start, 5)
+
+    def test_deadline(self):
+        client = MagicMock()
+        client.get_order.return_value = {'message': 'NotFound'}
+        tracker = SettlementTracker(client, initial_delay=0.01, deadline=0.1)
+        with self.assertRaises(SettlementTimeout):
+            tracker.track('id1').result(timeout=1)
@@ -0,0 +1,39 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from tests.authenticated_client_regression import AuthenticatedClientRegression
+from trader.cost_basis import CostBasisTrader
+from trader.supervisor import Supervisor
+
+
+class TestSupervisor(unittest.TestCase):
+    def test_shared_setup_and_routing(self):
+        auth_client_mock = AuthenticatedClientRegression('ETH-USD', [100, 100, 100, 100])
+        auth_client_mock.get_products = MagicMock(wraps=auth_client_mock.get_products)
+        auth_client_mock.get_accounts = MagicMock(wraps=auth_client_mock.get_accounts)
+        supervisor = Supervisor(auth_client=auth_client_mock, secret_key='c2VjcmV0')
+        eth = supervisor.add_trader(CostBasisTrader, 'ETH-USD', 3, 0.1)
+        ltc = supervisor.add_trader(CostBasisTrader, 'LTC-USD', 3, 0.1, delta=0.02)
+        self.assertEqual(auth_client_mock.get_products.call_count, 1)
+        self.assertEqual(auth_client_mock.get_accounts.call_count, 1)
+        # One balance snapshot, a USD balance refresh by one trader is seen by the other
+        self.assertIs(eth.accounts, ltc.accounts)
+        eth.accounts['USD']['available'] = 5.0
+        self.assertEqual(ltc.get_available_balance('USD'), 5.0)
+        self.assertEqual(ltc.delta, 0.02)
+        with self.assertRaises(ValueError):
+            supervisor.add_trader(CostBasisTrader, 'ETH-USD', 3, 0.1)
+
+        supervisor.send = MagicMock()
+        supervisor.opened()
+        subscribe = json.loads(supervisor.send.call_args[0][0])
+        self.assertEqual(subscribe['product_ids'], ['ETH-USD', 'LTC-USD'])
+        self.assertEqual(subscribe['channels'], ['heartbeat', 'user'])
+
+        eth.on_message = MagicMock()
+        ltc.on_message = MagicMock()
+        supervisor.received_message(json.dumps({'type': 'done', 'product_id': 'LTC-USD', 'order_id': 'id1'}))
+        supervisor.received_message(json.dumps({'type': 'done', 'product_id': 'BTC-USD', 'order_id': 'id2'}))
+        eth.on_message.assert_not_called()
+        ltc.on_message.assert_called_once_with({'type': 'done', 'product_id': 'LTC-USD', 'order_id': 'id1'})
@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import MagicMock
+
+from trader.ticker_cache import TickerCache
+from trader.ticker_cache import TickerFailure
+from trader.ticker_cache import value_accounts
+
+
+class TestTickerCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.client = MagicMock()
+        self.client.get_product_ticker = MagicMock(return_value={'price': '99.5', 'bid': '99.00', 'ask': '100.00'})
+        self.cache = TickerCache(self.client, ttl=10, clock=lambda: self.now)
+
+    def test_feed_then_rest_fallback(self):
+        self.cache.on_message({'type': 'ticker', 'product_id': 'ETH-USD', 'price': '300.00', 'best_bid': '299.99',
+                               'best_ask': '300.01'})
+        self.now = 10
+        self.assertEqual(self.cache.get('ETH-USD')['ask'], 300.01)
+        self.client.get_product_ticker.assert_not_called()
+        # Stale
+        self.now = 10.5
+        self.assertEqual(self.cache.get('ETH-USD')['ask'], 100.0)
+        self.assertEqual(self.cache.get('ETH-USD')['ask'], 100.0)
+        self.client.get_product_ticker.assert_called_once_with('ETH-USD')
+
+        self.client.get_product_ticker.return_value = {'message': 'NotFound'}
+        with self.assertRaises(TickerFailure):
+            self.cache.get('XRP-USD')
+
+    def test_value_accounts(self):
+        self.cache.update('ETH-USD', 300, 299, 301)
+        total, rows = value_accounts([
+            {'currency': 'USD', 'balance': '100.5'},
+            {'currency': 'ETH', 'balance': '2'},
+            {'currency': 'BTC', 'balance': '0.0'},
+            {'currency': 'LTC', 'balance': '1'},
+        ], self.cache)
+        self.assertEqual(total, 100.5 + 602 + 100)
+        self.assertEqual(rows, [('USD', 100.5, None, 100.5), ('ETH', 2.0, 301.0, 602.0), ('LTC', 1.0, 100.0, 100.0)])
+        self.client.get_product_ticker.assert_called_once_with('LTC-USD')
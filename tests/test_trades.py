@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from backtest.exchange import SimulatedExchange
+from backtest.exchange import make_product
+from backtest.exchange import to_iso
+from backtest.trades import Meter
+from backtest.trades import find_trade_id
+from backtest.trades import get_trades
+from backtest.trades import parse_time
+from backtest.trades import read_trades
+from backtest.trades import write_trades
+from backtest.trades import window
+
+START = 1500000000
+
+
+class FakeTradesClient(object):
+    """Paginates trades by id like the exchange, newest first"""
+
+    def __init__(self, count, gap=None):
+        ids = [x for x in range(1, count + 1) if x != gap]
+        self.trades = [{'trade_id': x, 'time': to_iso(START + x), 'price': str(100 + x % 7), 'size': '0.5'}
+                       for x in ids]
+        self.calls = 0
+
+    def get_product_trades_page(self, product_id, before=None, after=None, limit=''):
+        self.calls += 1
+        limit = int(limit or 100)
+        if before is not None:
+            page = [x for x in self.trades if x['trade_id'] > before][:limit]
+        elif after is not None:
+            page = [x for x in self.trades if x['trade_id'] < after][-limit:]
+        else:
+            page = self.trades[-limit:]
+        return page[::-1], None, None
+
+
+class TestTrades(unittest.TestCase):
+    def test_api_pagination(self):
+        client = FakeTradesClient(1000, gap=500)
+        self.assertEqual(find_trade_id(client, 'ETH-USD', START + 250), 250)
+        # Lands on the next trade when the id for that time is missing
+        self.assertEqual(find_trade_id(client, 'ETH-USD', START + 500), 501)
+        self.assertEqual(find_trade_id(client, 'ETH-USD', START + 5000), 1001)
+        client.calls = 0
+        trades = list(get_trades('ETH-USD', START + 250, START + 750, client=client))
+        self.assertEqual(len(trades), 499)
+        self.assertEqual(trades[0], (START + 250, 100 + 250 % 7, 0.5))
+        self.assertEqual([x[0] for x in trades], sorted(x[0] for x in trades))
+        # Stops requesting pages once past the end
+        self.assertLess(client.calls, 20)
+
+    def test_api_from_first_trade(self):
+        client = FakeTradesClient(250)
+        # Starting before the first trade replays from it, not from the latest page
+        self.assertEqual(find_trade_id(client, 'ETH-USD', START - 1000), 1)
+        trades = list(get_trades('ETH-USD', START - 1000, START + 1000, client=client))
+        self.assertEqual([x[0] for x in trades], [START + x for x in range(1, 251)])
+        self.assertEqual(list(get_trades('ETH-USD', START, START + 1000, client=FakeTradesClient(0))), [])
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time(repr(START + 0.5)), START + 0.5)
+        # As the API sends them, with and without fractional seconds
+        self.assertEqual(parse_time('2017-07-14T02:40:00.5Z'), START + 0.5)
+        self.assertEqual(parse_time('2017-07-14T02:40:00Z'), START)
+
+    def test_file_round_trip(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            trades = [(START + x, 100.0 + x / 100, 0.1) for x in range(10)]
+            self.assertEqual(write_trades(path, iter(trades)), 10)
+            self.assertEqual(list(read_trades(path)), trades)
+            meter = Meter(window(read_trades(path), START + 2, START + 5), report_every=2)
+            self.assertEqual([x[0] for x in meter], [START + 2, START + 3, START + 4])
+            self.assertEqual(meter.count, 3)
+        finally:
+            os.remove(path)
+
+    def test_replay(self):
+        exchange = SimulatedExchange([make_product('ETH-USD')], {'USD': 1000})
+        exchange.set_price('ETH-USD', 100.0)
+        buy = exchange.buy(type='limit', product_id='ETH-USD', price=99, size=1, post_only=True)
+        sell = exchange.sell(type='limit', product_id='ETH-USD', price=101, size=1, post_only=True)
+        self.assertEqual(sell, {'message': 'Insufficient funds'})
+        # Only the print that reaches the buy fills it, prices follow every print
+        exchange.replay_trades('ETH-USD', iter([(START, 100.5, 1), (START + 1, 98.9, 1), (START + 2, 101.5, 1)]))
+        self.assertEqual(exchange.get_order(buy['id'])['status'], 'done')
+        self.assertEqual(exchange.prices['ETH-USD'], 101.5)
+        self.assertEqual(exchange.fills, 1)
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+
+from trader.dispatch import LazyJson
+from trader.order_cache import OrderCache
+
+module_logger = logging.getLogger(__name__)
+
+# Differences below this are rounding, not drift
+TOLERANCE = 1e-6
+# Seconds between REST reconciliations when nothing looks off
+RECONCILE_INTERVAL = 15 * 60.0
+
+
+class BalanceLedger(object):
+    """Keeps a trader's balance snapshot current from its own order events, so handling a fill doesn't need
+    an /accounts round trip.
+
+    Holds are tracked per order from placement (or its `received` message) until `done`, and `match` messages
+    move balance between the product's currencies and release hold. Anything that can't be accounted for
+    (an order we never saw placed, a balance going negative) marks the ledger as drifted, and the next refresh
+    goes to REST instead, as it does once `reconcile_interval` has passed since the last one.
+    """
+
+    def __init__(self, accounts, reconcile_interval=RECONCILE_INTERVAL, clock=time.monotonic):
+        """
+        :param accounts: Balance snapshot updated in place, currency -> {'available', 'balance', 'id'}.
+        May be shared by several traders, as long as they share this ledger too.
+        """
+        self.accounts = accounts
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        # product_id -> (base currency, quote currency)
+        self.products = {}
+        # Open order id -> what it holds, see track
+        self.orders = {}
+        # Recently done order ids, a placement acknowledged after its done message mustn't start a new hold
+        self.done = OrderCache()
+        self.holds = {}
+        self.drifted = False
+        self.reason = None
+        self.last_reconcile = None
+        self.lock = threading.RLock()
+
+    def add_product(self, product):
+        """Product definition (from get_products) whose orders this ledger accounts for
+        """
+        with self.lock:
+            self.products[product['id']] = (product['base_currency'], product['quote_currency'])
+
+    def reset(self, previous=None):
+        """Take the accounts as just read from REST as correct. Returns the currencies that had drifted from
+        `previous` (the snapshot before the refresh), if given.
+        """
+        drifted = []
+        with self.lock:
+            # Holds now come from the snapshot, orders open from before are unknown from here on
+            self.orders = {}
+            for currency, account in self.accounts.items():
+                self.holds[currency] = account['balance'] - account['available']
+                if previous is not None and currency in previous and (
+                        abs(previous[currency]['available'] - account['available']) > TOLERANCE or
+                        abs(previous[currency]['balance'] - account['balance']) > TOLERANCE):
+                    drifted.append(currency)
+            if drifted:
+                module_logger.warning('Ledger drifted on {} ({}), was {}, now {}'.format(
+                    ', '.join(drifted), self.reason or 'timed reconcile',
+                    {x: previous[x] for x in drifted}, {x: self.accounts[x] for x in drifted}))
+            self.drifted = False
+            self.reason = None
+            self.last_reconcile = self.clock()
+        return drifted
+
+    def needs_reconcile(self):
+        """Whether the next refresh should come from REST
+        """
+        with self.lock:
+            return self.drifted or self.last_reconcile is None or (
+                self.clock() - self.last_reconcile >= self.reconcile_interval)
+
+    def drift(self, reason):
+        with self.lock:
+            if not self.drifted:
+                module_logger.info('Ledger needs reconciling: {}'.format(reason))
+            self.drifted = True
+            self.reason = self.reason or reason
+
+    def on_order_placed(self, order):
+        """Order as returned by the REST place call, holds start from here (stops never send `received`
+        until they trigger)
+        """
+        self.track(order.get('id', ''), order.get('product_id', ''), order.get('side', ''), order.get('type', ''),
+                   order.get('price'), order.get('size'), order.get('funds'))
+
+    def on_message(self, message):
+        """Feed user channel received/match/done messages
+        """
+        handler = {
+            'received': self.on_received,
+            'match': self.on_match,
+            'done': self.on_done,
+        }.get(message.get('type', ''))
+        if handler is None or message.get('product_id', '') not in self.products:
+            return
+        handler(message)
+        module_logger.debug('Ledger after %s: %s', message['type'], LazyJson(self.accounts))
+
+    def on_received(self, message):
+        self.track(message.get('order_id', ''), message['product_id'], message.get('side', ''),
+                   message.get('order_type', ''), message.get('price'), message.get('size'), message.get('funds'))
+
+    def track(self, order_id, product_id, side, order_type, price, size, funds):
+        with self.lock:
+            if not order_id or order_id in self.orders or order_id in self.done or product_id not in self.products:
+                return
+            base_currency, quote_currency = self.products[product_id]
+            if side == 'buy':
+                currency = quote_currency
+                # Stops and market orders hold their funds, limits the price of their size
+                if funds is not None:
+                    hold = float(funds)
+                    price = None
+                else:
+                    hold = float(price) * float(size)
+                    price = float(price)
+            else:
+                currency = base_currency
+                hold = float(size)
+                price = None
+            self.orders[order_id] = {'side': side, 'currency': currency, 'hold': hold, 'price': price}
+            self.add_hold(currency, hold)
+
+    def on_match(self, message):
+        with self.lock:
+            if message.get('maker_order_id', '') in self.orders:
+                order_id = message['maker_order_id']
+                rate = float(message.get('maker_fee_rate', 0))
+            elif message.get('taker_order_id', '') in self.orders:
+                order_id = message['taker_order_id']
+                rate = float(message.get('taker_fee_rate', 0))
+            else:
+                self.drift('match for unknown order {}'.format(message.get('maker_order_id', '')))
+                return
+            order = self.orders[order_id]
+            base_currency, quote_currency = self.products[message['product_id']]
+            size = float(message['size'])
+            value = size * float(message['price'])
+            fee = value * rate
+            if order['side'] == 'buy':
+                self.add_balance(quote_currency, -value - fee)
+                self.add_balance(base_currency, size)
+                self.release(order, size * order['price'] if order['price'] is not None else value + fee)
+            else:
+                self.add_balance(base_currency, -size)
+                self.add_balance(quote_currency, value - fee)
+                self.release(order, size)
+
+    def on_done(self, message):
+        with self.lock:
+            self.done.add(message.get('order_id', ''))
+            order = self.orders.pop(message.get('order_id', ''), None)
+            if order is None:
+                self.drift('done for unknown order {}'.format(message.get('order_id', '')))
+                return
+            self.release(order, order['hold'])
+
+    def release(self, order, amount):
+        amount = min(amount, order['hold'])
+        order['hold'] -= amount
+        self.add_hold(order['currency'], -amount)
+
+    def add_hold(self, currency, amount):
+        if currency not in self.accounts:
+            self.drift('no {} account'.format(currency))
+            return
+        self.holds[currency] = max(0.0, self.holds.get(currency, 0.0) + amount)
+        self.update(currency)
+
+    def add_balance(self, currency, amount):
+        if currency not in self.accounts:
+            self.drift('no {} account'.format(currency))
+            return
+        self.accounts[currency]['balance'] += amount
+        self.update(currency)
+
+    def update(self, currency):
+        account = self.accounts[currency]
+        account['available'] = account['balance'] - self.holds.get(currency, 0.0)
+        if account['available'] < -TOLERANCE:
+            self.drift('{} available went negative'.format(currency))
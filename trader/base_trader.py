@@ -4,18 +4,91 @@ import hmac
 import json
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN
+from decimal import Decimal
 
 from ws4py.client.threadedclient import WebSocketClient
 
 from gdax.authenticated_client import AuthenticatedClient
+from trader.balance_ledger import BalanceLedger
+from trader.dispatch import LazyJson
+from trader.dispatch import MessageDispatcher
+from trader.metrics import Metrics
+from trader.order_book import OrderBook
+from trader.order_cache import OrderCache
+from trader.settlement import SettlementTimeout
+from trader.settlement import SettlementTracker
 
 module_logger = logging.getLogger(__name__)
 
+# Threads for issuing order placement/cancel calls in parallel
+ORDER_WORKERS = 4
+# Base currencies sized to the satoshi, others to the cent
+SATOSHI_CURRENCIES = ['BTC', 'ETH', 'LTC', 'BCH']
+SATOSHI = Decimal('0.00000001')
+CENT = Decimal('0.01')
+TEN_POWERS = frozenset(Decimal(10) ** x for x in range(-16, 17))
+
+
+def to_decimal(value):
+    """Decimal of an API string exactly, or of a float as it prints (not its binary expansion)
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(value if isinstance(value, str) else repr(value))
+
+
+def round_step(value, step):
+    """Nearest multiple of step (a quote increment, a satoshi), halves to even like round(). Powers of ten, which
+    every GDAX increment is, are a single quantize and keep the step's places
+    """
+    if step in TEN_POWERS:
+        return value.quantize(step, ROUND_HALF_EVEN)
+    return (value / step).to_integral_value(ROUND_HALF_EVEN) * step
+
+
+def decimal_string(value):
+    """The value as a plain decimal string at the places it's held to, '10.00000000', '97.05', never in exponent
+    notation
+    """
+    text = str(value)
+    return '{:f}'.format(value) if 'E' in text else text
+
+
+def subscribe_message(product_ids, channels, api_key, secret_key, pass_phrase):
+    """Signed websocket subscribe request for the products/channels
+    """
+    timestamp = str(time.time())
+    message = timestamp + 'GET' + '/users/self/verify'
+    message = message.encode('ascii')
+    hmac_key = base64.b64decode(secret_key)
+    signature = hmac.new(hmac_key, message, hashlib.sha256)
+    signature_b64 = base64.b64encode(signature.digest())
+    return {
+        'type': 'subscribe',
+        'product_ids': list(product_ids),
+        'signature': signature_b64.decode('utf-8'),
+        'key': api_key,
+        'passphrase': pass_phrase,
+        'timestamp': timestamp,
+        'channels': list(channels),
+    }
+
 
 class Trader(WebSocketClient):
     def __init__(self, product_id, delta=0.01,
-                 auth_client=None, api_key='', secret_key='', pass_phrase='', api_url='', ws_url=''):
+                 auth_client=None, api_key='', secret_key='', pass_phrase='', api_url='', ws_url='',
+                 products=None, accounts=None, use_book=False, use_ledger=False, ledger=None):
+        """
+        :param products: Product definitions (from get_products) when already known, e.g. shared by a Supervisor.
+        :param accounts: Balance snapshot dict to share with other traders in the process, keyed by currency.
+        Left alone at startup if it already has balances for this product.
+        :param use_book: Subscribe to the level2 channel and keep a local order book to price against.
+        :param use_ledger: Keep balances current from our own order events instead of querying them after fills.
+        :param ledger: BalanceLedger over `accounts` shared with other traders, implies use_ledger.
+        """
         if delta > 0.05:
             raise AlgoStateException('Delta very high @ {}, please check your config'.format(delta))
         self.last_heartbeat = datetime.now()
@@ -31,7 +104,8 @@ class Trader(WebSocketClient):
             self.client = auth_client  # Easier to test via mock
 
         # Query for product and find status/increment
-        products = self.client.get_products()
+        if products is None:
+            products = self.client.get_products()
         product = [x for x in products if x['status'] == 'online' and x['id'] == product_id]
         if len(product) != 1:
             module_logger.error('Product {} invalid from products {}'.format(
@@ -42,15 +116,44 @@ class Trader(WebSocketClient):
         self.quote_increment = float(product[0]['quote_increment'])
         self.base_min_size = float(product[0]['base_min_size'])
         self.base_max_size = float(product[0]['base_max_size'])
+        # The same as Decimals, prices are multiples of price_step and sizes of size_step
+        self.price_step = Decimal(product[0]['quote_increment']).normalize()
+        self.size_step = self.currency_step(self.base_currency)
+        self.quote_step = self.currency_step(self.quote_currency)
+        self.base_min = Decimal(product[0]['base_min_size'])
+        self.base_max = Decimal(product[0]['base_max_size'])
+        self.metrics = Metrics()
         # Account information including ID and available balance
-        self.accounts = {}
+        self.accounts = accounts if accounts is not None else {}
+        # Tracks balances from order events when enabled, REST is only queried to reconcile
+        if ledger is None and use_ledger:
+            ledger = BalanceLedger(self.accounts)
+        self.ledger = ledger
+        if self.ledger is not None:
+            self.ledger.add_product(product[0])
         # Query for account balances
-        self.reset_account_balances()
-        # Queue of last (1000ish) filled orders for checking missed fills
-        self.opened_orders = [x['id'] for x in self.get_orders()]
+        if self.base_currency not in self.accounts or self.quote_currency not in self.accounts:
+            self.reset_account_balances()
+        elif self.ledger is not None and self.ledger.last_reconcile is None:
+            self.ledger.reset()
+        # Last (1200ish) placed orders for checking missed fills
+        self.opened_orders = OrderCache([x['id'] for x in self.get_orders()])
         module_logger.info('{}|Startup with orders {}'.format(self.product_id, ', '.join(self.opened_orders)))
-        # Flag for when we're waiting for an order to settle, ignore HB/state reconciliation requests
-        self.is_filling_order = False
+        # Newest ledger cursor seen per account id, reconciliation only fetches entries after it
+        self.ledger_cursors = {}
+        # Order placement/cancel calls go out in parallel on this pool
+        self.executor = ThreadPoolExecutor(max_workers=ORDER_WORKERS)
+        # Fills and reconciliation are handled one at a time off the websocket thread, in arrival order. A
+        # heartbeat's reconciliation never runs while a fill is waiting to settle or replacing orders
+        self.fill_executor = ThreadPoolExecutor(max_workers=1)
+        self.settlements = SettlementTracker(self.client)
+        # Seconds between attempts when the exchange rejects an order
+        self.retry_pause = 1
+        # Set when hosted by a Supervisor, which owns the websocket
+        self.supervisor = None
+        # Live level 2 book when subscribed, market prices come from REST otherwise
+        self.book = OrderBook(product_id, self.client) if use_book else None
+        self.dispatcher = MessageDispatcher(self.message_handlers(), product_ids=[self.product_id])
         # Bind to websocket
         if ws_url != '':
             WebSocketClient.__init__(self, ws_url)
@@ -59,75 +162,128 @@ class Trader(WebSocketClient):
         """Called when the websocket handshake has been established, sends
         the initial subscribe message to gdax.
         """
-        timestamp = str(time.time())
-        message = timestamp + 'GET' + '/users/self/verify'
-        message = message.encode('ascii')
-        hmac_key = base64.b64decode(self.secret_key)
-        signature = hmac.new(hmac_key, message, hashlib.sha256)
-        signature_b64 = base64.b64encode(signature.digest())
-        params = {
-            'type': 'subscribe',
-            'product_ids': [
-                self.product_id,
-            ],
-            'signature': signature_b64.decode('utf-8'),
-            'key': self.api_key,
-            'passphrase': self.pass_phrase,
-            'timestamp': timestamp,
-            'channels': [
-                'heartbeat',
-                'user'
-            ],
-        }
-        self.send(json.dumps(params))
+        self.send(json.dumps(subscribe_message([self.product_id], self.channels(), self.api_key, self.secret_key,
+                                               self.pass_phrase)))
+
+    def channels(self):
+        """Websocket channels this trader needs
+        """
+        if self.book is not None:
+            return ['heartbeat', 'user', 'level2']
+        return ['heartbeat', 'user']
 
     def closed(self, code, reason=None):
         module_logger.info('{}|Closed down. Code: {} Reason: {}'.format(self.product_id, code, reason))
+        self.stop()
+
+    def stop(self):
+        """Release worker threads once the websocket is gone
+        """
+        self.executor.shutdown(wait=False)
+        self.fill_executor.shutdown(wait=False)
+        self.settlements.close()
 
     def cache_orders(self, order_id):
         """Sliding window of IDs
         """
-        self.opened_orders.append(order_id)
-        if len(self.opened_orders) > 1200:
-            self.opened_orders.pop(0)
+        self.opened_orders.add(order_id)
 
     def remove_order(self, order_id):
-        self.opened_orders = [x for x in self.opened_orders if x != order_id]
+        self.opened_orders.discard(order_id)
 
     def received_message(self, message):
-        message = json.loads(str(message))
-        # Ignore messages for different products since we're subscribing to user channel
-        if message.get('product_id', '') != self.product_id:
-            return
-        message_type = message.get('type', '')
-        log_message = '{}|Message from websocket:{}'.format(self.product_id,
-                                                            json.dumps(message, indent=4, sort_keys=True))
-        if message_type == 'heartbeat':
-            if self.last_heartbeat + self.heartbeat_log_interval <= datetime.now():
-                orders = self.get_orders()
-                module_logger.info(
-                    '{}|Heartbeat:{}:{} orders'.format(self.product_id, message.get('sequence', 0), len(orders)))
-                for order in orders:
-                    module_logger.info(
-                        '{}|{} {} @ {}:{}'.format(self.product_id, order['side'], order['size'],
-                                                  self.get_order_price(order),
-                                                  order['id']))
-                self.last_heartbeat = datetime.now()
-                # Also take opportunity to check for missed messages
-                self.check_missed_fills()
-                if not self.is_filling_order:
-                    # Refresh orders first in case we filled
-                    orders = self.get_orders()
-                    self.check_orders(orders)
+        self.dispatcher.dispatch(str(message))
 
-            else:
-                module_logger.debug(log_message)
-        # Order fill message
-        elif message_type == 'done':
-            module_logger.info(log_message)
-            self.is_filling_order = True
-            self.on_order_done(message)
-            self.is_filling_order = False
+    def on_message(self, message):
+        """Handle a decoded websocket message
+        """
+        self.dispatcher.handle(message)
+
+    def message_handlers(self):
+        """Websocket message type -> handler, anything else is dropped before being decoded.
+        Messages for other products are dropped too since we're subscribing to the user channel.
+        """
+        handlers = {
+            'heartbeat': self.on_heartbeat_message,
+            'done': self.on_done_message,
+            'match': self.on_match_message,
+        }
+        if self.book is not None:
+            handlers['snapshot'] = self.book.on_message
+            handlers['l2update'] = self.book.on_message
+        if self.ledger is not None:
+            handlers['received'] = self.ledger.on_message
+        return handlers
+
+    def on_heartbeat_message(self, message):
+        if self.last_heartbeat + self.heartbeat_log_interval <= datetime.now():
+            self.last_heartbeat = datetime.now()
+            self.submit_fill_work(self.on_heartbeat, message)
+        else:
+            module_logger.debug('%s|Message from websocket:%s', self.product_id, LazyJson(message))
+
+    def on_done_message(self, message):
+        """Order fill/cancel message
+        """
+        module_logger.info('%s|Message from websocket:%s', self.product_id, LazyJson(message))
+        if self.ledger is not None:
+            self.ledger.on_message(message)
+        # Wake anything waiting on this order to settle, then handle the fill off the websocket thread
+        self.settlements.on_message(message)
+        self.submit_fill_work(self.on_order_done, message)
+
+    def on_match_message(self, message):
+        module_logger.debug('%s|Message from websocket:%s', self.product_id, LazyJson(message))
+        if self.ledger is not None:
+            self.ledger.on_message(message)
+        self.settlements.on_message(message)
+
+    def submit_fill_work(self, fn, message):
+        """Queue fill handling/reconciliation on the fill thread. Failures there are fatal as they would have been
+        on the websocket thread, log and close so we restart and recover from open orders.
+        """
+
+        def run():
+            try:
+                fn(message)
+            except Exception:
+                module_logger.exception('{}|Failed handling message, closing down: {}'.format(
+                    self.product_id, message))
+                self.shutdown('Failed handling message')
+
+        return self.fill_executor.submit(run)
+
+    def shutdown(self, reason):
+        """Close the websocket this trader is fed from
+        """
+        if self.supervisor is not None:
+            self.supervisor.close(reason=reason)
+        else:
+            self.close(reason=reason)
+
+    def on_heartbeat(self, message):
+        orders = self.get_orders()
+        module_logger.info(
+            '{}|Heartbeat:{}:{} orders'.format(self.product_id, message.get('sequence', 0), len(orders)))
+        for order in orders:
+            module_logger.info(
+                '{}|{} {} @ {}:{}'.format(self.product_id, order['side'], order['size'],
+                                          self.get_order_price(order),
+                                          order['id']))
+        for line in self.metrics.format():
+            module_logger.info('{}|Metric {}'.format(self.product_id, line))
+        scheduler = getattr(self.client, 'scheduler', None)
+        if scheduler is not None:
+            module_logger.info('{}|Rate limits {}'.format(self.product_id,
+                                                          json.dumps(scheduler.stats(), sort_keys=True)))
+        # Also take opportunity to check for missed messages. On the fill thread, so no fill is mid way through
+        # being handled
+        self.check_missed_fills()
+        if self.ledger is not None and self.ledger.needs_reconcile():
+            self.reset_account_balances()
+        # Refresh orders first in case we filled
+        orders = self.get_orders()
+        self.check_orders(orders)
 
     @staticmethod
     def get_order_price(order):
@@ -179,24 +335,62 @@ class Trader(WebSocketClient):
             "settled": true
         }
         """
-        accounts = [v['id'] for v in self.accounts.values()]
-        for account in accounts:
-            history = self.client.get_account_history(account)[0]
-            matches = [x for x in history if x['type'] == 'match']
-            matches = [x for x in matches if x['details']['product_id'] == self.product_id]
-            order_ids = [x['details']['order_id'] for x in matches]
-            for order_id in order_ids:
-                if order_id in self.opened_orders:
-                    order = self.client.get_order(order_id)
-                    # Done? Or just partially filled
-                    if order['status'] == 'done' and order['done_reason'] == 'filled':
-                        # We've missed a fill, rectify that
-                        module_logger.info('{}|Missed fill for {}'.format(self.product_id, order_id))
-                        self.on_order_done({
-                            'order_id': order_id,
-                            'reason': order['done_reason'],
-                            'product_id': self.product_id,
-                        })
+        pages = 0
+        entries = 0
+        # Both legs of a trade show up (base and quote account), only check each order once per run
+        checked = set()
+        for currency in [self.base_currency, self.quote_currency]:
+            for history in self.new_ledger_pages(self.accounts[currency]['id']):
+                pages += 1
+                entries += len(history)
+                matches = [x for x in history if x['type'] == 'match']
+                matches = [x for x in matches if x['details']['product_id'] == self.product_id]
+                order_ids = [x['details']['order_id'] for x in matches]
+                for order_id in order_ids:
+                    if order_id in checked:
+                        continue
+                    checked.add(order_id)
+                    if order_id in self.opened_orders:
+                        order = self.client.get_order(order_id)
+                        # Done? Or just partially filled
+                        if order['status'] == 'done' and order['done_reason'] == 'filled':
+                            # We've missed a fill, rectify that
+                            module_logger.info('{}|Missed fill for {}'.format(self.product_id, order_id))
+                            self.on_order_done({
+                                'order_id': order_id,
+                                'reason': order['done_reason'],
+                                'product_id': self.product_id,
+                            })
+        module_logger.info('{}|Reconciled {} ledger entries over {} pages, {} orders checked'.format(
+            self.product_id, entries, pages, len(checked)))
+        self.metrics.incr('reconcile_pages', pages)
+        self.metrics.incr('reconcile_entries', entries)
+        return {
+            'pages': pages,
+            'entries': entries,
+            'orders': len(checked),
+        }
+
+    def new_ledger_pages(self, account_id):
+        """Ledger pages newer than the last run, walking forward from the remembered cursor.
+        With no cursor yet (first run) only the newest page is looked at.
+        """
+        cursor = self.ledger_cursors.get(account_id)
+        if cursor is None:
+            history, before, _ = self.client.get_account_history_page(account_id)
+            if before:
+                self.ledger_cursors[account_id] = before
+            yield history
+            return
+        while True:
+            history, before, _ = self.client.get_account_history_page(account_id, before=cursor)
+            if not history:
+                return
+            yield history
+            if not before:
+                return
+            cursor = before
+            self.ledger_cursors[account_id] = cursor
 
     def reset_account_balances(self):
         """Query rest endpoint for available account balance
@@ -221,72 +415,105 @@ class Trader(WebSocketClient):
         ]
         """
         accounts = self.client.get_accounts()
+        self.metrics.incr('account_queries')
+        previous = {x: dict(self.accounts[x]) for x in self.accounts} if self.ledger is not None else None
         for currency in [self.base_currency, self.quote_currency]:
             account = [x for x in accounts if x['currency'] == currency]
             if len(account) != 1 or 'available' not in account[0] or 'balance' not in account[0]:
                 module_logger.error('Account lookup failure for {} from {}'.format(
                     currency, json.dumps(accounts, indent=4, sort_keys=True)))
                 raise AccountBalanceFailure(currency + ' not found in active accounts')
-            self.accounts[currency] = {
-                'available': float(account[0]['available']),
-                'balance': float(account[0]['balance']),
-                'id': account[0]['id'],
-            }
-            module_logger.debug(
-                'Set available account balances: {}'.format(json.dumps(accounts, indent=4, sort_keys=True)))
+            self.accounts[currency] = self.parse_account(account[0])
+        module_logger.debug('Set available account balances: %s', LazyJson(accounts))
+        if self.ledger is not None and self.ledger.reset(previous):
+            self.metrics.incr('ledger_drift')
+
+    def refresh_account_balances(self):
+        """Balances after a fill, already current when the ledger is tracking them (unless it's due a reconcile),
+        otherwise from REST
+        """
+        if self.ledger is not None and not self.ledger.needs_reconcile():
+            return
+        self.reset_account_balances()
+
+    @staticmethod
+    def parse_account(account):
+        return {
+            'available': float(account['available']),
+            'balance': float(account['balance']),
+            'id': account['id'],
+        }
 
     def seed_wallet(self, quote_ccy_size):
         """At the start of the day or when the wallet is empty, need something to trade
         Place a stop buy at 1% above current market and a limit post buy at 1% below to minimize fees
+        Returns the two orders placed.
         """
-        ticker = self.client.get_product_ticker(self.product_id)
-        if 'price' not in ticker:
-            module_logger.exception('Unable to get current market quote')
-            raise OrderPlacementFailure(
-                'Unable to get market quote, api message: {}'.format(ticker.get('message', 'unknown error')))
-        current_price = float(ticker['price'])
+        current_price = self.get_market_price()
         size = self.to_size_increment(quote_ccy_size / current_price)
         delta = current_price * self.delta
         module_logger.info(
             '{}|Seeding wallet: {} {} @ {}/{}'.format(self.product_id, size, self.product_id, current_price + delta,
                                                       current_price - delta))
-        self.buy_stop(size, current_price + delta)
-        self.buy_limit_ptc(size, current_price - delta)
+        return [self.buy_stop(size, current_price + delta), self.buy_limit_ptc(size, current_price - delta)]
+
+    def get_market_price(self):
+        """Mid of the local book when we have one, otherwise the last trade price from REST
+        """
+        if self.book is not None:
+            price = self.book.mid_price()
+            if price is not None:
+                return price
+        ticker = self.client.get_product_ticker(self.product_id)
+        if 'price' not in ticker:
+            module_logger.exception('Unable to get current market quote')
+            raise OrderPlacementFailure(
+                'Unable to get market quote, api message: {}'.format(ticker.get('message', 'unknown error')))
+        return float(ticker['price'])
 
     def wait_for_settle(self, order_id):
         """Funds aren't available until order is in settled state. Return the full order message
         """
-        settled = False
-        order = None
-        while not settled:
-            order = self.client.get_order(order_id)
-            settled = order.get('settled', False)
-            if not settled:
-                module_logger.info('{}|Waiting for {} to settled'.format(self.product_id, order_id))
-                time.sleep(1)  # Takes a few seconds
+        try:
+            order = self.settlements.track(order_id).result()
+        except SettlementTimeout as e:
+            raise OrderFillFailure('{}|{}'.format(self.product_id, e))
         # Once we know order is settled, re-query account balances
-        self.reset_account_balances()
+        self.refresh_account_balances()
         module_logger.info('{}|{} settled'.format(self.product_id, order_id))
         return order
 
     def place_decaying_order(self, side, order_type, size, price, retries=3, spread=0.006):
         """Makes a call to the rest order endpoint. On failure, tries again n times widening the bid/ask
         by 0.6% each time in case the order would result in taking liquidity (and thus accruing fees)
+        With a local order book, post only limit orders are priced up front so they don't cross the book, and
+        only a genuine reject (the book moved before the order landed) falls back to retrying.
+        Size and price may be floats, Decimals or exact decimal strings, the payload is worked out in Decimals.
+        Returns the order as the exchange acknowledged it.
         """
-        size = self.to_size_increment(size)
-        if size < self.base_min_size or size > self.base_max_size:
+        size_decimal = self.to_size_decimal(size)
+        size = decimal_string(size_decimal)
+        if size_decimal < self.base_min or size_decimal > self.base_max:
             raise OrderPlacementFailure('Size of {} outside of exchange limits'.format(size))
-        if side is 'buy':
+        if side == 'buy':
             direction = -1
-        elif side is 'sell':
+        elif side == 'sell':
             direction = 1
         else:
             raise OrderPlacementFailure('Side {} not expected, what are you doing?'.format(side))
 
+        start = time.perf_counter()
+        price_decimal = to_decimal(price)
+        spread_decimal = to_decimal(spread)
         for i in range(retries):
-            price = self.to_price_increment(price + (price * direction * i * spread))
-            if side is 'buy':
-                if order_type is 'limit':
+            price_decimal = round_step(price_decimal + price_decimal * direction * i * spread_decimal,
+                                       self.price_step)
+            if order_type == 'limit' and self.book is not None:
+                price_decimal = round_step(to_decimal(self.post_only_price(side, float(price_decimal), retries - i,
+                                                                           spread)), self.price_step)
+            price = decimal_string(price_decimal)
+            if side == 'buy':
+                if order_type == 'limit':
                     result = self.client.buy(
                         type='limit',
                         product_id=self.product_id,
@@ -294,7 +521,7 @@ class Trader(WebSocketClient):
                         size=size,
                         post_only=True,
                     )
-                elif order_type is 'stop':
+                elif order_type == 'stop':
                     # Stop order will accrue fees, but can't really avoid that
                     result = self.client.buy(
                         type='stop',
@@ -302,12 +529,12 @@ class Trader(WebSocketClient):
                         price=price,
                         size=size,
                         # If not specified, will hold entire account balance!
-                        funds=self.to_size_increment(size * price, self.quote_currency)
+                        funds=decimal_string(round_step(size_decimal * price_decimal, self.quote_step))
                     )
                 else:
                     raise OrderPlacementFailure('{} of type {} not supported'.format(side, order_type))
             else:
-                if order_type is 'limit':
+                if order_type == 'limit':
                     result = self.client.sell(
                         type='limit',
                         product_id=self.product_id,
@@ -322,26 +549,58 @@ class Trader(WebSocketClient):
                 module_logger.warning(
                     'Error placing {} {} order for {} {} @ {}, retrying. Message from api: {}'.format(
                         side, order_type, size, self.product_id, price, result['message']))
-                time.sleep(1)
+                self.metrics.incr('order_rejects')
+                time.sleep(self.retry_pause)
             else:
+                self.metrics.record('order_ack', time.perf_counter() - start)
                 self.cache_orders(result['id'])
+                if self.ledger is not None:
+                    self.ledger.on_order_placed(result)
                 module_logger.info(
                     '{}|Placed {} {} order {} @ {}'.format(self.product_id, side, order_type, size, price))
-                return
+                return result
         # Failed on decaying price, raise an exception
         message = '{}|Error placing {} order of type {}. Retried {} times, giving up'.format(self.product_id, side,
                                                                                              order_type, retries)
         module_logger.exception(message)
         raise OrderPlacementFailure(message)
 
+    def post_only_price(self, side, price, retries, spread):
+        """Tightest price at or behind `price` that won't take liquidity against the local book: one increment
+        inside the best ask for buys, the best bid for sells. Unchanged without a synced book.
+        Counts the widening retries place_decaying_order would otherwise have gone through.
+        """
+        if self.book is None:
+            return price
+        if side == 'buy':
+            best = self.book.best_ask()
+            direction = -1
+        else:
+            best = self.book.best_bid()
+            direction = 1
+        if best is None:
+            return price
+        limit = self.to_price_increment(best[0] + direction * self.quote_increment)
+        if price * direction >= limit * direction:
+            return price
+        avoided = 0
+        decayed = price
+        while avoided < retries - 1 and decayed * direction <= best[0] * direction:
+            avoided += 1
+            decayed = self.to_price_increment(decayed + (decayed * direction * avoided * spread))
+        self.metrics.incr('post_only_repriced')
+        self.metrics.incr('post_only_retries_avoided', avoided)
+        module_logger.info('{}|Repriced {} from {} to {} against the book'.format(self.product_id, side, price, limit))
+        return limit
+
     def buy_stop(self, size, price, retries=3, spread=0.003):
-        self.place_decaying_order('buy', 'stop', size, price, retries=retries, spread=spread)
+        return self.place_decaying_order('buy', 'stop', size, price, retries=retries, spread=spread)
 
     def buy_limit_ptc(self, size, price, retries=3, spread=0.003):
-        self.place_decaying_order('buy', 'limit', size, price, retries=retries, spread=spread)
+        return self.place_decaying_order('buy', 'limit', size, price, retries=retries, spread=spread)
 
     def sell_limit_ptc(self, size, price, retries=3, spread=0.003):
-        self.place_decaying_order('sell', 'limit', size, price, retries=retries, spread=spread)
+        return self.place_decaying_order('sell', 'limit', size, price, retries=retries, spread=spread)
 
     def get_orders(self):
         return [x for x in self.client.get_orders()[0] if x['product_id'] == self.product_id]
@@ -349,11 +608,39 @@ class Trader(WebSocketClient):
     def cancel_all(self):
         """BAIL!!!
         """
-        orders = [x['id'] for x in self.get_orders()]
-        for order_id in orders:
-            result = self.client.cancel_order(order_id)
-            module_logger.info('{}|Canceling {}, result: {}'.format(self.product_id, order_id,
-                                                                    json.dumps(result, indent=4, sort_keys=True)))
+        self.wait_all(self.cancel_orders(self.get_orders()).values())
+
+    def cancel_order(self, order_id):
+        result = self.client.cancel_order(order_id)
+        module_logger.info('{}|Canceling {}, result: {}'.format(self.product_id, order_id,
+                                                                json.dumps(result, indent=4, sort_keys=True)))
+        return result
+
+    def cancel_orders(self, orders):
+        """Issue cancels for all the orders in parallel, returns futures keyed by order id
+        """
+        return {x['id']: self.executor.submit(self.cancel_order, x['id']) for x in orders}
+
+    def submit_after(self, futures, fn, *args, **kwargs):
+        """Run fn on the order pool once the given futures (e.g. cancels releasing a hold fn needs) are done.
+        Only safe to wait on futures submitted earlier, the pool is FIFO so those are already running.
+        """
+        futures = list(futures)
+
+        def run():
+            wait(futures)
+            return fn(*args, **kwargs)
+
+        return self.executor.submit(run)
+
+    @staticmethod
+    def wait_all(futures):
+        """Wait for every future, then raise the first failure (if any)
+        """
+        futures = list(futures)
+        wait(futures)
+        for future in futures:
+            future.result()
 
     def on_order_done(self, message):
         """Action to take on order complete. Orders may be considered done even if they have a small amount
@@ -378,10 +665,13 @@ class Trader(WebSocketClient):
             if order_id not in self.opened_orders:
                 module_logger.info('{}|Order not in cached orders, ignoring'.format(self.product_id))
             else:
+                start = time.perf_counter()
                 self.remove_order(order_id)
                 settled_order = self.wait_for_settle(order_id)
-                self.reset_account_balances()
+                self.metrics.record('fill_to_settled', time.perf_counter() - start)
+                self.refresh_account_balances()
                 self.place_next_orders(settled_order)
+                self.metrics.record('fill_to_orders_live', time.perf_counter() - start)
 
     def on_start(self):
         """Intended to be overriden.
@@ -410,17 +700,24 @@ class Trader(WebSocketClient):
         https://docs.gdax.com/#get-products
         Otherwise order will be rejected.
         """
-        diff = price - round(price)
-        increments = round(diff / self.quote_increment)
-        return round(price) + (increments * self.quote_increment)
+        return float(round_step(to_decimal(price), self.price_step))
 
     def to_size_increment(self, size_base_ccy, base_currency=''):
-        if base_currency == '':
-            base_currency = self.base_currency
-        if base_currency in ['BTC', 'ETH', 'LTC', 'BCH']:
-            return max(round(size_base_ccy, 8), self.base_min_size)
-        else:
-            return round(size_base_ccy, 2)
+        if base_currency == '' or base_currency == self.base_currency:
+            return float(self.to_size_decimal(size_base_ccy))
+        return float(round_step(to_decimal(size_base_ccy), self.currency_step(base_currency)))
+
+    def to_size_decimal(self, size_base_ccy):
+        """Size rounded to the base currency step, at least the exchange minimum for coins
+        """
+        size = round_step(to_decimal(size_base_ccy), self.size_step)
+        if self.base_currency in SATOSHI_CURRENCIES:
+            return max(size, self.base_min)
+        return size
+
+    @staticmethod
+    def currency_step(currency):
+        return SATOSHI if currency in SATOSHI_CURRENCIES else CENT
 
 
 class AlgoStateException(Exception):
@@ -1,11 +1,19 @@
 import json
 import logging
 import math
+import time
+from decimal import Decimal
 
 from trader.base_trader import AccountBalanceFailure
 from trader.base_trader import AlgoStateException
 from trader.base_trader import OrderPlacementFailure
 from trader.base_trader import Trader
+from trader.base_trader import decimal_string
+from trader.base_trader import round_step
+from trader.base_trader import to_decimal
+from trader.journal import read_journal
+from trader.journal import replay
+from trader.ladder import Ladder
 
 module_logger = logging.getLogger(__name__)
 
@@ -13,7 +21,8 @@ module_logger = logging.getLogger(__name__)
 class CostBasisTrader(Trader):
     def __init__(self, product_id, order_depth, wallet_fraction,
                  delta=0.01, auth_client=None, api_key='', secret_key='',
-                 pass_phrase='', api_url='', ws_url=''):
+                 pass_phrase='', api_url='', ws_url='', products=None, accounts=None, use_book=False,
+                 use_ledger=False, ledger=None, resting_levels=1, journal=None):
 
         """CostBasis trader. Places a sell at +1% of current cost basis for entire base currency balance
         and a buy which if filled would move current cost basis by delta.
@@ -22,6 +31,13 @@ class CostBasisTrader(Trader):
         :param wallet_fraction: Percentage of quote currency (USD) starting wallet balance algo is allowed to use.
         :param delta: Percentage above and below cost basis to place orders.
         use per order.
+        :param products: Product definitions when already known, see Trader.
+        :param accounts: Shared balance snapshot, see Trader.
+        :param use_book: Keep a local level 2 order book, see Trader.
+        :param use_ledger: Track balances from order events, see Trader.
+        :param ledger: Shared BalanceLedger, see Trader.
+        :param resting_levels: Ladder buys kept resting below cost basis at once, see place_resting_orders.
+        :param journal: Journal to record fills and state to, and to resume from on start, see resume_from_journal.
         """
         Trader.__init__(self,
                         product_id,
@@ -32,14 +48,43 @@ class CostBasisTrader(Trader):
                         pass_phrase=pass_phrase,
                         api_url=api_url,
                         ws_url=ws_url,
+                        products=products,
+                        accounts=accounts,
+                        use_book=use_book,
+                        use_ledger=use_ledger,
+                        ledger=ledger,
                         )
 
         self.max_order_depth = order_depth
         self.current_order_depth = 0
-        # Running total of how much we've bought and how much we've paid for it, updated on order fills
-        self.quote_currency_paid = 0.0
-        self.base_currency_bought = 0.0
+        # Running total of how much we've bought and how much we've paid for it, updated on order fills. Held
+        # exactly as Decimals, paid being sizes times prices as they filled
+        self.quote_paid = Decimal(0)
+        self.base_bought = Decimal(0)
         self.wallet_fraction = wallet_fraction
+        self.resting_levels = resting_levels
+        self.journal = journal
+        # Only the first start resumes, later ones (after the stack sells) start over
+        self.replay_journal = journal is not None
+        # Buys and sells from here on are planned ahead when a fill comes in, see Ladder
+        self.ladder = Ladder(self.price_step, self.size_step, self.quote_step, delta, wallet_fraction, order_depth,
+                             base_min=self.base_min)
+
+    @property
+    def quote_currency_paid(self):
+        return float(self.quote_paid)
+
+    @quote_currency_paid.setter
+    def quote_currency_paid(self, value):
+        self.quote_paid = to_decimal(value)
+
+    @property
+    def base_currency_bought(self):
+        return float(self.base_bought)
+
+    @base_currency_bought.setter
+    def base_currency_bought(self, value):
+        self.base_bought = to_decimal(value)
 
     def get_order_size(self):
         return min(self.get_available_balance(self.quote_currency),
@@ -86,13 +131,15 @@ class CostBasisTrader(Trader):
         """
         Trader.on_start(self)
         self.current_order_depth = 0
-        self.quote_currency_paid = 0.0
-        self.base_currency_bought = 0.0
+        self.quote_paid = Decimal(0)
+        self.base_bought = Decimal(0)
         orders = self.get_orders()
         try:
             stop_orders = [x for x in orders if x.get('stop', '') == 'entry']
             limit_orders = [x for x in orders if x.get('type', '') == 'limit']
-            if len(orders) == 0:
+            if self.resume_from_journal(orders):
+                return
+            elif len(orders) == 0:
                 Trader.seed_wallet(self, self.get_order_size())
             # With two open orders, we either failed right after seeding or in the middle of the algo
             elif len(orders) == 2:
@@ -104,6 +151,10 @@ class CostBasisTrader(Trader):
                     self.reset_from_sell(sell_orders)
                 else:
                     raise AlgoStateException('Unexpected order state:{}'.format(orders))
+            elif 2 < len(orders) <= self.resting_levels + 1 and len(limit_orders) == len(orders) and not stop_orders:
+                # The sell and several resting buys
+                sell_orders = [x for x in limit_orders if x.get('side', '') == 'sell']
+                self.reset_from_sell(sell_orders)
             elif len(orders) == 1:
                 sell_orders = [x for x in limit_orders if x.get('side', '') == 'sell']
                 buy_orders = [x for x in limit_orders if x.get('side', '') == 'buy']
@@ -127,15 +178,90 @@ class CostBasisTrader(Trader):
                 self.product_id, json.dumps(orders, indent=4, sort_keys=True)))
             self.cancel_all()
             Trader.seed_wallet(self, self.get_order_size())
+        if self.journal is not None:
+            self.save_state([x['id'] for x in self.get_orders()])
+
+    def resume_from_journal(self, orders):
+        """Pick up the depth and cost basis journaled before a restart, when the journal agrees with the open
+        orders: every open order is one it recorded, and any it recorded that's gone filled since. Fills
+        journaled after the last state (a crash before their orders were replaced) are applied and the orders
+        replaced now. Returns False, leaving the open orders to the heuristics, otherwise.
+        """
+        if not self.replay_journal:
+            return False
+        self.replay_journal = False
+        state = replay(read_journal(self.journal.path), self.product_id)
+        if state is None:
+            module_logger.info('{}|Nothing journaled to resume from'.format(self.product_id))
+            return False
+        open_ids = set(x['id'] for x in orders)
+        journaled = set(state['orders'])
+        filled = set(x['order_id'] for x in state['fills'])
+        if not open_ids <= journaled or not journaled - open_ids <= filled:
+            module_logger.warning('{}|Journal disagrees with open orders {}, journaled {} filled {}'.format(
+                self.product_id, sorted(open_ids), sorted(journaled), sorted(filled)))
+            return False
+        self.current_order_depth = state['depth']
+        self.quote_paid = Decimal(state['quote_paid'])
+        self.base_bought = Decimal(state['base_bought'])
+        sold = False
+        for fill in state['fills']:
+            if fill['side'] == 'sell':
+                sold = True
+            else:
+                self.add_fill(fill)
+        self.metrics.incr('journal_resumes')
+        module_logger.info('{}|Resumed from journal with cost basis {}/{} order depth: {}, {} fills since'.format(
+            self.product_id, self.quote_currency_paid, self.base_currency_bought, self.current_order_depth,
+            len(state['fills'])))
+        if sold:
+            # The stack sold, start over
+            self.cancel_all()
+            self.current_order_depth = 0
+            self.quote_paid = Decimal(0)
+            self.base_bought = Decimal(0)
+            self.save_state([x['id'] for x in Trader.seed_wallet(self, self.get_order_size())])
+        elif state['fills']:
+            self.place_bracket_orders(replacing=orders)
+        return True
+
+    def save_state(self, order_ids):
+        """Journal the algo state with the orders now open for it
+        """
+        if self.journal is None:
+            return
+        self.journal.append({
+            'type': 'state',
+            'product_id': self.product_id,
+            'time': time.time(),
+            'depth': self.current_order_depth,
+            'quote_paid': str(self.quote_paid),
+            'base_bought': str(self.base_bought),
+            'orders': sorted(order_ids),
+        })
+
+    def add_fill(self, fill):
+        """Add a filled buy (settled order or journaled fill) to the depth and cost basis
+        """
+        self.current_order_depth += 1
+        filled_size = Decimal(fill['filled_size'])
+        if fill.get('price') is not None:
+            self.quote_paid += filled_size * Decimal(fill['price'])
+        else:
+            # No price to multiply out, the executed value is what was paid
+            self.quote_paid += Decimal(fill['executed_value'])
+        self.base_bought += filled_size
 
     def reset_from_sell(self, sell_order):
         if len(sell_order) != 1:
             raise AlgoStateException(
                 'Unexpected order state:{}'.format(sell_order))
         sell_order = sell_order[0]
-        cost_basis = float(self.get_order_price(sell_order)) / (1 + self.delta)
-        self.base_currency_bought = float(sell_order['size'])
-        self.quote_currency_paid = self.base_currency_bought * cost_basis
+        price = round_step(to_decimal(self.get_order_price(sell_order)), self.price_step)
+        self.base_bought = round_step(Decimal(sell_order['size']), self.size_step)
+        self.quote_paid = round_step(self.base_bought * price / (1 + to_decimal(self.delta)),
+                                     self.price_step * self.size_step)
+        cost_basis = self.quote_currency_paid / self.base_currency_bought
         # Guess at the order depth. If my math was better I'm sure we could be more accurate
         self.current_order_depth = math.floor(self.quote_currency_paid / self.get_order_size())
         module_logger.info('{}|Recovered with cost basis: {} ccy bought: {} price paid: {} order depth: {}'.format(
@@ -167,29 +293,40 @@ class CostBasisTrader(Trader):
             "type": "limit"
         }
         """
-        # Full order fill, cancel other open orders
-        self.cancel_all()
+        if self.journal is not None:
+            self.journal.append({
+                'type': 'fill',
+                'product_id': self.product_id,
+                'time': time.time(),
+                'order_id': settled_order.get('id', ''),
+                'side': settled_order['side'],
+                'filled_size': settled_order.get('filled_size'),
+                'price': settled_order.get('price'),
+                'executed_value': settled_order.get('executed_value'),
+            })
         if settled_order['side'] == 'sell':
             # We've fully sold the stack, close current orders and reset at market
+            self.cancel_all()
             self.on_start()
         else:
             # We've bought some, what's our order depth and cost basis?
             module_logger.info('{}|Filled order:{}'.format(
                 self.product_id, json.dumps(settled_order, indent=4, sort_keys=True)))
-            self.current_order_depth += 1
-            filled_size = float(settled_order['filled_size'])
-            if 'price' in settled_order:
-                price = float(settled_order['price'])
-            else:
-                # Back into price from filled size and value
-                executed_value = float(settled_order['executed_value'])
-                price = executed_value / filled_size
-
-            self.quote_currency_paid += price * filled_size
-            self.base_currency_bought += filled_size
-            self.place_bracket_orders()
+            self.add_fill(settled_order)
+            # Full order fill, replace other open orders
+            self.place_bracket_orders(replacing=self.get_orders())
 
-    def place_bracket_orders(self):
+    def place_bracket_orders(self, replacing=None):
+        """Place the sell and the next buy. Orders in `replacing` are canceled in parallel with the placements,
+        each new order only waits for the cancels on its own side since those hold the funds it needs.
+        """
+        if self.resting_levels > 1:
+            return self.place_resting_orders(replacing)
+        cancels = self.cancel_orders(replacing or [])
+        sell_cancels = [cancels[x['id']] for x in replacing or [] if x.get('side', '') == 'sell']
+        buy_cancels = [cancels[x['id']] for x in replacing or [] if x.get('side', '') != 'sell']
+        leg = self.ladder.leg(self.quote_paid, self.base_bought, self.current_order_depth,
+                              self.get_order_size(), self.get_balance(self.quote_currency))
         cost_basis = self.quote_currency_paid / self.base_currency_bought
         module_logger.info('{}|Order Depth: {}, Cost Basis: {} ({}/{}), targeting {}/{}'.format(
             self.product_id, self.current_order_depth, cost_basis, self.quote_currency_paid,
@@ -198,19 +335,59 @@ class CostBasisTrader(Trader):
             cost_basis * (1 - self.delta),
         ))
         # Place sell at delta above current cost basis
-        self.sell_limit_ptc(self.base_currency_bought, cost_basis * (1 + self.delta))
+        placements = [self.submit_after(sell_cancels, self.sell_limit_ptc,
+                                        decimal_string(self.base_bought), decimal_string(leg['sell_price']))]
         if self.current_order_depth > self.max_order_depth:
             module_logger.warning(
                 '{}|At max order depth, not doing anything (leaving sell out)'.format(self.product_id))
         else:
             # Place buy at price and size to move cost basis down by delta
-            next_cost_basis = cost_basis * (1 - self.delta)
-            target_base_quantity = (self.quote_currency_paid + self.get_order_size()) / next_cost_basis
-            next_size = target_base_quantity - self.base_currency_bought
-            if next_size < self.base_min_size:
+            if leg['buy_size'] < self.base_min:
                 module_logger.warning(
                     '{}|Insufficient account balance to buy more, leaving sell out'.format(self.product_id))
-            self.buy_limit_ptc(next_size, self.get_order_size() / next_size)
+            placements.append(self.submit_after(buy_cancels, self.buy_limit_ptc,
+                                                decimal_string(leg['buy_size']), decimal_string(leg['buy_price'])))
+        self.wait_all(list(cancels.values()) + placements)
+        self.save_state([x.result()['id'] for x in placements])
+
+    def place_resting_orders(self, orders=None):
+        """Place the sell and keep the next resting_levels ladder buys open, so a fast drop fills several levels
+        without a cancel and replace round trip for each. Open buys already at a planned leg's price and size
+        are left resting, the rest of `orders` are canceled. After a planned fill that's the sell and one new
+        buy at the bottom of the ladder. Buys are sized from wallet_fraction of the balance left once the ones
+        above fill, see Ladder.
+        """
+        orders = orders or []
+        legs = self.ladder.ahead(self.quote_paid, self.base_bought, self.current_order_depth, None,
+                                 self.get_balance(self.quote_currency), self.resting_levels)
+        wanted = [(x['buy_price'], x['buy_size']) for x in legs if not x['last']]
+        replacing = []
+        kept = []
+        for order in orders:
+            key = (Decimal(order.get('price', '0')), Decimal(order.get('size', '0')))
+            if order.get('side', '') == 'buy' and order.get('type', '') == 'limit' and 'stop' not in order and (
+                    key in wanted):
+                wanted.remove(key)
+                kept.append(order['id'])
+                self.metrics.incr('resting_kept')
+            else:
+                replacing.append(order)
+        cancels = self.cancel_orders(replacing)
+        sell_cancels = [cancels[x['id']] for x in replacing if x.get('side', '') == 'sell']
+        buy_cancels = [cancels[x['id']] for x in replacing if x.get('side', '') != 'sell']
+        module_logger.info('{}|Order Depth: {}, Cost Basis: {} ({}/{}), {} buys resting, placing {}'.format(
+            self.product_id, self.current_order_depth, self.quote_currency_paid / self.base_currency_bought,
+            self.quote_currency_paid, self.base_currency_bought, len(kept), len(wanted)))
+        placements = [self.submit_after(sell_cancels, self.sell_limit_ptc,
+                                        decimal_string(self.base_bought), decimal_string(legs[0]['sell_price']))]
+        if self.current_order_depth > self.max_order_depth:
+            module_logger.warning(
+                '{}|At max order depth, not doing anything (leaving sell out)'.format(self.product_id))
+        for price, size in wanted:
+            placements.append(self.submit_after(buy_cancels, self.buy_limit_ptc, decimal_string(size),
+                                                decimal_string(price)))
+        self.wait_all(list(cancels.values()) + placements)
+        self.save_state(kept + [x.result()['id'] for x in placements])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+import json
+import logging
+import re
+
+# Optional faster JSON backends, same results as the standard library for websocket messages
+try:
+    import orjson
+
+    loads = orjson.loads
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+
+        loads = ujson.loads
+        JSON_BACKEND = 'ujson'
+    except ImportError:
+        loads = json.loads
+        JSON_BACKEND = 'json'
+
+module_logger = logging.getLogger(__name__)
+
+_peek_patterns = {}
+
+
+def peek(raw, key):
+    """Value of a top level string field from the raw message text without decoding it, None if not found.
+    Websocket messages are flat objects so the first match is the top level one.
+    """
+    pattern = _peek_patterns.get(key)
+    if pattern is None:
+        pattern = re.compile(r'"{}"\s*:\s*"([^"]*)"'.format(re.escape(key)))
+        _peek_patterns[key] = pattern
+    match = pattern.search(raw)
+    return match.group(1) if match else None
+
+
+class LazyJson(object):
+    """Pretty printed JSON, only rendered if a log record actually gets formatted.
+    Pass as a logging argument: module_logger.debug('Message:%s', LazyJson(message))
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, indent=4, sort_keys=True)
+
+
+class MessageDispatcher(object):
+    def __init__(self, handlers=None, product_ids=None):
+        """Routes websocket messages to a handler by message type.
+        :param handlers: Dict of message type -> callable taking the decoded message. Other types are dropped.
+        :param product_ids: Only pass on messages for these products (or without a product_id), None for all.
+        """
+        self.handlers = dict(handlers or {})
+        self.product_ids = set(product_ids) if product_ids is not None else None
+        self.decoded = 0
+        self.skipped = 0
+
+    def register(self, message_type, handler):
+        self.handlers[message_type] = handler
+
+    def dispatch(self, raw):
+        """Handle raw message text, skipping the decode entirely when the peeked type/product isn't wanted
+        """
+        message_type = peek(raw, 'type')
+        if message_type is not None and message_type not in self.handlers:
+            self.skipped += 1
+            return
+        if self.product_ids is not None:
+            product_id = peek(raw, 'product_id')
+            if product_id is not None and product_id not in self.product_ids:
+                self.skipped += 1
+                return
+        self.decoded += 1
+        self.handle(loads(raw))
+
+    def handle(self, message):
+        """Handle an already decoded message
+        """
+        if self.product_ids is not None and message.get('product_id', None) not in self.product_ids:
+            if 'product_id' in message:
+                return
+        handler = self.handlers.get(message.get('type', ''))
+        if handler is not None:
+            handler(message)
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+import time
+
+module_logger = logging.getLogger(__name__)
+
+# Records appended before they're fsynced, and the longest a record waits for one
+SYNC_EVERY = 16
+SYNC_INTERVAL = 1.0
+
+
+class Journal(object):
+    """Append only log of a trader's fills and algo state, a JSON object per line, so a restart can pick up
+    exactly where it left off instead of guessing from open orders.
+
+    Records go through the file buffer and are fsynced in batches, every `sync_every` records or within
+    `sync_interval` seconds of the first unsynced one. A crash can lose that tail, which leaves a journal
+    that's behind the exchange rather than wrong, replay checks it against the open orders before trusting it.
+    """
+
+    def __init__(self, path, sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.file = open(path, 'a')
+        self.pending = 0
+        self.syncs = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, sort_keys=True)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.pending += 1
+            if self.pending >= self.sync_every:
+                self.sync_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending and not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+            self.syncs += 1
+
+    def close(self):
+        with self.lock:
+            self.sync_locked()
+            self.file.close()
+
+
+def read_journal(path):
+    """Records in a journal file, none if it's missing. A torn last line (crashed mid write) is dropped.
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as journal:
+        for number, line in enumerate(journal, 1):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                module_logger.warning('Skipping unreadable journal line {} of {}'.format(number, path))
+    return records
+
+
+def replay(records, product_id):
+    """The last state a product's trader journaled, with the fills journaled after it under 'fills', or None
+    """
+    state = None
+    for record in records:
+        if record.get('product_id', '') != product_id:
+            continue
+        if record.get('type', '') == 'state':
+            state = dict(record, fills=[])
+        elif record.get('type', '') == 'fill' and state is not None:
+            state['fills'].append(record)
+    return state
@@ -0,0 +1,144 @@
+import logging
+from decimal import Decimal
+
+from trader.base_trader import round_step
+from trader.base_trader import to_decimal
+
+module_logger = logging.getLogger(__name__)
+
+
+class Ladder(object):
+    """The cost basis trader's averaging down ladder: from a position, each leg is the buy that would move cost
+    basis down by delta, sized from wallet_fraction of what's left of the quote balance, and the sell placed
+    with it at delta above cost basis.
+
+    Every leg follows from the one before, so the whole ladder is planned from a fill in one go (in Decimals,
+    rounded to the product's steps as the orders would be) and cached by the position it starts from. When a
+    planned buy fills and balances are as planned, the next leg is a lookup.
+    """
+
+    def __init__(self, price_step, size_step, quote_step, delta, wallet_fraction, max_order_depth,
+                 base_min=Decimal(0)):
+        """
+        :param price_step: Quote increment as a Decimal, size_step the base currency's.
+        :param quote_step: Step order sizes (quote currency to spend) are rounded to.
+        :param base_min: Exchange minimum size, the ladder stops at a buy smaller than this.
+        """
+        self.price_step = price_step
+        self.size_step = size_step
+        self.quote_step = quote_step
+        self.delta = delta
+        self.wallet_fraction = wallet_fraction
+        self.delta_decimal = to_decimal(delta)
+        self.fraction_decimal = to_decimal(wallet_fraction)
+        self.max_order_depth = max_order_depth
+        self.base_min = base_min
+        # The ladder last planned, and (paid, bought, depth, order size) -> leg in it
+        self.planned = []
+        self.legs = {}
+        self.plans = 0
+        self.hits = 0
+
+    def bracket(self, paid, bought, order_size):
+        """(sell price, buy size, buy price) for a position and quote order size
+        """
+        sell_price = round_step(paid * (1 + self.delta_decimal) / bought, self.price_step)
+        # (paid + order size) / (cost basis * (1 - delta)), less what we hold
+        target_bought = round_step((paid + order_size) * bought / (paid * (1 - self.delta_decimal)), self.size_step)
+        buy_size = target_bought - bought
+        buy_price = round_step(order_size / buy_size, self.price_step) if buy_size > 0 else Decimal(0)
+        return sell_price, buy_size, buy_price
+
+    def order_size(self, balance):
+        """Quote currency for the next buy with `balance` left
+        """
+        return round_step(balance * self.fraction_decimal, self.quote_step)
+
+    def plan(self, paid, bought, depth, order_size, balance):
+        """Legs from a position until the order depth or the balance runs out, each a dict of Decimals
+        :param paid: Quote paid so far.
+        :param bought: Base bought so far.
+        :param depth: Buys filled so far, the first leg is placed at this depth.
+        :param order_size: Quote to spend on the first buy. Later buys spend wallet_fraction of the balance left
+        once the ones before fill.
+        :param balance: Quote balance.
+        """
+        legs = []
+        self.planned = legs
+        self.legs = {}
+        self.plans += 1
+        spent = Decimal(0)
+        while bought > 0 and paid > 0:
+            sell_price, buy_size, buy_price = self.bracket(paid, bought, order_size)
+            leg = {
+                'depth': depth,
+                'paid': paid,
+                'bought': bought,
+                'order_size': order_size,
+                'sell_price': sell_price,
+                'buy_size': buy_size,
+                'buy_price': buy_price,
+                # No buy is placed past the maximum, only the sell, and the balance runs out with the buy
+                # too small to place or the order size too small to price it
+                'last': depth > self.max_order_depth or buy_size < self.base_min or buy_price <= 0,
+            }
+            legs.append(leg)
+            self.legs[(paid, bought, depth, order_size)] = leg
+            if leg['last']:
+                break
+            # Should it fill
+            cost = buy_size * buy_price
+            spent += cost
+            paid += cost
+            bought += buy_size
+            depth += 1
+            leg['spent'] = round_step(spent, self.quote_step)
+            order_size = self.order_size(balance - leg['spent'])
+        return legs
+
+    def leg(self, paid, bought, depth, order_size, balance):
+        """The leg to place now, planned ahead when the position is one the last ladder expected
+        :param order_size: Quote to spend on the buy, or None for wallet_fraction of the balance.
+        """
+        balance = round_step(to_decimal(balance), self.quote_step)
+        if order_size is None:
+            order_size = self.order_size(balance)
+        else:
+            order_size = round_step(to_decimal(order_size), self.quote_step)
+        leg = self.legs.get((paid, bought, depth, order_size))
+        if leg is not None:
+            self.hits += 1
+            return leg
+        return self.plan(paid, bought, depth, order_size, balance)[0]
+
+    def ahead(self, paid, bought, depth, order_size, balance, count):
+        """The leg to place now and the ones after it, up to `count`, see leg
+        """
+        first = self.leg(paid, bought, depth, order_size, balance)
+        index = next(i for i, x in enumerate(self.planned) if x is first)
+        return self.planned[index:index + count]
+
+    def seed(self, price, balance):
+        """Position after the seed limit buy fills, from the market price and quote balance, as (paid, bought)
+        """
+        price = to_decimal(price)
+        size = round_step(self.order_size(to_decimal(balance)) / price, self.size_step)
+        buy_price = round_step(price * (1 - self.delta_decimal), self.price_step)
+        return size * buy_price, size
+
+    def format(self, legs):
+        """Lines of a table of legs, prices and sizes to their steps
+        """
+        lines = ['{:>6}{:>14}{:>14}{:>12}{:>14}{:>14}{:>14}'.format(
+            'depth', 'buy', '@', 'sell @', 'cost basis', 'bought', 'spent')]
+        for leg in legs:
+            lines.append('{:>6}{:>14}{:>14}{:>12}{:>14,.2f}{:>14}{:>14}'.format(
+                leg['depth'],
+                '' if leg['last'] else '{:f}'.format(leg['buy_size'].quantize(self.size_step)),
+                '' if leg['last'] else '{:f}'.format(leg['buy_price'].quantize(self.price_step)),
+                '{:f}'.format(leg['sell_price'].quantize(self.price_step)),
+                leg['paid'] / leg['bought'],
+                '{:f}'.format(leg['bought'].quantize(self.size_step)),
+                '' if leg['last'] else '{:f}'.format(leg['spent'].quantize(self.quote_step)),
+            ))
+        return lines
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyStats(object):
+    """Running summary of a latency in seconds, percentiles over the last `window` samples.
+    """
+
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+            'last': self.last,
+        }
+
+
+class Metrics(object):
+    """Named latencies and counters, safe to update from the websocket and worker threads.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def latency(self, name):
+        with self.lock:
+            if name not in self.latencies:
+                self.latencies[name] = LatencyStats()
+            return self.latencies[name]
+
+    def record(self, name, seconds):
+        stats = self.latency(name)
+        with self.lock:
+            stats.record(seconds)
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get(self, name):
+        return self.counters.get(name, 0)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        with self.lock:
+            result = {name: stats.summary() for name, stats in self.latencies.items()}
+            result.update(self.counters)
+            return result
+
+    def format(self):
+        """One line per metric for the heartbeat log, latencies in ms
+        """
+        lines = []
+        for name, value in sorted(self.summary().items()):
+            if isinstance(value, dict):
+                lines.append('{} n={} mean={:.1f}ms p50={:.1f}ms p99={:.1f}ms max={:.1f}ms'.format(
+                    name, value['count'], value['mean'] * 1000, value['p50'] * 1000, value['p99'] * 1000,
+                    value['max'] * 1000))
+            else:
+                lines.append('{} {}'.format(name, value))
+        return lines
@@ -0,0 +1,133 @@
+import heapq
+import logging
+import threading
+
+module_logger = logging.getLogger(__name__)
+
+
+class OrderBook(object):
+    def __init__(self, product_id, client=None):
+        """Level 2 book for one product, fed by the websocket level2 channel (snapshot then l2update messages).
+        Each side is a dict of price -> size plus a heap of prices, so an update is O(log n) and the best
+        bid/ask is the top of the heap. Removed prices are left in the heap and dropped once they reach the top.
+        :param client: For re-snapshotting over REST (level 2 order book) when the feed has a gap.
+        """
+        self.product_id = product_id
+        self.client = client
+        self.levels = {'buy': {}, 'sell': {}}
+        # Bids are stored negated so both heaps are min heaps
+        self.heaps = {'buy': [], 'sell': []}
+        self.sequence = None
+        self.ready = False
+        self.resyncs = 0
+        self.lock = threading.Lock()
+
+    def on_message(self, message):
+        message_type = message.get('type', '')
+        if message_type == 'snapshot':
+            self.load_snapshot(message['bids'], message['asks'], message.get('sequence', None))
+        elif message_type == 'l2update':
+            self.on_update(message)
+
+    def on_update(self, message):
+        if not self.ready:
+            # Update before any snapshot, nothing to apply it to
+            self.resync('update before snapshot')
+            return
+        sequence = message.get('sequence', None)
+        if sequence is not None and self.sequence is not None:
+            if sequence <= self.sequence:
+                return
+            if sequence != self.sequence + 1:
+                self.resync('sequence gap {} -> {}'.format(self.sequence, sequence))
+                return
+        with self.lock:
+            for side, price, size in message['changes']:
+                self.set_level(side, float(price), float(size))
+            if sequence is not None:
+                self.sequence = sequence
+            crossed = self.levels['buy'] and self.levels['sell'] and -self.heaps['buy'][0] >= self.heaps['sell'][0]
+        # The level2 feed doesn't always carry sequence numbers, a crossed book means an update was missed
+        if crossed:
+            self.resync('crossed book')
+
+    def load_snapshot(self, bids, asks, sequence=None):
+        """Replace the book, levels are [price, size, ...] lists as sent by the websocket/REST endpoints
+        """
+        with self.lock:
+            self.levels = {
+                'buy': {float(x[0]): float(x[1]) for x in bids if float(x[1]) > 0},
+                'sell': {float(x[0]): float(x[1]) for x in asks if float(x[1]) > 0},
+            }
+            self.heaps = {
+                'buy': [-x for x in self.levels['buy']],
+                'sell': list(self.levels['sell']),
+            }
+            for heap in self.heaps.values():
+                heapq.heapify(heap)
+            self.sequence = sequence
+            self.ready = True
+
+    def resync(self, reason):
+        """Rebuild the book from the REST level 2 snapshot
+        """
+        self.resyncs += 1
+        self.ready = False
+        if self.client is None:
+            module_logger.warning('{}|Order book out of sync ({}), waiting for a snapshot'.format(
+                self.product_id, reason))
+            return
+        module_logger.warning('{}|Order book out of sync ({}), re-snapshotting'.format(self.product_id, reason))
+        book = self.client.get_product_order_book(self.product_id, level=2)
+        if 'bids' not in book or 'asks' not in book:
+            module_logger.error('{}|Unable to snapshot order book, api message: {}'.format(
+                self.product_id, book.get('message', 'unknown error')))
+            return
+        self.load_snapshot(book['bids'], book['asks'], book.get('sequence', None))
+
+    def set_level(self, side, price, size):
+        levels = self.levels[side]
+        heap = self.heaps[side]
+        if size <= 0:
+            levels.pop(price, None)
+        else:
+            if price not in levels:
+                heapq.heappush(heap, -price if side == 'buy' else price)
+            levels[price] = size
+        # Drop removed prices off the top so the best level is always heap[0]
+        while heap and (-heap[0] if side == 'buy' else heap[0]) not in levels:
+            heapq.heappop(heap)
+        # Prices removed below the top pile up under churn, rebuild once they're the majority
+        if len(heap) > 2 * len(levels) + 64:
+            self.heaps[side] = [-x for x in levels] if side == 'buy' else list(levels)
+            heapq.heapify(self.heaps[side])
+
+    def best(self, side):
+        """(price, size) of the best level on the side, None if empty or not synced
+        """
+        with self.lock:
+            return self._best(side)
+
+    def _best(self, side):
+        if not self.ready or not self.heaps[side]:
+            return None
+        price = self.heaps[side][0]
+        if side == 'buy':
+            price = -price
+        return price, self.levels[side][price]
+
+    def best_bid(self):
+        return self.best('buy')
+
+    def best_ask(self):
+        return self.best('sell')
+
+    def mid_price(self):
+        """Midpoint of the best bid/ask, None if either side is missing
+        """
+        with self.lock:
+            bid = self._best('buy')
+            ask = self._best('sell')
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+
+
+class OrderCache(object):
+    """Bounded, insertion ordered set of order ids with O(1) add, remove and membership.
+
+    Once `capacity` ids are held, adding another evicts the oldest. Re-adding an id refreshes
+    it to newest. Safe to share between the websocket, fill and order threads.
+    """
+
+    def __init__(self, order_ids=(), capacity=1200):
+        if capacity < 1:
+            raise ValueError('Capacity must be positive, got {}'.format(capacity))
+        self.capacity = capacity
+        self.evicted = 0
+        self.ids = OrderedDict()
+        self.lock = threading.Lock()
+        for order_id in order_ids:
+            self.add(order_id)
+
+    def add(self, order_id):
+        with self.lock:
+            if order_id in self.ids:
+                self.ids.move_to_end(order_id)
+                return
+            self.ids[order_id] = None
+            if len(self.ids) > self.capacity:
+                self.ids.popitem(last=False)
+                self.evicted += 1
+
+    def discard(self, order_id):
+        with self.lock:
+            self.ids.pop(order_id, None)
+
+    def __contains__(self, order_id):
+        return order_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.ids))
+
+    def __repr__(self):
+        return 'OrderCache({}, capacity={})'.format(list(self), self.capacity)
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+module_logger = logging.getLogger(__name__)
+
+
+class SettlementTracker(object):
+    """Resolves a future per order id with the order once the exchange reports it settled.
+
+    Settlement is only visible through the order endpoint, so each tracked order is checked
+    right away and then polled with exponential backoff until a deadline. `done`/`match`
+    messages from the user channel wake the poller early instead of waiting out the backoff,
+    so a settled order is usually picked up within one round trip of its last message.
+    """
+
+    def __init__(self, client, initial_delay=0.05, max_delay=1.0, deadline=120.0):
+        """
+        :param client: Rest client, only needs get_order.
+        :param initial_delay: Seconds before the first re-poll, doubling up to max_delay.
+        :param max_delay: Longest wait between polls.
+        :param deadline: Seconds after which the future fails with SettlementTimeout.
+        """
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.futures = {}
+        self.wakeups = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def track(self, order_id):
+        """Future resolving to the settled order, shared if the order is already being tracked
+        """
+        with self.lock:
+            if order_id in self.futures:
+                return self.futures[order_id]
+            future = Future()
+            wakeup = threading.Event()
+            self.futures[order_id] = future
+            self.wakeups[order_id] = wakeup
+        self.executor.submit(self.poll, order_id, future, wakeup)
+        return future
+
+    def on_message(self, message):
+        """Feed user channel messages, wakes the poller for tracked orders
+        """
+        if message.get('type', '') == 'match':
+            order_ids = [message.get('maker_order_id', ''), message.get('taker_order_id', '')]
+        else:
+            order_ids = [message.get('order_id', '')]
+        with self.lock:
+            for order_id in order_ids:
+                if order_id in self.wakeups:
+                    self.wakeups[order_id].set()
+
+    def poll(self, order_id, future, wakeup):
+        delay = self.initial_delay
+        give_up = time.time() + self.deadline
+        try:
+            while True:
+                wakeup.clear()
+                order = self.client.get_order(order_id)
+                if order.get('settled', False):
+                    future.set_result(order)
+                    return
+                remaining = give_up - time.time()
+                if remaining <= 0:
+                    future.set_exception(SettlementTimeout('{} not settled after {}s, last state: {}'.format(
+                        order_id, self.deadline, order)))
+                    return
+                module_logger.info('Waiting for {} to settle'.format(order_id))
+                wakeup.wait(min(delay, remaining))
+                delay = min(delay * 2, self.max_delay)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.futures.pop(order_id, None)
+                self.wakeups.pop(order_id, None)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class SettlementTimeout(Exception):
+    def __init__(self, value):
+        self.parameter = value
+
+    def __str__(self):
+        return repr(self.parameter)
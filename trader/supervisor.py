@@ -0,0 +1,82 @@
+import json
+import logging
+
+from ws4py.client.threadedclient import WebSocketClient
+
+from gdax.authenticated_client import AuthenticatedClient
+from trader.balance_ledger import BalanceLedger
+from trader.base_trader import Trader
+from trader.base_trader import subscribe_message
+from trader.dispatch import loads
+from trader.dispatch import peek
+
+module_logger = logging.getLogger(__name__)
+
+
+class Supervisor(WebSocketClient):
+    def __init__(self, auth_client=None, api_key='', secret_key='', pass_phrase='', api_url='', ws_url='',
+                 use_ledger=False):
+        """Hosts several traders in one process over a single websocket subscription.
+        Products and account balances are queried once and shared, as is the REST client (and so its
+        pooled session and rate limits). Messages are routed to the trader for their product_id, decoded once.
+        :param use_ledger: Keep the shared balances current from every trader's order events, see BalanceLedger.
+        """
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.pass_phrase = pass_phrase
+        if auth_client is None:
+            self.client = AuthenticatedClient(api_key, secret_key, pass_phrase, api_url=api_url)
+        else:
+            self.client = auth_client
+        self.products = self.client.get_products()
+        # Shared balance snapshot, every trader reads and refreshes this same dict
+        self.accounts = {}
+        for account in self.client.get_accounts():
+            if 'currency' in account and 'available' in account and 'balance' in account:
+                self.accounts[account['currency']] = Trader.parse_account(account)
+        self.ledger = None
+        if use_ledger:
+            self.ledger = BalanceLedger(self.accounts)
+            self.ledger.reset()
+        # Dispatch table, product_id -> trader
+        self.traders = {}
+        if ws_url != '':
+            WebSocketClient.__init__(self, ws_url)
+
+    def add_trader(self, trader_class, product_id, *args, **kwargs):
+        """Create a trader for the product sharing this supervisor's client, products and balances.
+        Extra arguments go to the trader class, e.g. add_trader(CostBasisTrader, 'ETH-USD', 6, 0.13, delta=0.01)
+        """
+        if product_id in self.traders:
+            raise ValueError('Already trading {}'.format(product_id))
+        if self.ledger is not None:
+            kwargs['ledger'] = self.ledger
+        trader = trader_class(product_id, *args, auth_client=self.client, products=self.products,
+                              accounts=self.accounts, **kwargs)
+        trader.supervisor = self
+        self.traders[product_id] = trader
+        return trader
+
+    def on_start(self):
+        for trader in self.traders.values():
+            trader.on_start()
+
+    def opened(self):
+        channels = []
+        for trader in self.traders.values():
+            channels.extend(x for x in trader.channels() if x not in channels)
+        self.send(json.dumps(subscribe_message(self.traders.keys(), channels, self.api_key, self.secret_key,
+                                               self.pass_phrase)))
+
+    def closed(self, code, reason=None):
+        module_logger.info('Supervisor closed down. Code: {} Reason: {}'.format(code, reason))
+        for trader in self.traders.values():
+            trader.stop()
+
+    def received_message(self, message):
+        raw = str(message)
+        # Route on the peeked product/type, only decoding messages a trader will actually handle
+        trader = self.traders.get(peek(raw, 'product_id'))
+        if trader is None or peek(raw, 'type') not in trader.dispatcher.handlers:
+            return
+        trader.on_message(loads(raw))
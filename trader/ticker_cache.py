@@ -0,0 +1,112 @@
+import json
+import logging
+import threading
+import time
+
+from ws4py.client.threadedclient import WebSocketClient
+
+from trader.dispatch import MessageDispatcher
+
+module_logger = logging.getLogger(__name__)
+
+
+class TickerCache(object):
+    def __init__(self, client, ttl=60.0, clock=time.monotonic):
+        """Latest price/bid/ask per product, fed by websocket ticker messages (see TickerFeed).
+        Entries older than `ttl` seconds, or products never seen on the feed, are fetched from the REST ticker.
+        :param client: Client for the REST fallback.
+        """
+        self.client = client
+        self.ttl = ttl
+        self.clock = clock
+        self.tickers = {}
+        self.lock = threading.Lock()
+
+    def on_message(self, message):
+        """Websocket ticker channel message
+        """
+        if 'best_ask' not in message:
+            return
+        self.update(message['product_id'], message.get('price', message['best_ask']), message['best_bid'],
+                    message['best_ask'])
+
+    def update(self, product_id, price, bid, ask):
+        with self.lock:
+            self.tickers[product_id] = {
+                'price': float(price),
+                'bid': float(bid),
+                'ask': float(ask),
+                'updated': self.clock(),
+            }
+
+    def get(self, product_id):
+        """{'price', 'bid', 'ask'} for the product, from the REST ticker if missing or stale
+        """
+        with self.lock:
+            ticker = self.tickers.get(product_id, None)
+        if ticker is not None and self.clock() - ticker['updated'] <= self.ttl:
+            return ticker
+        module_logger.debug('Refreshing {} ticker over REST'.format(product_id))
+        result = self.client.get_product_ticker(product_id)
+        if 'ask' not in result:
+            raise TickerFailure('{} ticker unavailable, api message: {}'.format(
+                product_id, result.get('message', 'unknown error')))
+        self.update(product_id, result.get('price', result['ask']), result['bid'], result['ask'])
+        with self.lock:
+            return self.tickers[product_id]
+
+
+class TickerFeed(WebSocketClient):
+    def __init__(self, cache, product_ids, ws_url):
+        """Keeps a TickerCache current from the public ticker channel, runs on ws4py's thread after connect()
+        """
+        self.cache = cache
+        self.product_ids = list(product_ids)
+        self.dispatcher = MessageDispatcher({'ticker': cache.on_message}, product_ids=self.product_ids)
+        WebSocketClient.__init__(self, ws_url)
+
+    def opened(self):
+        self.send(json.dumps({
+            'type': 'subscribe',
+            'product_ids': self.product_ids,
+            'channels': ['ticker'],
+        }))
+
+    def closed(self, code, reason=None):
+        # Cache falls back to REST once entries go stale
+        module_logger.warning('Ticker feed closed down. Code: {} Reason: {}'.format(code, reason))
+
+    def received_message(self, message):
+        self.dispatcher.dispatch(str(message))
+
+
+def value_accounts(accounts, cache, quote_currency='USD'):
+    """Value every account in the quote currency at the ask, in one pass over the accounts.
+    :param accounts: Accounts as returned by get_accounts.
+    :return: Total value and a (currency, balance, ask, value) row per account with a balance, ask is None for
+    the quote currency itself.
+    """
+    total = 0.0
+    rows = []
+    for account in accounts:
+        balance = float(account['balance'])
+        if balance <= 0:
+            continue
+        currency = account['currency']
+        if currency == quote_currency:
+            ask = None
+            value = balance
+        else:
+            ask = cache.get('{}-{}'.format(currency, quote_currency))['ask']
+            value = balance * ask
+        rows.append((currency, balance, ask, value))
+        total += value
+    return total, rows
+
+
+class TickerFailure(Exception):
+    def __init__(self, value):
+        self.parameter = value
+
+    def __str__(self):
+        return repr(self.parameter)